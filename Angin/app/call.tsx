@@ -12,6 +12,7 @@ import {
   View,
 } from "react-native";
 import { BACKEND_BASE_URL } from "../backend/services/config";
+import { FRAMES_MEDIA_TYPE, audioUri, parseFrames } from "../backend/services/frames";
 
 
 
@@ -68,6 +69,19 @@ async function playAnginVoice(text: string) {
 }
 
 
+// Play audio that arrived with the analysis
+async function playReplyAudio(audio: Uint8Array) {
+  try {
+    const sound = new Audio.Sound();
+    await sound.loadAsync({ uri: audioUri(audio) });
+    await sound.playAsync();
+  } catch (err) {
+    console.log("Reply audio error:", err);
+    Alert.alert("Error", "Could not play voice output.");
+  }
+}
+
+
 const stopSpeaking = () => {
   Speech.stop();
   setIsSpeaking(false);
@@ -254,11 +268,13 @@ const stopSpeaking = () => {
         type: "audio/m4a",
       } as any);
 
-      const response = await fetch(`${BACKEND_BASE_URL}/analyze`, {
+      // One round trip: analysis first, then the voice for its suggested response
+      const response = await fetch(`${BACKEND_BASE_URL}/analyze/speak`, {
         method: "POST",
         body: formData,
         headers: {
           "Content-Type": "multipart/form-data",
+          Accept: FRAMES_MEDIA_TYPE,
         },
       });
 
@@ -267,16 +283,24 @@ const stopSpeaking = () => {
         console.log("Backend error body:", text);
         throw new Error(`Backend error ${response.status}`);
       }
-      // wait for json response
-      const json = await response.json();
+      const { events, audio } = parseFrames(await response.arrayBuffer());
+      const { event, ...json } = events.find((e) => e.event === "analysis") ?? {};
+      if (!event) {
+        const error = events.find((e) => e.event === "error");
+        throw new Error(error?.detail ?? "No analysis in response");
+      }
       console.log("Analysis result:", json);
       setAnalysis(json);
 
-        // store TTS text and auto-speak once
+      // store TTS text and auto-speak once
       if (json.suggested_response) {
         setLastTtsText(json.suggested_response);
-        // don’t await so UI stays responsive
-        playAnginVoice(json.suggested_response);
+        if (audio.length > 0) {
+          playReplyAudio(audio);
+        } else {
+          // speech failed in-band: fall back to a separate /speak request
+          playAnginVoice(json.suggested_response);
+        }
       }
     } catch (err: any) {
       console.error("uploadAndAnalyze error", err);
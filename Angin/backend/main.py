@@ -1,461 +1,4194 @@
+import time
+
+# Import time is part of every cold start; see STARTUP_IMPORT_BUDGET_SECONDS
+_import_started = time.perf_counter()
+
+import io
 import os
+import re
 import json
+import logging
+import random
+import struct
+import asyncio
+import heapq
+import hashlib
+import importlib
+import math
+import sqlite3
+import sys
+import threading
+import unicodedata
+import uuid
+import wave
+import shutil
+import anyio
 import httpx
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+import numpy as np
+from collections import OrderedDict, deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Header, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from openai import OpenAI
-from fastapi.responses import Response  
-from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from fastapi.responses import JSONResponse, Response, StreamingResponse, PlainTextResponse
+from starlette.formparsers import MultiPartParser
+from starlette.routing import Match
+from pydantic import BaseModel, Field, ValidationError
+from typing import TYPE_CHECKING, BinaryIO, List, Optional, Literal, Tuple, Union
+from urllib.parse import quote
 from dotenv import load_dotenv  
 
-load_dotenv()
+if TYPE_CHECKING:
+    # The SDK takes about as long to import as everything else combined, so
+    # it is loaded on first use (normally by the startup warmup)
+    from openai import AsyncOpenAI
 
 # Explicit, force-loaded .env path
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ENV_PATH = os.path.join(BASE_DIR, ".env")
 
+logger = logging.getLogger("angin")
+
 load_dotenv(dotenv_path=ENV_PATH, override=True)
-print("DEBUG: .env path =", ENV_PATH)
-print("DEBUG: OPENAI_API_KEY =", repr(os.getenv("OPENAI_API_KEY")))
-print("DEBUG: ELEVENLABS_API_KEY =", repr(os.getenv("ELEVENLABS_API_KEY")))
+print("Config: OPENAI_API_KEY", "set" if os.getenv("OPENAI_API_KEY") else "missing",
+      "| ELEVENLABS_API_KEY", "set" if os.getenv("ELEVENLABS_API_KEY") else "missing")
 
 
-# OpenAI client (uses OPENAI_API_KEY env var)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 ELEVEN_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 ELEVEN_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "EXAVITQu4vr4xnSDxMaL")
+ELEVEN_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io").rstrip("/")
+ELEVEN_MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID", "eleven_turbo_v2")
+
 
+# ============================================================================
+# Shared Upstream Connection Pools
+# ============================================================================
 
-app = FastAPI()
+# Pool tuning (env overridable)
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "120"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_PREWARM_CONNECTIONS = int(os.getenv("HTTP_PREWARM_CONNECTIONS", "2"))
 
 
-@app.get("/speak")
-async def speak(text: str = Query(..., max_length=500)):
+class PoolStats:
+    """Counts requests vs. new connections so handshakes on the hot path are visible."""
+
+    def __init__(self):
+        self.requests = 0
+        self.tcp_connects = 0
+        self.tls_handshakes = 0
+        self.prewarmed = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "tcp_connects": self.tcp_connects,
+            "tls_handshakes": self.tls_handshakes,
+            "reused": max(self.requests - self.tcp_connects, 0),
+            "prewarmed": self.prewarmed,
+        }
+
+
+class TracedTransport(httpx.AsyncHTTPTransport):
     """
-    Proxy to ElevenLabs: returns raw audio/mpeg for the given text.
+    httpx transport that hooks httpcore's trace events to count
+    TCP connects and TLS handshakes per upstream.
     """
-    if not ELEVEN_API_KEY:
-        print("No ELEVENLABS_API_KEY set")
-        raise HTTPException(status_code=500, detail="ELEVENLABS_API_KEY not set")
 
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{ELEVEN_VOICE_ID}"
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
 
-    async with httpx.AsyncClient() as client:
-        r = await client.post(
-            url,
-            headers={
-                "xi-api-key": ELEVEN_API_KEY,
-                "Accept": "audio/mpeg; progressive=true",
-            },
-            json={
-                "text": text,
-                "model_id": "eleven_turbo_v2",
-            },
+    async def _trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.stats.tcp_connects += 1
+        elif event_name == "connection.start_tls.complete":
+            self.stats.tls_handshakes += 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.requests += 1
+        request.extensions = {**request.extensions, "trace": self._trace}
+        return await super().handle_async_request(request)
+
+
+class UpstreamPools:
+    """
+    App-level pooled clients for OpenAI and ElevenLabs.
+
+    Opened in the FastAPI lifespan hook so every request reuses warm
+    keep-alive (HTTP/2 where the upstream supports it) connections.
+    """
+
+    def __init__(self):
+        self.stats = {"openai": PoolStats(), "elevenlabs": PoolStats()}
+        self._openai: Optional["AsyncOpenAI"] = None
+        self._openai_http: Optional[httpx.AsyncClient] = None
+        self._eleven: Optional[httpx.AsyncClient] = None
+
+    def _http_client(self, stats: PoolStats, **kwargs) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
         )
+        transport = TracedTransport(stats, http2=HTTP2_ENABLED, limits=limits)
+        timeout = httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+        return httpx.AsyncClient(transport=transport, timeout=timeout, **kwargs)
 
-    print("ElevenLabs status:", r.status_code)
-    if r.status_code != 200:
-        print("ElevenLabs error body:", r.text)
-        raise HTTPException(status_code=500, detail="TTS generation failed")
+    def open(self):
+        if self._openai is None:
+            from openai import AsyncOpenAI
 
-    # IMPORTANT: return raw audio bytes so Expo AV can play it
-    return Response(content=r.content, media_type="audio/mpeg")
+            # Uses OPENAI_API_KEY, and OPENAI_BASE_URL if set
+            self._openai_http = self._http_client(self.stats["openai"])
+            # The SDK would otherwise apply its own 10-minute timeout and
+            # retries; call_upstream retries within the request deadline
+            self._openai = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=self._openai_http,
+                timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                max_retries=0,
+            )
+        if self._eleven is None:
+            self._eleven = self._http_client(self.stats["elevenlabs"], base_url=ELEVEN_BASE_URL)
 
+    @property
+    def openai(self) -> "AsyncOpenAI":
+        self.open()
+        return self._openai
 
-# Allow dev origins (Expo web / device via LAN)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],   # keep wide-open for dev, tighten later
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    @property
+    def eleven(self) -> httpx.AsyncClient:
+        self.open()
+        return self._eleven
 
+    async def prewarm(self, connections: int = HTTP_PREWARM_CONNECTIONS):
+        """Open `connections` sockets to each upstream before the first request."""
+        targets = [
+            ("openai", self._openai_http, str(self.openai.base_url)),
+            ("elevenlabs", self.eleven, ELEVEN_BASE_URL),
+        ]
 
-def transcribe_audio(audio_bytes: bytes, filename: str) -> str:
-  """
-  Use OpenAI's speech-to-text model (gpt-4o-transcribe) to get the transcript.
-  """
-  try:
-    # Docs: Speech to text / gpt-4o-transcribe :contentReference[oaicite:1]{index=1}
-    transcription = client.audio.transcriptions.create(
-        model="gpt-4o-transcribe",
-        file=(filename, audio_bytes),
-    )
-    return transcription.text
-  except Exception as e:
-    print("Transcription error:", e)
-    raise HTTPException(status_code=500, detail="Failed to transcribe audio")
+        async def touch(name: str, http: httpx.AsyncClient, url: str):
+            try:
+                await http.head(url)
+                self.stats[name].prewarmed += 1
+            except httpx.HTTPError as e:
+                print(f"Prewarm {name} failed: {e!r}")
 
+        await asyncio.gather(*(
+            touch(name, http, url)
+            for name, http, url in targets
+            for _ in range(connections)
+        ))
 
-def analyze_transcript(transcript: str) -> dict:
-  """
-  Send transcript to a chat model and force JSON output.
-  """
-  system_prompt = """
-You are Angin, a calm, emotionally supportive companion.
+    async def close(self):
+        if self._openai is not None:
+            await self._openai.close()
+            self._openai = None
+            self._openai_http = None
+        if self._eleven is not None:
+            await self._eleven.aclose()
+            self._eleven = None
 
-Your job is to help the user navigate stress, overwhelm, loneliness, confusion, guilt, self-comparison, and relationship stress. You are not a doctor or therapist and you never claim to be one. You do not provide medical, diagnostic, or crisis advice.
 
-STYLE
-- Speak in simple, human, natural language.
-- Use short paragraphs and short sentences.
-- Sound warm, grounded, and honest, not fake-positive.
-- Validate emotions before giving any guidance.
-- Avoid jargon and complicated theory unless the user explicitly asks for it.
-- You can gently challenge unhelpful thoughts, but never shame or blame the user.
+upstreams = UpstreamPools()
 
-BEHAVIOUR
-- First, reflect back what you hear (emotion + situation) in your own words.
-- Then normalise the feeling where appropriate ("a lot of people feel this in your situation").
-- Then offer one small, concrete next step (a question, a reflection, a tiny action, or a reframing).
-- Ask one focused follow-up question to keep the user talking, unless they clearly want a one-off answer.
 
-BOUNDARIES
-- If the user talks about self-harm, wanting to die, or harming others, stay calm and supportive but encourage them to reach out to real-world help (friends, family, local services).
-- Do not give specific instructions about medication, diagnosis, or treatment.
-- Do not pretend to know their future or make guarantees about outcomes.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve (/health) immediately and warm up in the background; /ready
+    # reports when the worker is worth routing calls to
+    warmup = asyncio.create_task(readiness.warm())
+    await batch_runner.start()
+    yield
+    warmup.cancel()
+    await batch_runner.stop()
+    await upstreams.close()
 
-TONE BY DEFAULT
-- Calm, soft, and respectful.
-- Keep the pace gentle: imagine you are speaking out loud and the words will be played as audio.
-- Most replies should be 2–6 short sentences.
 
-Your job is to:
-1. Infer their primary emotion and intensity.
-2. Summarize what they are worried or thinking about.
-3. Extract 2–4 high-level topics.
-4. Propose a short, gentle response for Angin to speak back.
-5. Put the spoken version of that response into `tts_text`.
+app = FastAPI(lifespan=lifespan)
 
-Return ONLY valid JSON with exactly this shape:
 
-{
-  "transcript": string,
-  "emotion": string,               // e.g. "anxious", "sad", "mixed", "calm"
-  "intensity": string,             // "low", "medium", "high"
-  "topics": string[],              // e.g. ["work", "relationships"]
-  "summary": string,               // 1–2 sentence summary
-  "suggested_response": string,    // 2–4 sentence written response
-  "tts_text": string               // 1–3 sentences, natural spoken style
+# ============================================================================
+# Metrics & Per-Stage Timing (Server-Timing headers, Prometheus /metrics)
+# ============================================================================
+
+TIMING_LOG = os.getenv("TIMING_LOG", "1") == "1"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Which upstream each instrumented stage talks to (for error counters)
+STAGE_UPSTREAMS = {
+    "stt": "openai",
+    "analyze": "openai",
+    "llm": "openai",
+    "llm_ttft": "openai",
+    "summary": "openai",
+    "tts": "elevenlabs",
 }
-"""
 
-  try:
-    # Use JSON mode to guarantee valid JSON response :contentReference[oaicite:2]{index=2}
-    completion = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": transcript},
-        ],
-    )
 
-    content = completion.choices[0].message.content
-    data = json.loads(content)
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
 
-    # Ensure original transcript is included
-    if "transcript" not in data:
-      data["transcript"] = transcript
 
-    return data
-  except Exception as e:
-    print("Analysis error:", e)
-    raise HTTPException(status_code=500, detail="Failed to analyze transcript")
+def _format_labels(names: Tuple[str, ...], values: tuple, extra: Optional[tuple] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape_label(v)}"' for n, v in pairs) + "}"
 
 
-@app.post("/analyze")
-async def analyze(audio: UploadFile = File(...)):
-  """
-  Accepts an audio file and returns JSON analysis.
+class Metric:
+    """Minimal Prometheus-style metric; values are kept per label tuple."""
 
-  Expect multipart/form-data with field name `audio`.
-  """
-  if not audio.content_type or not audio.content_type.startswith("audio/"):
-    raise HTTPException(status_code=400, detail="File must be an audio type")
+    kind = "untyped"
+    registry: list = []
 
-  audio_bytes = await audio.read()
-  if not audio_bytes:
-    raise HTTPException(status_code=400, detail="Empty audio file")
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.values: dict = {}
+        Metric.registry.append(self)
 
-  # 1) Transcribe
-  transcript = transcribe_audio(audio_bytes, audio.filename)
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
 
-  # 2) Analyze with LLM
-  analysis = analyze_transcript(transcript)
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
 
-  # 3) Return JSON to the app
-  return analysis
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self.values.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry["buckets"][i] += 1
+        entry["sum"] += value
+        entry["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for key, entry in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, entry["buckets"]):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', bound))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {entry['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {entry['sum']:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {entry['count']}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram("angin_request_duration_seconds",
+                            "Time to response headers per endpoint", ("endpoint",))
+STAGE_LATENCY = Histogram("angin_stage_duration_seconds",
+                          "Duration of pipeline stages (stt, llm, tts, ...)", ("stage",))
+REQUESTS_TOTAL = Counter("angin_requests_total", "Requests by endpoint and status", ("endpoint", "status"))
+IN_FLIGHT = Gauge("angin_requests_in_flight", "Requests currently being handled", ("endpoint",))
+UPSTREAM_ERRORS = Counter("angin_upstream_errors_total",
+                          "Failed upstream calls by upstream and stage", ("upstream", "stage"))
+BYTES_IN = Counter("angin_request_bytes_total", "Request body bytes received", ("endpoint",))
+BYTES_OUT = Counter("angin_response_bytes_total", "Response body bytes sent", ("endpoint",))
+
+# Spans recorded while handling the current request: [(stage, seconds), ...]
+_request_timings: ContextVar[Optional[list]] = ContextVar("request_timings", default=None)
+
+
+@asynccontextmanager
+async def stage(name: str):
+    """
+    Time one pipeline stage. Feeds the stage histogram and, when inside a
+    request, that request's Server-Timing header. Exceptions from
+    upstream-bound stages are counted as upstream errors.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        if name in STAGE_UPSTREAMS and not isinstance(e, asyncio.CancelledError):
+            UPSTREAM_ERRORS.inc(upstream=STAGE_UPSTREAMS[name], stage=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def record_stage(name: str, seconds: float):
+    """Record a span measured by hand (e.g. time to first token)."""
+    STAGE_LATENCY.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def server_timing_header(timings: list, total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware (so streaming responses pass straight through):
+    in-flight gauge, byte counters, latency histogram, and a Server-Timing
+    header listing every stage finished before the headers went out.
+
+    Each request also gets a usage scope (tokens, TTS characters), counted
+    towards the session named by an X-Session-Id header if there is one.
+    Usage recorded before the headers go out is sent as X-Usage; the log
+    line has the request's full usage.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _endpoint(self, scope) -> str:
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self._endpoint(scope)
+        timings: list = []
+        token = _request_timings.set(timings)
+        session_id = dict(scope["headers"]).get(b"x-session-id", b"").decode("latin-1") or None
+        usage = usage_scope(session_id)
+        usage_token = _request_usage.set(usage)
+        start = time.perf_counter()
+        status = {"code": 500}
+        IN_FLIGHT.inc(endpoint=endpoint)
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                BYTES_IN.inc(len(message.get("body", b"")), endpoint=endpoint)
+            return message
+
+        async def timing_send(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                status["code"] = message["status"]
+                REQUEST_LATENCY.observe(elapsed, endpoint=endpoint)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(timings, elapsed).encode("latin-1")))
+                if not usage.empty():
+                    headers.append((b"x-usage", usage.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                BYTES_OUT.inc(len(message.get("body", b"")), endpoint=endpoint)
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, timing_send)
+        finally:
+            IN_FLIGHT.dec(endpoint=endpoint)
+            REQUESTS_TOTAL.inc(endpoint=endpoint, status=status["code"])
+            _request_timings.reset(token)
+            _request_usage.reset(usage_token)
+            if TIMING_LOG and endpoint not in ("/metrics", "/health", "/ready"):
+                record = {
+                    "event": "request",
+                    "endpoint": endpoint,
+                    "status": status["code"],
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                    "stages": {name: round(seconds * 1000, 1) for name, seconds in timings},
+                }
+                if not usage.empty():
+                    record["usage"] = usage.snapshot()
+                if session_id:
+                    record["session_id"] = session_id
+                print(json.dumps(record))
+
+
+app.add_middleware(TimingMiddleware)
 
 
 # ============================================================================
-# Angin Therapy Turn Endpoint
+# Single-flight Coalescing of Identical Upstream Calls
 # ============================================================================
 
-class Message(BaseModel):
-    role: Literal["user", "assistant"]
-    content: str
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "1") == "1"
 
+COALESCED = Counter("angin_coalesced_calls_total",
+                    "Upstream calls saved by joining an identical in-flight call", ("stage",))
 
-class AnginTurnRequest(BaseModel):
-    summary: Optional[str] = None
-    history: List[Message] = Field(default_factory=list)
 
+class SingleFlight:
+    """
+    Registry of in-flight upstream work keyed by normalized inputs. The
+    first caller for a key starts the work; concurrent callers with the same
+    key join it instead of issuing their own upstream call.
 
-class AnginTurnResponse(BaseModel):
-    mood: Literal["anxious", "sad", "overwhelmed", "numb", "angry", "mixed"]
-    urgency: Literal["low", "medium", "high"]
-    strategy: Literal["reflect", "clarify", "grounding", "reframe", "close"]
-    response: str
-    next_action: Literal["tts_output", "ask_more", "end"]
+    Entries are anything with `add_done_callback` (a task, or a TTSFlight)
+    and are dropped as soon as they finish, so this never serves stale
+    results; caching is a separate concern.
 
+    The work is admitted upstream at the priority of the most urgent caller
+    waiting on it, not just the one that started it (see FlightPriority).
+    """
 
-@app.post("/angin/turn", response_model=AnginTurnResponse)
-async def angin_turn(request: AnginTurnRequest):
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict = {}  # key → (entry, FlightPriority)
+        self._waiters: dict = {}  # task → callers of do() awaiting it
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    def join(self, key: Optional[str], start):
+        """Return the in-flight entry for `key`, or `start()` a new one."""
+        found = self._inflight.get(key) if key is not None else None
+        if found is not None:
+            entry, priority = found
+            priority.raise_to(current_priority())
+            self.stats["coalesced"] += 1
+            COALESCED.inc(stage=self.name)
+            return entry
+        # Tasks created by start() copy the context, and with it the priority
+        priority = FlightPriority(current_priority())
+        token = _flight_priority.set(priority)
+        try:
+            entry = start()
+        finally:
+            _flight_priority.reset(token)
+        self.stats["calls"] += 1
+        if key is not None:
+            self._inflight[key] = (entry, priority)
+            entry.add_done_callback(lambda _: self.forget(key, entry))
+        return entry
+
+    def forget(self, key: str, entry):
+        """Stop offering `entry` to new callers (it keeps running for current ones)."""
+        found = self._inflight.get(key)
+        if found is not None and found[0] is entry:
+            del self._inflight[key]
+
+    async def do(self, key: Optional[str], fn, borrows: bool = False):
+        """
+        Await `fn()` once per key across concurrent callers. Pass key=None to
+        bypass coalescing. The shared task is shielded so one caller going
+        away does not cancel it for the others.
+
+        With `borrows=True`, `fn()` reads something that lives only as long as
+        the caller starting it (an upload closes when its request ends). If
+        that caller is cancelled, it waits for the task while others still
+        await it, and cancels the task otherwise.
+        """
+        started = False
+
+        def start():
+            nonlocal started
+            started = True
+            task = asyncio.ensure_future(fn())
+            # Retrieve the exception even if every caller was cancelled
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            return task
+
+        task = self.join(key, start)
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if borrows and started and not task.done():
+                if self._waiters[task] > 1:
+                    # A request's cancel scope would cancel every await here
+                    with anyio.CancelScope(shield=True):
+                        await asyncio.wait([task])
+                else:
+                    self.forget(key, task)
+                    task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "in_flight": len(self._inflight)}
+
+
+tts_flights = SingleFlight("tts")
+stt_flights = SingleFlight("stt")
+analysis_flights = SingleFlight("analyze")
+transcode_flights = SingleFlight("transcode")
+
+
+# ============================================================================
+# Admission Control: per-upstream concurrency limits with priority queues
+# ============================================================================
+
+UPSTREAM_LIMITS = {
+    "openai": int(os.getenv("UPSTREAM_LIMIT_OPENAI", "32")),
+    "elevenlabs": int(os.getenv("UPSTREAM_LIMIT_ELEVENLABS", "8")),
+}
+UPSTREAM_QUEUE_MAX = int(os.getenv("UPSTREAM_QUEUE_MAX", "64"))
+UPSTREAM_QUEUE_WAIT_SECONDS = float(os.getenv("UPSTREAM_QUEUE_WAIT_SECONDS", "5"))
+
+# Lower runs first. Live call turns are the default; other work opts down,
+# and turns the pre-classifier flags as high urgency move up.
+PRIORITY_URGENT = -1
+PRIORITY_LIVE = 0
+PRIORITY_PREFETCH = 1
+PRIORITY_BATCH = 2
+PRIORITY_BACKGROUND = 3
+PRIORITY_NAMES = {PRIORITY_URGENT: "urgent", PRIORITY_LIVE: "live", PRIORITY_PREFETCH: "prefetch",
+                  PRIORITY_BATCH: "batch", PRIORITY_BACKGROUND: "background"}
+
+_request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_LIVE)
+
+
+class FlightPriority:
     """
-    Conversational therapy turn using Angin's emotional support behavior.
-    
-    Takes conversation history and optional summary, returns structured JSON
-    with mood analysis, strategy, and response text.
+    Admission priority of work shared through a SingleFlight. It starts at
+    the starting caller's priority and rises when a more urgent caller
+    joins; slots the work is already queued for are re-prioritized.
     """
-    
-    # Build system prompt based on Angin therapy rules
-    system_prompt = """You are Angin, a calm emotional-support AI on a phone call.
 
-Your role is to listen, validate feelings, and gently guide users. You are NOT a crisis line, doctor, or therapist. Do not give medical, legal, or emergency advice.
+    def __init__(self, value: int):
+        self.value = value
+        self.queued: list = []  # (limiter, heap entry) currently waiting
 
-Always respond ONLY as a single JSON object with this shape:
+    def raise_to(self, priority: int):
+        if priority >= self.value:
+            return
+        self.value = priority
+        for limiter, entry in self.queued:
+            limiter.promote(entry, priority)
 
-{
-  "mood": "anxious" | "sad" | "overwhelmed" | "numb" | "angry" | "mixed",
-  "urgency": "low" | "medium" | "high",
-  "strategy": "reflect" | "clarify" | "grounding" | "reframe" | "close",
-  "response": "string",
-  "next_action": "tts_output" | "ask_more" | "end"
+
+_flight_priority: ContextVar[Optional[FlightPriority]] = ContextVar("flight_priority", default=None)
+
+
+def current_priority() -> int:
+    """Priority for upstream calls made here: the shared flight's, if inside one."""
+    flight = _flight_priority.get()
+    return flight.value if flight is not None else _request_priority.get()
+
+UPSTREAM_ACTIVE = Gauge("angin_upstream_active_calls", "Calls holding an upstream slot", ("upstream",))
+UPSTREAM_QUEUE_DEPTH = Gauge("angin_upstream_queue_depth", "Calls waiting for an upstream slot", ("upstream",))
+UPSTREAM_QUEUE_WAIT = Histogram("angin_upstream_queue_wait_seconds",
+                                "Time spent waiting for an upstream slot", ("upstream", "priority"))
+ADMISSION_REJECTED = Counter("angin_admission_rejected_total",
+                             "Calls turned away by admission control", ("upstream", "reason"))
+
+
+class UpstreamBusy(HTTPException):
+    """Raised when an upstream's queue is full or a call waited too long."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(status_code=503, detail="Server busy, please retry shortly",
+                         headers={"Retry-After": str(retry_after)})
+
+
+class UpstreamLimiter:
+    """
+    Caps concurrent calls to one upstream. Callers beyond the limit wait in
+    a priority queue (FIFO within a priority); a freed slot is handed
+    straight to the best waiter. A full queue is rejected immediately and a
+    wait longer than `max_wait` gives up, both with a Retry-After estimate
+    from the recent slot hold time.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: list = []  # heap of [priority, seq, future]
+        self._seq = 0
+        self._hold_avg = 1.0
+        self._waits: deque = deque(maxlen=200)  # recent slot waits, 0 when admitted straight away
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+
+    def retry_after(self) -> int:
+        backlog = (len(self._waiters) + 1) / max(self.limit, 1)
+        return max(1, math.ceil(backlog * self._hold_avg))
+
+    def _reject(self, reason: str):
+        self.stats["rejected" if reason == "queue_full" else "timed_out"] += 1
+        ADMISSION_REJECTED.inc(upstream=self.name, reason=reason)
+        raise UpstreamBusy(self.retry_after())
+
+    def promote(self, entry: list, priority: int):
+        """Move a queued waiter up to `priority` (keeping its place among equals)."""
+        if entry in self._waiters and priority < entry[0]:
+            entry[0] = priority
+            heapq.heapify(self._waiters)
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)  # slot passes to the waiter
+                self._update_gauges()
+                return
+        self.active -= 1
+        self._update_gauges()
+
+    def _update_gauges(self):
+        UPSTREAM_ACTIVE.set(self.active, upstream=self.name)
+        UPSTREAM_QUEUE_DEPTH.set(len(self._waiters), upstream=self.name)
+
+    async def _acquire(self, priority: int, flight: Optional[FlightPriority] = None):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._waits.append(0.0)
+            self._update_gauges()
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, self._seq, future]
+        self._seq += 1
+        heapq.heappush(self._waiters, entry)
+        self.stats["queued"] += 1
+        self._update_gauges()
+        if flight is not None:
+            flight.queued.append((self, entry))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                self._release()  # granted just as we gave up: pass it on
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._update_gauges()
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("timeout")
+            raise
+        finally:
+            if flight is not None:
+                flight.queued.remove((self, entry))
+            waited = time.perf_counter() - start
+            self._waits.append(waited)
+            UPSTREAM_QUEUE_WAIT.observe(waited, upstream=self.name, priority=PRIORITY_NAMES[entry[0]])
+        record_stage(f"queue_{self.name}", waited)
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[int] = None):
+        if priority is None:
+            flight = _flight_priority.get()
+            await self._acquire(current_priority(), flight)
+        else:
+            await self._acquire(priority)
+        self.stats["admitted"] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._hold_avg = 0.9 * self._hold_avg + 0.1 * (time.perf_counter() - start)
+            self._release()
+
+    def has_capacity(self) -> bool:
+        return self.active < self.limit and not self._waiters
+
+    def load(self) -> float:
+        """Calls holding or waiting for a slot, per slot."""
+        return (self.active + len(self._waiters)) / max(self.limit, 1)
+
+    def wait_p95(self) -> float:
+        if not self._waits:
+            return 0.0
+        ordered = sorted(self._waits)
+        return ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "limit": self.limit, "active": self.active, "queued_now": len(self._waiters),
+                "hold_avg_ms": round(self._hold_avg * 1000, 1)}
+
+
+upstream_limiters = {
+    name: UpstreamLimiter(name, limit, UPSTREAM_QUEUE_MAX, UPSTREAM_QUEUE_WAIT_SECONDS)
+    for name, limit in UPSTREAM_LIMITS.items()
 }
 
-Guidelines:
-- `response` should be 1–3 short sentences, under 50 words total.
-- Tone: warm, steady, human, never robotic or overly cheerful.
-- No emojis, no markdown.
-- If the user sounds at risk, set "urgency" to "high" and choose a gentle, validating `response`, but still avoid crisis instructions.
 
-Do NOT include any text outside the JSON object. No explanations, no comments, no markdown."""
+def admit(upstream: str):
+    """Hold a slot for one call to `upstream` at the current request's priority."""
+    return upstream_limiters[upstream].slot()
 
-    # Build messages array
-    messages = [{"role": "system", "content": system_prompt}]
-    
-    # Add summary context if provided
-    if request.summary:
-        messages.append({
-            "role": "system",
-            "content": f"Conversation summary so far: {request.summary}"
-        })
-    
-    # Add conversation history
-    for msg in request.history:
-        messages.append({"role": msg.role, "content": msg.content})
-    
+
+def upstream_failure(e: Exception, detail: str) -> HTTPException:
+    """
+    Map an exception from an upstream call to what the client should see:
+    our own HTTP errors pass through, upstream rate limits become 429 with
+    the upstream's Retry-After, anything else a 500 with `detail`.
+    """
+    if isinstance(e, HTTPException):
+        return e
+    if is_openai_error(e, "RateLimitError"):
+        return HTTPException(status_code=429, detail="Upstream rate limit, please retry shortly",
+                             headers={"Retry-After": retry_after_header(e.response.headers)})
+    return HTTPException(status_code=500, detail=detail)
+
+
+def is_openai_error(e: BaseException, *names: str) -> bool:
+    """isinstance against SDK exception types, without importing the SDK."""
+    sdk = sys.modules.get("openai")
+    return sdk is not None and isinstance(e, tuple(getattr(sdk, name) for name in names))
+
+
+def retry_after_header(headers) -> str:
     try:
-        # Call OpenAI with JSON mode
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini",
-            response_format={"type": "json_object"},
-            messages=messages,
-            temperature=0.7,
-        )
-        
-        content = completion.choices[0].message.content
-        data = json.loads(content)
-        
-        # Validate response structure
-        response = AnginTurnResponse(**data)
-        return response
-        
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}")
-        print(f"Raw content: {content}")
-        raise HTTPException(status_code=500, detail="Invalid JSON response from AI")
-    except Exception as e:
-        print(f"Angin turn error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to process conversation turn")
+        return str(max(1, math.ceil(float(headers.get("retry-after", "1")))))
+    except ValueError:
+        return "1"
 
 
 # ============================================================================
-# Unified Therapy Flow: Audio → STT → Therapy Agent → TTS → Audio
+# Deadlines, Jittered Retries & Hedged Requests
 # ============================================================================
 
-class AnginCallRequest(BaseModel):
-    """Request for full therapy call flow with audio input"""
-    summary: Optional[str] = None
-    history: List[Message] = Field(default_factory=list)
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "30"))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.25"))
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") == "1"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
 
+# Absolute time.monotonic() by which the current request must be answered
+_request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
 
-class AnginCallResponse(BaseModel):
-    """Response with therapy analysis and metadata"""
-    transcript: str
-    mood: str
-    urgency: str
-    strategy: str
-    response_text: str
-    next_action: str
+HEDGES = Counter("angin_hedged_calls_total", "Hedge attempts by stage and outcome (sent, won)", ("stage", "outcome"))
+RETRIES = Counter("angin_upstream_retries_total", "Upstream attempts retried after a transient error", ("stage",))
+DEADLINES_EXCEEDED = Counter("angin_deadline_exceeded_total", "Stages cut off by the request deadline", ("stage",))
 
 
-@app.post("/angin/call")
-async def angin_call(
-    audio: UploadFile = File(...),
-    summary: Optional[str] = None,
-    history: Optional[str] = None  # JSON string of message history
+class DeadlineExceeded(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=504, detail="Request took too long, please try again")
+
+
+class UpstreamHTTPError(HTTPException):
+    """An upstream answered with an error status (kept in `upstream_status`)."""
+
+    def __init__(self, upstream_status: int, status_code: int, detail: str, headers: Optional[dict] = None):
+        super().__init__(status_code=status_code, detail=detail, headers=headers)
+        self.upstream_status = upstream_status
+
+
+def start_deadline(seconds: float = REQUEST_DEADLINE_SECONDS, restart: bool = False):
+    """Give the current request a deadline; an outer one already running is kept."""
+    if restart or _request_deadline.get() is None:
+        _request_deadline.set(time.monotonic() + seconds)
+
+
+def remaining_budget() -> Optional[float]:
+    deadline = _request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def attempt_timeout(default: float = HTTP_READ_TIMEOUT) -> float:
+    """Timeout for one upstream attempt: what is left of the deadline, capped."""
+    left = remaining_budget()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(left, default)
+
+
+def is_retryable(e: BaseException) -> bool:
+    if isinstance(e, UpstreamHTTPError):
+        return e.upstream_status in RETRYABLE_STATUSES
+    return (isinstance(e, httpx.TransportError)
+            or is_openai_error(e, "APIConnectionError", "InternalServerError", "RateLimitError"))
+
+
+class LatencyTracker:
+    """Recent attempt latencies for one stage; the hedge fires past their percentile."""
+
+    def __init__(self, window: int = HEDGE_WINDOW):
+        self.samples: deque = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+        if len(self.samples) < max(min_samples, 1):
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+    def hedge_delay(self) -> Optional[float]:
+        value = self.percentile(HEDGE_PERCENTILE)
+        return None if value is None else max(value, HEDGE_MIN_DELAY)
+
+
+latency_trackers = {name: LatencyTracker() for name in ("stt", "analyze", "llm", "llm_ttft", "summary", "tts")}
+
+
+async def _hedged(name: str, attempt, hedge: bool, discard):
+    """
+    Run `attempt()`; if it is still going after the stage's hedge delay and
+    its upstream has a free slot, start a second one. The first success
+    wins, the other attempt is cancelled (or `discard`ed if it also finished).
+    """
+    tracker = latency_trackers[name]
+    delay = tracker.hedge_delay() if hedge and HEDGE_ENABLED else None
+    deadline = _request_deadline.get()
+    started = {}
+    tasks, winner, errors = [], None, []
+
+    def launch():
+        task = asyncio.ensure_future(attempt())
+        started[task] = time.perf_counter()
+        tasks.append(task)
+        return task
+
+    pending = {launch()}
+    first_start = time.perf_counter()
+    try:
+        while pending:
+            waits = []
+            if deadline is not None:
+                waits.append(max(deadline - time.monotonic(), 0))
+            if delay is not None and len(tasks) == 1:
+                waits.append(max(first_start + delay - time.perf_counter(), 0))
+            done, pending = await asyncio.wait(pending, timeout=min(waits) if waits else None,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    winner = task
+                    tracker.observe(time.perf_counter() - started[task])
+                    if task is not tasks[0]:
+                        HEDGES.inc(stage=name, outcome="won")
+                    return task.result()
+                errors.append(task.exception())
+            if done:
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                DEADLINES_EXCEEDED.inc(stage=name)
+                raise DeadlineExceeded()
+            if len(tasks) == 1:
+                if upstream_limiters[STAGE_UPSTREAMS[name]].has_capacity():
+                    HEDGES.inc(stage=name, outcome="sent")
+                    pending.add(launch())
+                else:
+                    delay = None  # saturated: don't add load, just wait
+        raise errors[0]
+    finally:
+        for task in tasks:
+            if task is winner:
+                continue
+            if not task.done():
+                task.cancel()
+            if discard is not None:
+                task.add_done_callback(
+                    lambda t: t.cancelled() or t.exception() or asyncio.ensure_future(discard(t.result())))
+            else:
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def call_upstream(name: str, attempt, hedge: bool = False, discard=None):
+    """
+    Make one logical upstream call for stage `name` within the request
+    deadline. `attempt()` performs a single try (admission slot included).
+    Transient failures are retried with full-jitter backoff while the
+    remaining budget allows; with `hedge`, slow attempts are hedged.
+    `discard(result)` releases the result of an attempt that lost the race.
+    """
+    for retry in range(UPSTREAM_RETRIES + 1):
+        try:
+            return await _hedged(name, attempt, hedge, discard)
+        except Exception as e:
+            if retry == UPSTREAM_RETRIES or not is_retryable(e):
+                raise
+            backoff = random.uniform(0, RETRY_BASE_DELAY * 2 ** retry)
+            left = remaining_budget()
+            if left is not None and left <= backoff:
+                raise
+            print(f"Retrying {name} after {e!r}")
+            RETRIES.inc(stage=name)
+            await asyncio.sleep(backoff)
+
+
+class OpenedStream:
+    """
+    An upstream stream that has produced its first useful item. Holds the
+    admission slot and the connection until closed; iterating replays the
+    items read so far and then continues with the rest.
+    """
+
+    def __init__(self):
+        self.resources = AsyncExitStack()
+        self.head: list = []
+        self.rest = None
+
+    async def __aiter__(self):
+        for item in self.head:
+            yield item
+        async for item in self.rest:
+            yield item
+
+    async def aclose(self):
+        await self.resources.aclose()
+
+
+async def open_stream(upstream: str, start, ready=lambda item: True) -> OpenedStream:
+    """
+    Take a slot on `upstream`, start a stream with `start()` (returning an
+    async iterable and its async close function) and read up to the first
+    item that satisfies `ready`, so hedging races on time to first output.
+    """
+    opened = OpenedStream()
+    try:
+        await opened.resources.enter_async_context(admit(upstream))
+        iterable, close = await start()
+        opened.resources.push_async_callback(close)
+        opened.rest = iterable.__aiter__()
+        async for item in opened.rest:
+            opened.head.append(item)
+            if ready(item):
+                break
+        return opened
+    except BaseException:
+        await opened.aclose()
+        raise
+
+
+# ============================================================================
+# Audio Output Formats: negotiated per request, requested or transcoded
+# ============================================================================
+
+class AudioFormat(BaseModel):
+    name: str
+    media_type: str
+    # ElevenLabs `output_format` to request, or None for its default
+    upstream: Optional[str] = None
+    # Encoder arguments when the format is transcoded from the default mp3
+    ffmpeg: Optional[List[str]] = None
+
+
+AUDIO_FORMATS = {f.name: f for f in (
+    AudioFormat(name="mp3_44100_128", media_type="audio/mpeg"),
+    AudioFormat(name="mp3_44100_64", media_type="audio/mpeg", upstream="mp3_44100_64"),
+    AudioFormat(name="mp3_22050_32", media_type="audio/mpeg", upstream="mp3_22050_32"),
+    AudioFormat(name="opus_48000_32", media_type="audio/ogg",
+                ffmpeg=["-c:a", "libopus", "-b:a", "32k", "-f", "ogg"]),
+    AudioFormat(name="opus_24000_16", media_type="audio/ogg",
+                ffmpeg=["-c:a", "libopus", "-b:a", "16k", "-ar", "24000", "-application", "voip", "-f", "ogg"]),
+)}
+DEFAULT_AUDIO_FORMAT = AUDIO_FORMATS["mp3_44100_128"]
+
+# Accept media types → (normal, Save-Data) format
+AUDIO_MEDIA_TYPES = {
+    "audio/mpeg": ("mp3_44100_128", "mp3_22050_32"),
+    "audio/mp3": ("mp3_44100_128", "mp3_22050_32"),
+    "audio/ogg": ("opus_48000_32", "opus_24000_16"),
+    "audio/opus": ("opus_48000_32", "opus_24000_16"),
+}
+
+AUDIO_FORMAT_NEGOTIATED = Counter("angin_audio_format_negotiated_total",
+                                  "Audio output formats picked for clients", ("format",))
+
+
+def audio_format_available(fmt: AudioFormat) -> bool:
+    return fmt.ffmpeg is None or FFMPEG is not None
+
+
+def parse_accept(accept: Optional[str]) -> List[str]:
+    """Media types from an Accept header, best first (q=0 dropped, ties keep order)."""
+    ranked = []
+    for i, part in enumerate((accept or "").split(",")):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type and q > 0:
+            ranked.append((-q, i, media_type.lower()))
+    return [media_type for _, _, media_type in sorted(ranked)]
+
+
+def negotiate_audio_format(requested: Optional[str], accept: Optional[str],
+                           save_data: Optional[str] = None) -> AudioFormat:
+    """
+    Pick the output format: an explicit `format` query parameter wins, then
+    the first audio type in Accept we can produce (its low-bitrate variant
+    under `Save-Data: on`), else the ElevenLabs default mp3.
+    """
+    fmt = _negotiate_audio_format(requested, accept, save_data)
+    AUDIO_FORMAT_NEGOTIATED.inc(format=fmt.name)
+    return fmt
+
+
+def _negotiate_audio_format(requested: Optional[str], accept: Optional[str],
+                            save_data: Optional[str]) -> AudioFormat:
+    if requested:
+        fmt = AUDIO_FORMATS.get(requested)
+        if fmt is None:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown format; supported: {', '.join(AUDIO_FORMATS)}")
+        if not audio_format_available(fmt):
+            raise HTTPException(status_code=406, detail=f"Format {requested} needs ffmpeg on the server")
+        return fmt
+    low = (save_data or "").strip().lower() == "on"
+    for media_type in parse_accept(accept):
+        if media_type in AUDIO_MEDIA_TYPES:
+            fmt = AUDIO_FORMATS[AUDIO_MEDIA_TYPES[media_type][low]]
+            if audio_format_available(fmt):
+                return fmt
+    return AUDIO_FORMATS["mp3_22050_32"] if low else DEFAULT_AUDIO_FORMAT
+
+
+async def transcode_tts(text: str, fmt: AudioFormat, key: str) -> bytes:
+    """Encode the default synthesis of `text` as `fmt` and cache the variant."""
+    base = await open_tts(text)
+    source = b"".join([chunk async for chunk in base.chunks()])
+    async with stage("transcode"):
+        audio = await run_ffmpeg(["-f", "mp3", "-i", "pipe:0", *fmt.ffmpeg, "pipe:1"], source)
+    if TTS_CACHE_ENABLED:
+        await tts_cache.put(key, audio)
+    return audio
+
+
+# ============================================================================
+# ElevenLabs TTS Streaming
+# ============================================================================
+
+async def open_tts_stream(text: str, output_format: Optional[str] = None) -> httpx.Response:
+    """
+    Start an ElevenLabs streaming synthesis for `text`. The "tts" stage
+    covers the time until the upstream starts sending audio.
+
+    Returns the upstream response with its body still unread; the caller
+    owns it and must close it (relay_tts_stream does this).
+    """
+    request = upstreams.eleven.build_request(
+        "POST",
+        f"/v1/text-to-speech/{ELEVEN_VOICE_ID}/stream",
+        params={"output_format": output_format} if output_format else None,
+        headers={
+            "xi-api-key": ELEVEN_API_KEY,
+            "Accept": "audio/mpeg",
+        },
+        json={
+            "text": text,
+            "model_id": ELEVEN_MODEL_ID,
+        },
+        timeout=httpx.Timeout(attempt_timeout(), connect=HTTP_CONNECT_TIMEOUT),
+    )
+    async with stage("tts"):
+        r = await upstreams.eleven.send(request, stream=True)
+
+        print("ElevenLabs status:", r.status_code)
+        if r.status_code != 200:
+            body = await r.aread()
+            await r.aclose()
+            print("ElevenLabs error body:", body[:500])
+            if r.status_code == 429:
+                raise UpstreamHTTPError(429, 429, "TTS rate limit, please retry shortly",
+                                        headers={"Retry-After": retry_after_header(r.headers)})
+            raise UpstreamHTTPError(r.status_code, 500, "TTS generation failed")
+    record_tts_usage(text)
+    return r
+
+
+async def relay_tts_stream(r: httpx.Response):
+    """
+    Forward upstream audio chunk by chunk. Nothing is accumulated, so each
+    chunk can be freed as soon as it has been written to the client.
+    """
+    try:
+        async for chunk in r.aiter_bytes():
+            yield chunk
+    finally:
+        await r.aclose()
+
+
+# ============================================================================
+# TTS Audio Cache: in-memory LRU in front of a shared SQLite tier
+# ============================================================================
+
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "1") == "1"
+TTS_CACHE_PATH = os.getenv("TTS_CACHE_PATH", os.path.join(BASE_DIR, ".cache", "tts_cache.sqlite3"))
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+TTS_CACHE_MAX_ENTRY_BYTES = int(os.getenv("TTS_CACHE_MAX_ENTRY_BYTES", str(2 * 1024 * 1024)))
+TTS_CACHE_TTL_SECONDS = float(os.getenv("TTS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def normalize_tts_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def tts_cache_key(text: str, voice_id: Optional[str] = None, model_id: Optional[str] = None,
+                  audio_format: Optional[str] = None) -> str:
+    """Content address for synthesized audio: (voice, model, normalized text[, format])."""
+    parts = (voice_id or ELEVEN_VOICE_ID, model_id or ELEVEN_MODEL_ID, normalize_tts_text(text))
+    if audio_format and audio_format != DEFAULT_AUDIO_FORMAT.name:
+        # The default keeps its original key, so existing entries stay valid
+        parts += (audio_format,)
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Two-tier audio cache.
+
+    The memory tier is a per-process LRU bounded by bytes. The disk tier is
+    a SQLite file in WAL mode, so every uvicorn worker on the host shares it
+    safely; it is bounded by total bytes (least recently used rows go first)
+    and entries expire after TTS_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, path: str, memory_bytes: int, disk_bytes: int, ttl: float):
+        self.path = path
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_used = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    # -- SQLite tier (blocking; always called via asyncio.to_thread) --------
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS tts_audio ("
+                " key TEXT PRIMARY KEY, audio BLOB NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS tts_audio_accessed ON tts_audio (accessed)")
+            self._db = db
+        return self._db
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        """(audio, created) for a live entry, or None."""
+        now = time.time()
+        with self._db_lock:
+            db = self._conn()
+            row = db.execute(
+                "SELECT audio, created FROM tts_audio WHERE key = ? AND created > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row:
+                db.execute("UPDATE tts_audio SET accessed = ? WHERE key = ?", (now, key))
+                db.commit()
+        return row
+
+    def _disk_put(self, key: str, audio: bytes):
+        now = time.time()
+        with self._db_lock, self._conn() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO tts_audio (key, audio, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, audio, len(audio), now, now),
+            )
+            expired = db.execute("DELETE FROM tts_audio WHERE created <= ?", (now - self.ttl,)).rowcount
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM tts_audio").fetchone()[0]
+            evicted = 0
+            if total > self.disk_bytes:
+                for row_key, size in db.execute(
+                    "SELECT key, size FROM tts_audio ORDER BY accessed"
+                ).fetchall():
+                    if total <= self.disk_bytes:
+                        break
+                    db.execute("DELETE FROM tts_audio WHERE key = ?", (row_key,))
+                    total -= size
+                    evicted += 1
+        self.stats["evictions"] += expired + evicted
+
+    def _disk_recent(self, limit_bytes: int) -> List[tuple]:
+        rows, total = [], 0
+        with self._db_lock:
+            for key, audio, created in self._conn().execute(
+                "SELECT key, audio, created FROM tts_audio WHERE created > ? ORDER BY accessed DESC",
+                (time.time() - self.ttl,),
+            ):
+                if total + len(audio) > limit_bytes:
+                    break
+                rows.append((key, audio, created))
+                total += len(audio)
+        return rows
+
+    # -- memory tier ------------------------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        audio, expires_at = entry
+        if expires_at <= time.time():
+            self._memory_drop(key)
+            return None
+        self._memory.move_to_end(key)
+        return audio
+
+    def _memory_put(self, key: str, audio: bytes, expires_at: float):
+        if len(audio) > self.memory_bytes:
+            return
+        self._memory_drop(key)
+        self._memory[key] = (audio, expires_at)
+        self._memory_used += len(audio)
+        while self._memory_used > self.memory_bytes:
+            old_key, _ = next(iter(self._memory.items()))
+            self._memory_drop(old_key)
+            self.stats["evictions"] += 1
+
+    def _memory_drop(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_used -= len(entry[0])
+
+    # -- public API -------------------------------------------------------
+
+    async def get(self, key: str) -> Optional[bytes]:
+        audio = self._memory_get(key)
+        if audio is not None:
+            self.stats["memory_hits"] += 1
+            return audio
+        try:
+            row = await asyncio.to_thread(self._disk_get, key)
+        except sqlite3.Error as e:
+            print(f"TTS cache read error: {e}")
+            row = None
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["disk_hits"] += 1
+        audio, created = row
+        # Expires when the disk row does, not a full TTL from now
+        self._memory_put(key, audio, created + self.ttl)
+        return audio
+
+    async def put(self, key: str, audio: bytes):
+        self._memory_put(key, audio, time.time() + self.ttl)
+        try:
+            await asyncio.to_thread(self._disk_put, key, audio)
+            self.stats["stores"] += 1
+        except sqlite3.Error as e:
+            print(f"TTS cache write error: {e}")
+
+    async def preload(self) -> int:
+        """Open the disk tier and pull its most recently used entries into memory."""
+        try:
+            rows = await asyncio.to_thread(self._disk_recent, self.memory_bytes)
+        except sqlite3.Error as e:
+            print(f"TTS cache preload error: {e}")
+            return 0
+        # Least recent first, so the LRU order matches the disk tier
+        for key, audio, created in reversed(rows):
+            self._memory_put(key, audio, created + self.ttl)
+        return len(rows)
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_used,
+        }
+
+
+tts_cache = TTSCache(TTS_CACHE_PATH, TTS_CACHE_MEMORY_BYTES, TTS_CACHE_DISK_BYTES, TTS_CACHE_TTL_SECONDS)
+
+
+class TTSFlight:
+    """
+    One upstream synthesis shared by every concurrent request for the same
+    text. A pump task reads the upstream stream and fans each chunk out to
+    every subscriber's queue; subscribers that join late first replay what
+    has arrived so far. The finished audio is written to the TTS cache (when enabled).
+
+    The replay buffer doubles as the cache copy, so once it outgrows a cache
+    entry it is dropped and the flight stops accepting new subscribers.
+    """
+
+    _END = object()
+
+    def __init__(self, key: str, text: str, output_format: Optional[str] = None):
+        self.key = key
+        self.history: Optional[list] = []
+        self.size = 0
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers: List[asyncio.Queue] = []
+        self.opened = asyncio.get_running_loop().create_future()
+        self.task = asyncio.create_task(self._pump(text, output_format))
+
+    def add_done_callback(self, fn):
+        self.task.add_done_callback(fn)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        for chunk in self.history or ():
+            queue.put_nowait(chunk)
+        if self.finished:
+            queue.put_nowait(self._END)
+        self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self.subscribers:
+            self.subscribers.remove(queue)
+
+    async def follow(self, queue: asyncio.Queue):
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is self._END:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                yield chunk
+        finally:
+            self.unsubscribe(queue)
+
+    def _finish(self, error: Optional[BaseException] = None):
+        self.finished = True
+        self.error = error
+        for queue in self.subscribers:
+            queue.put_nowait(self._END)
+
+    async def _pump(self, text: str, output_format: Optional[str]):
+        async def start():
+            r = await open_tts_stream(text, output_format)
+            return relay_tts_stream(r), r.aclose
+
+        try:
+            # Hedged on time to first audio; the slot is held until the stream ends
+            stream = await call_upstream("tts", lambda: open_stream("elevenlabs", start),
+                                         hedge=True, discard=OpenedStream.aclose)
+        except Exception as e:
+            self.opened.set_exception(e)
+            self._finish(e)
+            return
+        self.opened.set_result(None)
+        try:
+            async for chunk in stream:
+                self.size += len(chunk)
+                if self.history is not None:
+                    if self.size <= TTS_CACHE_MAX_ENTRY_BYTES:
+                        self.history.append(chunk)
+                    else:
+                        self.history = None
+                        tts_flights.forget(self.key, self)
+                for queue in self.subscribers:
+                    queue.put_nowait(chunk)
+        except Exception as e:
+            print("TTS stream error:", e)
+            self._finish(e)
+            return
+        finally:
+            await stream.aclose()
+        self._finish()
+        if self.history and TTS_CACHE_ENABLED:
+            await tts_cache.put(self.key, b"".join(self.history))
+
+
+class TTSAudio:
+    """
+    Audio for one piece of text: either a cache hit (`cached` is set) or a
+    subscription to a live (possibly shared) upstream synthesis.
+    """
+
+    def __init__(self, key: str, cached: Optional[bytes] = None, flight: Optional[TTSFlight] = None,
+                 queue: Optional[asyncio.Queue] = None, media_type: str = "audio/mpeg"):
+        self.key = key
+        self.cached = cached
+        self.flight = flight
+        self.queue = queue
+        self.media_type = media_type
+
+    async def chunks(self):
+        if self.cached is not None:
+            yield self.cached
+            return
+        async for chunk in self.flight.follow(self.queue):
+            yield chunk
+
+
+async def open_tts(text: str, fmt: AudioFormat = DEFAULT_AUDIO_FORMAT) -> TTSAudio:
+    """
+    Look `text` up in the TTS cache; on a miss, join an identical synthesis
+    already in flight or start one. Raises if the upstream rejects it.
+
+    Formats ElevenLabs can't produce are transcoded from the default
+    synthesis, which is cached too, so each variant is encoded once.
+    """
+    key = tts_cache_key(text, audio_format=fmt.name)
+    if TTS_CACHE_ENABLED:
+        cached = await tts_cache.get(key)
+        if cached is not None:
+            return TTSAudio(key, cached=cached, media_type=fmt.media_type)
+
+    if fmt.ffmpeg is not None:
+        coalesce_key = key if COALESCE_REQUESTS else None
+        audio = await transcode_flights.do(coalesce_key, lambda: transcode_tts(text, fmt, key))
+        return TTSAudio(key, cached=audio, media_type=fmt.media_type)
+
+    flight = tts_flights.join(key if COALESCE_REQUESTS else None, lambda: TTSFlight(key, text, fmt.upstream))
+    queue = flight.subscribe()
+    try:
+        await asyncio.shield(flight.opened)
+    except BaseException:
+        flight.unsubscribe(queue)
+        raise
+    return TTSAudio(key, flight=flight, queue=queue, media_type=fmt.media_type)
+
+
+def audio_response(audio: bytes, range_header: Optional[str], headers: Optional[dict] = None,
+                   media_type: str = "audio/mpeg") -> Response:
+    """Serve complete audio bytes, honouring a single `Range: bytes=` request."""
+    headers = {"Accept-Ranges": "bytes", **(headers or {})}
+    total = len(audio)
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", (range_header or "").strip())
+    if not match or match.groups() == ("", ""):
+        return Response(content=audio, media_type=media_type, headers=headers)
+
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), total - 1) if last else total - 1
+    else:
+        start, end = max(total - int(last), 0), total - 1
+    if start >= total or start > end:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{total}"})
+    return Response(
+        content=audio[start:end + 1],
+        status_code=206,
+        media_type=media_type,
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{total}"},
+    )
+
+
+@app.get("/speak")
+async def speak(
+    text: str = Query(..., max_length=500),
+    format: Optional[str] = None,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    accept: Optional[str] = Header(None),
+    save_data: Optional[str] = Header(None),
+):
+    """
+    Proxy to ElevenLabs: streams raw audio for the given text, audio/mpeg
+    unless `format` (see AUDIO_FORMATS) or the Accept header asks for
+    another encoding; `Save-Data: on` picks a low-bitrate variant.
+    Repeated text is served from the TTS cache (with Range support).
+    """
+    if not ELEVEN_API_KEY:
+        print("No ELEVENLABS_API_KEY set")
+        raise HTTPException(status_code=500, detail="ELEVENLABS_API_KEY not set")
+
+    # Standalone synthesis (greetings, prefetch) yields to live call turns
+    _request_priority.set(PRIORITY_PREFETCH)
+    fmt = negotiate_audio_format(format, accept, save_data)
+    tts = await open_tts(text, fmt)
+    headers = {"Vary": "Accept, Save-Data"}
+    if tts.cached is not None:
+        return audio_response(tts.cached, range_header, headers, tts.media_type)
+
+    # IMPORTANT: raw audio (audio/mpeg by default) so Expo AV can play it;
+    # streamed so playback can start on the first chunk
+    return StreamingResponse(tts.chunks(), media_type=tts.media_type, headers=headers)
+
+
+# ============================================================================
+# Backchannel Fillers: short clips that cover STT + LLM latency
+# ============================================================================
+
+FILLERS_ENABLED = os.getenv("FILLERS_ENABLED", "1") == "1"
+
+# Acknowledgements keyed by the (mood, strategy) of the call so far; None
+# matches anything. Kept short so a clip never talks over the reply.
+FILLER_LINES = {
+    (None, None): ("Mm, I hear you.", "Take your time.", "Mm-hm. I'm listening."),
+    ("anxious", None): ("Okay. I'm right here with you.",),
+    ("sad", None): ("Mm. That sounds really hard.",),
+    ("overwhelmed", None): ("Okay. One thing at a time.",),
+    ("numb", None): ("Mm. Take all the time you need.",),
+    ("angry", None): ("I hear how frustrating that is.",),
+    (None, "grounding"): ("Okay. Let's slow down together.",),
+    (None, "clarify"): ("Mm, let me make sure I follow.",),
+    (None, "close"): ("Thank you for sharing that with me.",),
+}
+
+FIRST_AUDIO_LATENCY = Histogram("angin_first_audio_seconds",
+                                "End of user speech to first audio sent, by what was sent",
+                                ("endpoint", "source"))
+
+
+class FillerLibrary:
+    """
+    Filler clips synthesized once during warmup (through the TTS cache, so
+    a restart on the same disk costs nothing) and then served from memory.
+    """
+
+    def __init__(self, lines: dict):
+        self.lines = lines
+        self.clips: dict = {}
+        self._served = 0
+
+    async def load(self):
+        async def synthesize(text: str) -> Optional[bytes]:
+            try:
+                tts = await open_tts(text)
+                return b"".join([chunk async for chunk in tts.chunks()])
+            except Exception as e:
+                print(f"Filler synthesis failed for {text!r}: {e!r}")
+                return None
+
+        for key, texts in self.lines.items():
+            audio = await asyncio.gather(*(synthesize(text) for text in texts))
+            self.clips[key] = [clip for clip in audio if clip]
+
+    def pick(self, mood: Optional[str] = None, strategy: Optional[str] = None) -> Optional[bytes]:
+        """The most specific clip for (mood, strategy), rotating between variants."""
+        for key in ((mood, strategy), (mood, None), (None, strategy), (None, None)):
+            variants = self.clips.get(key)
+            if variants:
+                self._served += 1
+                return variants[self._served % len(variants)]
+        return None
+
+    def snapshot(self) -> dict:
+        clips = [clip for variants in self.clips.values() for clip in variants]
+        return {"clips": len(clips), "bytes": sum(map(len, clips)), "served": self._served}
+
+
+filler_library = FillerLibrary(FILLER_LINES)
+
+
+def first_audio(endpoint: str, source: str, since: float):
+    """Record the gap from end of user speech (`since`) to audio going out."""
+    elapsed = time.perf_counter() - since
+    FIRST_AUDIO_LATENCY.observe(elapsed, endpoint=endpoint, source=source)
+    record_stage(f"first_audio_{source}", elapsed)
+
+
+# ============================================================================
+# Upload Limits: spooled uploads with size and duration caps
+# ============================================================================
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))  # OpenAI STT's own cap
+UPLOAD_MAX_SECONDS = float(os.getenv("UPLOAD_MAX_SECONDS", "600"))
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+BATCH_MAX_REQUEST_BYTES = int(os.getenv("BATCH_MAX_REQUEST_BYTES", str(1024 * 1024 * 1024)))
+FORM_OVERHEAD_BYTES = 1024 * 1024  # history/summary fields and multipart framing
+
+UPLOADS_REJECTED = Counter("angin_uploads_rejected_total", "Uploads refused by size or duration limits", ("reason",))
+
+# Uploaded files stay in memory up to this size, then spill to a temp file
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_BYTES
+
+# Audio handed to STT: raw bytes (WebSocket, ingest segments) or a
+# rewindable file such as a spooled upload, which is streamed, never copied
+AudioSource = Union[bytes, BinaryIO]
+
+
+def body_limit(path: str) -> int:
+    if path.startswith("/analyze/jobs"):
+        return BATCH_MAX_REQUEST_BYTES
+    return UPLOAD_MAX_BYTES + FORM_OVERHEAD_BYTES
+
+
+class BodyLimitMiddleware:
+    """
+    Pure ASGI middleware that caps request bodies while they arrive: an
+    oversized Content-Length is refused before reading anything, and a body
+    that keeps going past the cap is cut off with 413 mid-stream, so nothing
+    beyond the limit is ever spooled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = body_limit(scope["path"])
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared and declared.isdigit() and int(declared) > limit:
+            UPLOADS_REJECTED.inc(reason="content_length")
+            response = JSONResponse({"detail": "Upload too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    UPLOADS_REJECTED.inc(reason="body_size")
+                    # FastAPI re-raises HTTPExceptions from body parsing as-is
+                    raise HTTPException(status_code=413, detail="Upload too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+app.add_middleware(BodyLimitMiddleware)
+
+# Allow dev origins (Expo web / device via LAN). Added last so it is the
+# outermost layer and early responses (e.g. the 413 above) carry CORS headers.
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],   # keep wide-open for dev, tighten later
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+def rewind(audio: AudioSource) -> AudioSource:
+    if not isinstance(audio, bytes):
+        audio.seek(0)
+    return audio
+
+
+def audio_digest(audio: AudioSource) -> str:
+    """SHA-256 of the audio, reading files in chunks. Blocking for files."""
+    if isinstance(audio, bytes):
+        return hashlib.sha256(audio).hexdigest()
+    digest = hashlib.sha256()
+    rewind(audio)
+    for chunk in iter(lambda: audio.read(1024 * 1024), b""):
+        digest.update(chunk)
+    rewind(audio)
+    return digest.hexdigest()
+
+
+def wav_duration(audio: BinaryIO) -> Optional[float]:
+    """Duration from a WAV header; None for other containers. Blocking."""
+    try:
+        if rewind(audio).read(12)[8:12] != b"WAVE":
+            return None
+        rewind(audio)
+        with wave.open(audio, "rb") as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return None
+    finally:
+        rewind(audio)
+
+
+# ============================================================================
+# Audio Preprocessing: decode → VAD trim → mono 16 kHz → compact re-encode
+# ============================================================================
+
+AUDIO_PREPROCESS = os.getenv("AUDIO_PREPROCESS", "0") == "1"
+AUDIO_TARGET_RATE = 16000
+AUDIO_VAD_FRAME_MS = 20
+AUDIO_VAD_PADDING_MS = int(os.getenv("AUDIO_VAD_PADDING_MS", "200"))
+AUDIO_VAD_FLOOR_DB = float(os.getenv("AUDIO_VAD_FLOOR_DB", "-45"))
+AUDIO_OPUS_BITRATE = os.getenv("AUDIO_OPUS_BITRATE", "24k")
+FFMPEG = shutil.which("ffmpeg")
+
+
+class AudioPreprocessStats:
+    def __init__(self):
+        self.clips = 0
+        self.skipped = 0
+        self.no_speech = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds_in = 0.0
+        self.seconds_out = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": AUDIO_PREPROCESS,
+            "ffmpeg": FFMPEG is not None,
+            **vars(self),
+            "bytes_saved": self.bytes_in - self.bytes_out,
+        }
+
+
+audio_stats = AudioPreprocessStats()
+
+
+async def run_ffmpeg(args: List[str], data: bytes) -> bytes:
+    proc = await asyncio.create_subprocess_exec(
+        FFMPEG, "-hide_banner", "-loglevel", "error", *args,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    out, err = await proc.communicate(data)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {err.decode(errors='replace')[:300]}")
+    return out
+
+
+def decode_wav(data: bytes) -> np.ndarray:
+    """Decode PCM WAV to mono float32 at AUDIO_TARGET_RATE (no ffmpeg needed)."""
+    with wave.open(io.BytesIO(data)) as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    dtype, scale, offset = {1: (np.uint8, 128.0, 128.0), 2: (np.int16, 32768.0, 0.0),
+                            4: (np.int32, 2147483648.0, 0.0)}[width]
+    samples = (np.frombuffer(raw, dtype=dtype).astype(np.float32) - offset) / scale
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != AUDIO_TARGET_RATE:
+        positions = np.arange(int(len(samples) * AUDIO_TARGET_RATE / rate)) * (rate / AUDIO_TARGET_RATE)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+
+def encode_wav(samples: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(AUDIO_TARGET_RATE)
+        w.writeframes((np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def trim_silence(samples: np.ndarray, rate: int = AUDIO_TARGET_RATE) -> np.ndarray:
+    """
+    Energy-based VAD over 20 ms frames. Returns the span from the first to
+    the last voiced frame (plus padding), or an empty array if nothing is
+    louder than the adaptive threshold.
+    """
+    frame = rate * AUDIO_VAD_FRAME_MS // 1000
+    count = len(samples) // frame
+    if count == 0:
+        return samples[:0]
+    frames = samples[:count * frame].reshape(count, frame)
+    db = 20 * np.log10(np.sqrt(np.mean(frames ** 2, axis=1)) + 1e-10)
+    noise_floor = np.percentile(db, 10)
+    threshold = max(AUDIO_VAD_FLOOR_DB, min(noise_floor + 6, db.max() - 20))
+    voiced = np.flatnonzero(db > threshold)
+    if voiced.size == 0:
+        return samples[:0]
+    pad = AUDIO_VAD_PADDING_MS // AUDIO_VAD_FRAME_MS
+    start = max(voiced[0] - pad, 0) * frame
+    end = min(voiced[-1] + 1 + pad, count) * frame
+    return samples[start:end]
+
+
+async def preprocess_audio(audio_bytes: bytes, filename: str) -> Tuple[bytes, str]:
+    """
+    Shrink an upload before STT: trim leading/trailing silence, downmix to
+    mono 16 kHz and re-encode (Opus via ffmpeg, else 16-bit WAV).
+
+    Raises 400 for recordings with no speech so STT is never called for
+    them. Anything that can't be decoded is passed through untouched.
+    """
+    try:
+        if FFMPEG:
+            pcm = await run_ffmpeg(
+                ["-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(AUDIO_TARGET_RATE), "pipe:1"],
+                audio_bytes,
+            )
+            samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        elif audio_bytes[:4] == b"RIFF" and audio_bytes[8:12] == b"WAVE":
+            samples = await asyncio.to_thread(decode_wav, audio_bytes)
+        else:
+            audio_stats.skipped += 1
+            return audio_bytes, filename
+    except (RuntimeError, wave.Error, KeyError, ValueError, EOFError) as e:
+        print(f"Audio preprocess decode error: {e}")
+        audio_stats.skipped += 1
+        return audio_bytes, filename
+
+    if len(samples) > UPLOAD_MAX_SECONDS * AUDIO_TARGET_RATE:
+        UPLOADS_REJECTED.inc(reason="duration")
+        raise HTTPException(status_code=413, detail="Recording too long")
+    trimmed = await asyncio.to_thread(trim_silence, samples)
+    audio_stats.clips += 1
+    audio_stats.bytes_in += len(audio_bytes)
+    audio_stats.seconds_in += len(samples) / AUDIO_TARGET_RATE
+    if trimmed.size == 0:
+        audio_stats.no_speech += 1
+        raise HTTPException(status_code=400, detail="No speech detected")
+
+    if FFMPEG:
+        pcm = (np.clip(trimmed, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        encoded = await run_ffmpeg(
+            ["-f", "s16le", "-ar", str(AUDIO_TARGET_RATE), "-ac", "1", "-i", "pipe:0",
+             "-c:a", "libopus", "-b:a", AUDIO_OPUS_BITRATE, "-f", "ogg", "pipe:1"],
+            pcm,
+        )
+        out_name = "speech.ogg"
+    else:
+        encoded = await asyncio.to_thread(encode_wav, trimmed)
+        out_name = "speech.wav"
+
+    if len(encoded) >= len(audio_bytes):
+        encoded, out_name = audio_bytes, filename
+    audio_stats.bytes_out += len(encoded)
+    audio_stats.seconds_out += len(trimmed) / AUDIO_TARGET_RATE
+    return encoded, out_name
+
+
+async def read_audio_upload(audio: UploadFile) -> BinaryIO:
+    """
+    Validate an audio upload and return its spooled file, rewound. The body
+    was already capped by BodyLimitMiddleware while it streamed in; this
+    applies the per-file size and (for WAV) duration limits. The file is
+    closed when the request ends, so copy it if it must outlive that.
+    """
+    if not audio.content_type or not audio.content_type.startswith("audio/"):
+        raise HTTPException(status_code=400, detail="File must be audio type")
+    async with stage("upload_read"):
+        size = audio.size if audio.size is not None else await asyncio.to_thread(
+            lambda: audio.file.seek(0, os.SEEK_END))
+        duration = await asyncio.to_thread(wav_duration, audio.file) if size else None
+    if not size:
+        raise HTTPException(status_code=400, detail="Empty audio file")
+    if size > UPLOAD_MAX_BYTES:
+        UPLOADS_REJECTED.inc(reason="file_size")
+        raise HTTPException(status_code=413, detail="Upload too large")
+    if duration is not None and duration > UPLOAD_MAX_SECONDS:
+        UPLOADS_REJECTED.inc(reason="duration")
+        raise HTTPException(status_code=413, detail="Recording too long")
+    return rewind(audio.file)
+
+
+async def transcribe_audio(audio: AudioSource, filename: str) -> str:
+  """
+  Use OpenAI's speech-to-text model (gpt-4o-transcribe) to get the transcript.
+
+  A file is streamed to the upstream in chunks rather than read into memory
+  (preprocessing, when enabled, does need the whole recording).
+  """
+  async def run(audio: AudioSource, filename: str) -> str:
+    if AUDIO_PREPROCESS:
+      async with stage("preprocess"):
+        if not isinstance(audio, bytes):
+          audio = await asyncio.to_thread(rewind(audio).read)
+        audio, filename = await preprocess_audio(audio, filename)
+
+    try:
+      # Docs: Speech to text / gpt-4o-transcribe :contentReference[oaicite:1]{index=1}
+      async def attempt():
+        async with admit("openai"):
+          return await upstreams.openai.audio.transcriptions.create(
+              model="gpt-4o-transcribe",
+              file=(filename, rewind(audio)),
+              timeout=attempt_timeout(),
+          )
+
+      async with stage("stt"):
+        transcription = await call_upstream("stt", attempt)
+      return transcription.text
+    except Exception as e:
+      print("Transcription error:", e)
+      raise upstream_failure(e, "Failed to transcribe audio")
+
+  # Identical uploads in flight at the same time share one transcription,
+  # which reads the upload file of the request that started it
+  key = await asyncio.to_thread(audio_digest, audio) if COALESCE_REQUESTS else None
+  return await stt_flights.do(key, lambda: run(audio, filename), borrows=not isinstance(audio, bytes))
+
+
+# Chat prompts are built once: every call sends this exact prefix, so the
+# provider's prompt cache can reuse it, and only the transcript varies
+ANALYSIS_SYSTEM_PROMPT = """
+You are Angin, a calm, emotionally supportive companion.
+
+Your job is to help the user navigate stress, overwhelm, loneliness, confusion, guilt, self-comparison, and relationship stress. You are not a doctor or therapist and you never claim to be one. You do not provide medical, diagnostic, or crisis advice.
+
+STYLE
+- Speak in simple, human, natural language.
+- Use short paragraphs and short sentences.
+- Sound warm, grounded, and honest, not fake-positive.
+- Validate emotions before giving any guidance.
+- Avoid jargon and complicated theory unless the user explicitly asks for it.
+- You can gently challenge unhelpful thoughts, but never shame or blame the user.
+
+BEHAVIOUR
+- First, reflect back what you hear (emotion + situation) in your own words.
+- Then normalise the feeling where appropriate ("a lot of people feel this in your situation").
+- Then offer one small, concrete next step (a question, a reflection, a tiny action, or a reframing).
+- Ask one focused follow-up question to keep the user talking, unless they clearly want a one-off answer.
+
+BOUNDARIES
+- If the user talks about self-harm, wanting to die, or harming others, stay calm and supportive but encourage them to reach out to real-world help (friends, family, local services).
+- Do not give specific instructions about medication, diagnosis, or treatment.
+- Do not pretend to know their future or make guarantees about outcomes.
+
+TONE BY DEFAULT
+- Calm, soft, and respectful.
+- Keep the pace gentle: imagine you are speaking out loud and the words will be played as audio.
+- Most replies should be 2–6 short sentences.
+
+Your job is to:
+1. Infer their primary emotion and intensity.
+2. Summarize what they are worried or thinking about.
+3. Extract 2–4 high-level topics.
+4. Propose a short, gentle response for Angin to speak back.
+5. Put the spoken version of that response into `tts_text`.
+
+Return ONLY valid JSON with exactly this shape:
+
+{
+  "transcript": string,
+  "emotion": string,               // e.g. "anxious", "sad", "mixed", "calm"
+  "intensity": string,             // "low", "medium", "high"
+  "topics": string[],              // e.g. ["work", "relationships"]
+  "summary": string,               // 1–2 sentence summary
+  "suggested_response": string,    // 2–4 sentence written response
+  "tts_text": string               // 1–3 sentences, natural spoken style
+}
+"""
+ANALYSIS_PREFIX = ({"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},)
+
+
+async def analyze_transcript(transcript: str) -> dict:
+  """
+  Send transcript to a chat model and force JSON output.
+  """
+  async def run():
+    try:
+      model = model_policy.choose("analyze")
+
+      # Use JSON mode to guarantee valid JSON response :contentReference[oaicite:2]{index=2}
+      async def attempt():
+        async with admit("openai"):
+          completion = await upstreams.openai.chat.completions.create(
+              model=model,
+              response_format={"type": "json_object"},
+              messages=[*ANALYSIS_PREFIX, {"role": "user", "content": transcript}],
+              prompt_cache_key="angin-analyze",
+              timeout=attempt_timeout(),
+          )
+          record_completion_usage("analyze", model, completion.usage)
+          return completion
+
+      async with stage("analyze"):
+        completion = await call_upstream("analyze", attempt)
+
+      content = completion.choices[0].message.content
+      data = json.loads(content)
+
+      # Ensure original transcript is included
+      if "transcript" not in data:
+        data["transcript"] = transcript
+
+      return data
+    except Exception as e:
+      print("Analysis error:", e)
+      raise upstream_failure(e, "Failed to analyze transcript")
+
+  # The analysis depends only on the transcript, so concurrent duplicates
+  # share one completion (each caller gets its own copy to mutate)
+  key = hashlib.sha256(transcript.encode("utf-8")).hexdigest() if COALESCE_REQUESTS else None
+  return dict(await analysis_flights.do(key, run))
+
+
+@app.post("/analyze")
+async def analyze(
+    response: Response,
+    audio: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(None),
+):
+  """
+  Accepts an audio file and returns JSON analysis.
+
+  Expect multipart/form-data with field name `audio`. With an
+  `Idempotency-Key` header, a retry reuses the transcript and analysis.
+  """
+  # Offline analysis yields upstream capacity to live call turns
+  _request_priority.set(PRIORITY_BATCH)
+  audio_file = await read_audio_upload(audio)
+  checkpoint = await idempotency_store.open("/analyze", idempotency_key, audio_file)
+
+  # 1) Transcribe
+  transcript = await checkpoint.stage("transcript", lambda: transcribe_audio(audio_file, audio.filename))
+
+  # 2) Analyze with LLM (each caller gets its own copy to mutate)
+  analysis = dict(await checkpoint.stage("analysis", lambda: analyze_transcript(transcript)))
+  response.headers.update(replay_headers(checkpoint))
+
+  # 3) Return JSON to the app
+  return analysis
+
+
+# ============================================================================
+# Mood & Urgency Pre-classifier: provisional labels before the LLM answers
+# ============================================================================
+
+PRECLASSIFY_ENABLED = os.getenv("PRECLASSIFY_ENABLED", "1") == "1"
+PRECLASSIFY_LOG = os.getenv("PRECLASSIFY_LOG")  # JSONL of provisional vs. LLM labels, for eval
+
+# Phrases up to PRECLASSIFY_MAX_NGRAM words, matched on normalized tokens
+MOOD_LEXICON = {
+    "anxious": ("anxious", "anxiety", "worried", "worry", "worrying", "nervous", "panic", "panicking",
+                "scared", "afraid", "fear", "stress", "stressed", "deadline", "restless", "can't sleep",
+                "what if", "on edge", "racing"),
+    "sad": ("sad", "cry", "crying", "cried", "lonely", "alone", "miss", "grief", "grieving", "hopeless",
+            "depressed", "heartbroken", "hurts", "loss", "down", "tears", "unhappy"),
+    "overwhelmed": ("overwhelmed", "too much", "can't cope", "can't handle", "exhausted", "drowning",
+                    "pressure", "so much", "burned out", "burnout", "everything at once", "falling behind"),
+    "numb": ("numb", "empty", "nothing", "blank", "flat", "don't feel", "can't feel", "don't care",
+             "pointless", "disconnected", "going through the motions"),
+    "angry": ("angry", "mad", "furious", "hate", "annoyed", "frustrated", "frustrating", "unfair",
+              "pissed", "rage", "sick of", "fed up"),
+}
+URGENCY_LEXICON = {
+    "high": ("kill myself", "killing myself", "suicide", "suicidal", "end my life", "end it all",
+             "want to die", "wanna die", "hurt myself", "hurting myself", "self harm", "cut myself",
+             "no reason to live", "better off without me", "better off dead", "can't go on",
+             "overdose", "not be here anymore"),
+    "medium": ("can't sleep", "panic", "panicking", "hopeless", "can't cope", "can't breathe",
+               "falling apart", "breaking down", "desperate", "can't stop crying", "scared"),
+}
+PRECLASSIFY_MAX_NGRAM = 5
+URGENCY_LEVELS = ("low", "medium", "high")
+
+PRECLASSIFIED = Counter("angin_preclassified_total", "Turns labelled by the local pre-classifier", ("urgency",))
+PRECLASSIFIER_AGREEMENT = Counter("angin_preclassifier_agreement_total",
+                                  "Pre-classifier labels checked against the LLM's", ("field", "agree"))
+
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+class Preclassification(BaseModel):
+    mood: str
+    urgency: str
+
+
+class MoodPreclassifier:
+    """
+    Lexicon scorer over n-grams of the transcript. Each lexicon term is a
+    row of a weight matrix with one column per mood and one per urgency
+    level, so scoring a turn is a single row gather and sum in NumPy; it
+    takes tens of microseconds, cheap enough to run before every LLM call.
+    """
+
+    def __init__(self, mood_lexicon: dict, urgency_lexicon: dict):
+        self.moods = tuple(mood_lexicon)
+        self.vocab: dict = {}
+        rows: List[np.ndarray] = []
+        columns = [(0, mood, terms) for mood, terms in mood_lexicon.items()]
+        columns += [(1, level, terms) for level, terms in urgency_lexicon.items()]
+        width = len(self.moods) + len(URGENCY_LEVELS)
+        for group, label, terms in columns:
+            col = self.moods.index(label) if group == 0 else len(self.moods) + URGENCY_LEVELS.index(label)
+            for term in terms:
+                key = " ".join(self._tokens(term))
+                if key not in self.vocab:
+                    self.vocab[key] = len(rows)
+                    rows.append(np.zeros(width, dtype=np.float32))
+                rows[self.vocab[key]][col] += 1.0
+        self.weights = np.stack(rows)
+        self.stats = {"classified": 0, "high": 0, "agree_mood": 0, "agree_urgency": 0, "checked": 0}
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        text = text.lower().replace("\u2019", "'")
+        # "cannot"/"can not" → "can't" so phrases match however STT spells them
+        text = re.sub(r"\bcan ?not\b", "can't", text)
+        return _TOKEN_RE.findall(text)
+
+    def scores(self, text: str) -> np.ndarray:
+        tokens = self._tokens(text)
+        hits = [
+            self.vocab[gram]
+            for n in range(1, PRECLASSIFY_MAX_NGRAM + 1)
+            for i in range(len(tokens) - n + 1)
+            if (gram := " ".join(tokens[i:i + n])) in self.vocab
+        ]
+        if not hits:
+            return np.zeros(self.weights.shape[1], dtype=np.float32)
+        return self.weights[np.array(hits)].sum(axis=0)
+
+    def classify(self, text: str) -> Preclassification:
+        scores = self.scores(text)
+        mood_scores, urgency_scores = scores[:len(self.moods)], scores[len(self.moods):]
+        top = mood_scores.max()
+        leaders = np.flatnonzero(mood_scores == top)
+        mood = self.moods[leaders[0]] if top > 0 and len(leaders) == 1 else "mixed"
+        if urgency_scores[URGENCY_LEVELS.index("high")] > 0:
+            urgency = "high"
+        elif urgency_scores[URGENCY_LEVELS.index("medium")] > 0 or top >= 2:
+            urgency = "medium"
+        else:
+            urgency = "low"
+
+        self.stats["classified"] += 1
+        self.stats["high"] += urgency == "high"
+        PRECLASSIFIED.inc(urgency=urgency)
+        return Preclassification(mood=mood, urgency=urgency)
+
+    def feedback(self, text: str, provisional: Preclassification, final):
+        """Score the provisional labels against the LLM's (`final` has mood/urgency)."""
+        self.stats["checked"] += 1
+        for field in ("mood", "urgency"):
+            agree = getattr(provisional, field) == getattr(final, field)
+            self.stats[f"agree_{field}"] += agree
+            PRECLASSIFIER_AGREEMENT.inc(field=field, agree=str(agree).lower())
+        if PRECLASSIFY_LOG:
+            record = {"text": text, "provisional": provisional.model_dump(),
+                      "mood": final.mood, "urgency": final.urgency}
+            try:
+                with open(PRECLASSIFY_LOG, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                print(f"Pre-classifier log error: {e}")
+
+    def snapshot(self) -> dict:
+        checked = self.stats["checked"]
+        return {
+            **self.stats,
+            "mood_agreement": round(self.stats["agree_mood"] / checked, 4) if checked else None,
+            "urgency_agreement": round(self.stats["agree_urgency"] / checked, 4) if checked else None,
+        }
+
+
+preclassifier = MoodPreclassifier(MOOD_LEXICON, URGENCY_LEXICON)
+
+
+def last_user_text(request) -> str:
+    return next((m.content for m in reversed(request.history) if m.role == "user"), "")
+
+
+def preclassify(text: str) -> Optional[Preclassification]:
+    """
+    Provisional labels for a turn. A high-urgency turn is moved ahead of
+    other live calls in the upstream queues for the rest of the request.
+    """
+    if not PRECLASSIFY_ENABLED or not text:
+        return None
+    labels = preclassifier.classify(text)
+    if labels.urgency == "high" and _request_priority.get() == PRIORITY_LIVE:
+        _request_priority.set(PRIORITY_URGENT)
+    return labels
+
+
+# ============================================================================
+# Angin Therapy Turn Endpoint
+# ============================================================================
+
+class Message(BaseModel):
+    role: Literal["user", "assistant"]
+    content: str
+
+
+class AnginTurnRequest(BaseModel):
+    summary: Optional[str] = None
+    history: List[Message] = Field(default_factory=list)
+
+
+class AnginTurnResponse(BaseModel):
+    mood: Literal["anxious", "sad", "overwhelmed", "numb", "angry", "mixed"]
+    urgency: Literal["low", "medium", "high"]
+    strategy: Literal["reflect", "clarify", "grounding", "reframe", "close"]
+    response: str
+    next_action: Literal["tts_output", "ask_more", "end"]
+
+
+# Identical bytes on every turn; the provider caches the prompt by prefix
+TURN_SYSTEM_PROMPT = """You are Angin, a calm emotional-support AI on a phone call.
+
+Your role is to listen, validate feelings, and gently guide users. You are NOT a crisis line, doctor, or therapist. Do not give medical, legal, or emergency advice.
+
+Always respond ONLY as a single JSON object with this shape:
+
+{
+  "mood": "anxious" | "sad" | "overwhelmed" | "numb" | "angry" | "mixed",
+  "urgency": "low" | "medium" | "high",
+  "strategy": "reflect" | "clarify" | "grounding" | "reframe" | "close",
+  "response": "string",
+  "next_action": "tts_output" | "ask_more" | "end"
+}
+
+Guidelines:
+- `response` should be 1–3 short sentences, under 50 words total.
+- Tone: warm, steady, human, never robotic or overly cheerful.
+- No emojis, no markdown.
+- If the user sounds at risk, set "urgency" to "high" and choose a gentle, validating `response`, but still avoid crisis instructions.
+
+Do NOT include any text outside the JSON object. No explanations, no comments, no markdown."""
+TURN_PREFIX = ({"role": "system", "content": TURN_SYSTEM_PROMPT},)
+
+
+def build_turn_messages(request: AnginTurnRequest) -> list:
+    """
+    Build the chat messages for a therapy turn: the fixed prefix, then the
+    history, then the summary. History only grows between turns, so each
+    prompt starts with the previous one and that part is served from the
+    provider's prompt cache; the summary changes whenever it is refreshed,
+    so it goes last where it invalidates nothing after it.
+    """
+    messages = [*TURN_PREFIX]
+    messages.extend({"role": msg.role, "content": msg.content} for msg in request.history)
+    if request.summary:
+        messages.append({
+            "role": "system",
+            "content": f"Summary of the conversation before the messages above: {request.summary}",
+        })
+    return messages
+
+
+@app.post("/angin/turn", response_model=AnginTurnResponse)
+async def angin_turn(request: AnginTurnRequest):
+    """
+    Conversational therapy turn using Angin's emotional support behavior.
+    
+    Takes conversation history and optional summary, returns structured JSON
+    with mood analysis, strategy, and response text.
+    """
+    
+    start_deadline()
+
+    # Provisional labels (and queue priority) before the model answers
+    text = last_user_text(request)
+    provisional = preclassify(text)
+
+    # Keep the prompt under the token budget (older turns → rolling summary)
+    plan = history_compactor.compact(request)
+    messages = build_turn_messages(plan.request)
+
+    try:
+        # Faster tier when the default is too slow for current load
+        model = model_policy.choose("llm")
+
+        # Call OpenAI with JSON mode
+        async def attempt():
+            async with admit("openai"):
+                completion = await upstreams.openai.chat.completions.create(
+                    model=model,
+                    response_format={"type": "json_object"},
+                    messages=messages,
+                    temperature=0.7,
+                    prompt_cache_key="angin-turn",
+                    timeout=attempt_timeout(),
+                )
+                record_completion_usage("llm", model, completion.usage)
+                return completion
+
+        async with stage("llm"):
+            completion = await call_upstream("llm", attempt, hedge=True)
+        
+        content = completion.choices[0].message.content
+        data = json.loads(content)
+        
+        # Validate response structure
+        response = AnginTurnResponse(**data)
+        if provisional is not None:
+            preclassifier.feedback(text, provisional, response)
+        history_compactor.schedule_refresh(plan)
+        return response
+        
+    except json.JSONDecodeError as e:
+        print(f"JSON decode error: {e}")
+        print(f"Raw content: {content}")
+        raise HTTPException(status_code=500, detail="Invalid JSON response from AI")
+    except Exception as e:
+        print(f"Angin turn error: {e}")
+        raise upstream_failure(e, "Failed to process conversation turn")
+
+
+# ============================================================================
+# Unified Therapy Flow: Audio → STT → Therapy Agent → TTS → Audio
+# ============================================================================
+
+class AnginCallRequest(BaseModel):
+    """Request for full therapy call flow with audio input"""
+    summary: Optional[str] = None
+    history: List[Message] = Field(default_factory=list)
+
+
+def parse_history(history: Optional[str]) -> List[Message]:
+    """
+    Parse the JSON `history` form field (a list of messages). Anything else
+    (invalid JSON, another shape, unknown roles) starts fresh.
+    """
+    if not history:
+        return []
+    try:
+        history_data = json.loads(history)
+        return [Message(**msg) for msg in history_data]
+    except (json.JSONDecodeError, TypeError, ValidationError) as e:
+        logger.warning("Invalid history, starting fresh: %s", e)
+        return []
+
+
+class AnginCallResponse(BaseModel):
+    """Response with therapy analysis and metadata"""
+    transcript: str
+    mood: str
+    urgency: str
+    strategy: str
+    response_text: str
+    next_action: str
+
+
+@app.post("/angin/call")
+async def angin_call(
+    audio: UploadFile = File(...),
+    summary: Optional[str] = None,
+    history: Optional[str] = None,  # JSON string of message history
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    save_data: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Complete therapy flow: audio in → audio out
+    
+    1. Transcribe user audio (STT)
+    2. Append to conversation history
+    3. Call therapy agent for response
+    4. Convert response to speech (TTS)
+    5. Return audio + metadata
+    
+    Returns streamed audio/mpeg with custom headers for metadata
+    (transcript and response text percent-encoded), or, with
+    `Accept: application/vnd.angin.frames`, a `metadata` JSON event
+    followed by the audio frames. The audio encoding is negotiated as
+    for /speak.
+
+    With an `Idempotency-Key` header, the transcript, reply and audio are
+    checkpointed: a retry with the same key and recording resumes at the
+    first stage that didn't finish, or replays the finished call
+    (marked `Idempotent-Replayed: true`).
+    """
+    
+    start_deadline()
+    fmt = negotiate_audio_format(format, accept, save_data)
+
+    # Validate and read audio
+    audio_file = await read_audio_upload(audio)
+    checkpoint = await idempotency_store.open("/angin/call", idempotency_key, audio_file, summary, history)
+    
+    try:
+        # Step 1: Transcribe user audio
+        transcript = await checkpoint.stage("transcript", lambda: transcribe_audio(audio_file, audio.filename))
+        print(f"Transcribed: {transcript}")
+        
+        # Step 2: Parse history and append user message
+        message_history = parse_history(history)
+        message_history.append(Message(role="user", content=transcript))
+        
+        # Step 3: Call therapy agent
+        therapy_request = AnginTurnRequest(
+            summary=summary,
+            history=message_history
+        )
+        
+        therapy_response = await checkpoint.stage("turn", lambda: angin_turn(therapy_request))
+        
+        # Framed clients get the metadata as a JSON event ahead of the audio
+        if wants_frames(accept):
+            event = {
+                "event": "metadata",
+                "transcript": transcript,
+                **therapy_response.model_dump(),
+            }
+            # Looked up before the headers, so Idempotent-Replayed counts it
+            audio_bytes = checkpoint.audio(fmt) if therapy_response.response else None
+            return StreamingResponse(reply_frames(event, therapy_response.response, fmt, checkpoint, audio_bytes),
+                                     media_type=FRAMES_MEDIA_TYPE, headers=replay_headers(checkpoint))
+
+        # Step 4: Start TTS audio stream (or hit the checkpoint / cache)
+        audio_bytes = checkpoint.audio(fmt)
+        if audio_bytes is not None:
+            chunks = iter([audio_bytes])
+        else:
+            tts = await open_tts(therapy_response.response, fmt)
+            chunks = checkpoint.record_audio(fmt, tts.chunks())
+        
+        # Step 5: Stream audio with metadata in headers. Header values must
+        # be latin-1, so free text is percent-encoded (decodeURIComponent)
+        return StreamingResponse(
+            chunks,
+            media_type=fmt.media_type,
+            headers={
+                **replay_headers(checkpoint),
+                "Vary": "Accept, Save-Data",
+                "X-Transcript": quote(transcript),
+                "X-Mood": therapy_response.mood,
+                "X-Urgency": therapy_response.urgency,
+                "X-Strategy": therapy_response.strategy,
+                "X-Response-Text": quote(therapy_response.response),
+                "X-Next-Action": therapy_response.next_action,
+            }
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Angin call error: {e}")
+        raise HTTPException(status_code=500, detail=f"Call processing failed: {str(e)}")
+
+
+@app.post("/angin/call-json")
+async def angin_call_json(
+    response: Response,
+    audio: UploadFile = File(...),
+    summary: Optional[str] = None,
+    history: Optional[str] = None,
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Same as /angin/call but returns JSON instead of audio.
+    Useful for debugging or when frontend handles TTS separately.
+    Honours `Idempotency-Key` like /angin/call (transcript and reply).
+    
+    Returns: AnginCallResponse with transcript, mood, urgency, etc.
+    """
+    
+    start_deadline()
+
+    # Validate and read audio
+    audio_file = await read_audio_upload(audio)
+    checkpoint = await idempotency_store.open("/angin/call-json", idempotency_key, audio_file, summary, history)
+    
+    try:
+        # Step 1: Transcribe
+        transcript = await checkpoint.stage("transcript", lambda: transcribe_audio(audio_file, audio.filename))
+        
+        # Step 2: Parse history and append user message
+        message_history = parse_history(history)
+        message_history.append(Message(role="user", content=transcript))
+        
+        # Step 3: Call therapy agent
+        therapy_request = AnginTurnRequest(
+            summary=summary,
+            history=message_history
+        )
+        
+        therapy_response = await checkpoint.stage("turn", lambda: angin_turn(therapy_request))
+        response.headers.update(replay_headers(checkpoint))
+        
+        # Return structured JSON
+        return AnginCallResponse(
+            transcript=transcript,
+            mood=therapy_response.mood,
+            urgency=therapy_response.urgency,
+            strategy=therapy_response.strategy,
+            response_text=therapy_response.response,
+            next_action=therapy_response.next_action
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Angin call JSON error: {e}")
+        raise HTTPException(status_code=500, detail=f"Call processing failed: {str(e)}")
+
+
+# ============================================================================
+# Streaming Call Flow: Audio → STT → streamed LLM → per-sentence TTS
+# ============================================================================
+
+# Framed binary response: [1-byte kind][4-byte big-endian length][payload]
+#   b"J" – UTF-8 JSON event ({"event": "filler" | "transcript" | "provisional" | "metadata"
+#          | "done" | "error", ...})
+#   b"A" – audio bytes (audio/mpeg unless negotiated otherwise), in playback order
+# `done` carries the request's token/character `usage` so far.
+FRAMES_MEDIA_TYPE = "application/vnd.angin.frames"
+FRAME_JSON = b"J"
+FRAME_AUDIO = b"A"
+
+TURN_METADATA_FIELDS = ("mood", "urgency", "strategy")
+_METADATA_RE = re.compile(r'"(mood|urgency|strategy|next_action)"\s*:\s*"([^"\\]*)"')
+_RESPONSE_START_RE = re.compile(r'"response"\s*:\s*"')
+_SENTENCE_END_RE = re.compile(r'[.!?…]+["\')\]]*\s+')
+
+# Sentences shorter than this are merged with the next one so TTS isn't
+# called for fragments like "Okay."
+MIN_TTS_SENTENCE_CHARS = int(os.getenv("MIN_TTS_SENTENCE_CHARS", "24"))
+
+
+def encode_frame(kind: bytes, payload) -> bytes:
+    if kind == FRAME_JSON:
+        payload = json.dumps(payload).encode("utf-8")
+    return kind + struct.pack(">I", len(payload)) + payload
+
+
+class TurnStreamParser:
+    """
+    Incrementally pulls metadata fields and the `response` string out of a
+    streamed JSON completion, without waiting for the object to close.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: dict = {}
+        self._response_pos: Optional[int] = None
+        self.response_done = False
+
+    def feed(self, delta: str) -> str:
+        """Add completion text; return any newly decoded `response` text."""
+        self.buffer += delta
+        for key, value in _METADATA_RE.findall(self.buffer):
+            self.fields.setdefault(key, value)
+
+        if self._response_pos is None:
+            match = _RESPONSE_START_RE.search(self.buffer)
+            if not match:
+                return ""
+            self._response_pos = match.end()
+
+        out = []
+        pos = self._response_pos
+        while pos < len(self.buffer) and not self.response_done:
+            ch = self.buffer[pos]
+            if ch == '"':
+                self.response_done = True
+                pos += 1
+            elif ch == "\\":
+                # Escapes are decoded only once complete (\uXXXX needs 6 chars)
+                width = 6 if self.buffer[pos + 1:pos + 2] == "u" else 2
+                if pos + width > len(self.buffer):
+                    break
+                out.append(json.loads(f'"{self.buffer[pos:pos + width]}"'))
+                pos += width
+            else:
+                out.append(ch)
+                pos += 1
+        self._response_pos = pos
+        return "".join(out)
+
+    def metadata(self) -> Optional[dict]:
+        if all(f in self.fields for f in TURN_METADATA_FIELDS):
+            return {f: self.fields[f] for f in TURN_METADATA_FIELDS}
+        return None
+
+
+class SentenceChunker:
+    """Accumulates streamed text and releases it one finished sentence at a time."""
+
+    def __init__(self, min_chars: int = MIN_TTS_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.pending = ""
+
+    def feed(self, text: str) -> List[str]:
+        self.pending += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END_RE.finditer(self.pending):
+            if match.end() - start >= self.min_chars:
+                sentences.append(self.pending[start:match.end()].strip())
+                start = match.end()
+        self.pending = self.pending[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        rest, self.pending = self.pending.strip(), ""
+        return [rest] if rest else []
+
+
+class SentenceAudio:
+    """
+    TTS for one sentence, started immediately in the background. Chunks are
+    queued as they arrive so they can be relayed in order once earlier
+    sentences have finished playing out.
+    """
+
+    def __init__(self, text: str):
+        self._chunks: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run(text))
+
+    async def _run(self, text: str):
+        try:
+            tts = await open_tts(text)
+            async for chunk in tts.chunks():
+                self._chunks.put_nowait(chunk)
+            self._chunks.put_nowait(None)
+        except Exception as e:
+            self._chunks.put_nowait(e)
+
+    async def __aiter__(self):
+        while True:
+            item = await self._chunks.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+async def stream_call_turn(request: AnginTurnRequest):
+    """
+    Run one therapy turn with the LLM and TTS overlapped.
+
+    The completion is streamed; each finished sentence of `response` is
+    sent to TTS while the model keeps generating. Yields, in order:
+      ("provisional", {...}) mood/urgency from the local pre-classifier
+      ("metadata", {...})  once mood/urgency/strategy are known
+      ("audio", bytes)     TTS chunks, sentence by sentence in playback order
+      ("done", {...})      the validated AnginTurnResponse
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    plan = history_compactor.compact(request)
+    text = last_user_text(request)
+
+    async def produce():
+        # Runs in its own task, so an urgent priority stays with this turn
+        provisional = preclassify(text)
+        if provisional is not None:
+            queue.put_nowait(("provisional", provisional.model_dump()))
+        parser = TurnStreamParser()
+        chunker = SentenceChunker()
+        metadata_sent = False
+        spoken = []
+
+        def speak(sentences: List[str]):
+            for sentence in sentences:
+                spoken.append(sentence)
+                queue.put_nowait(("tts", SentenceAudio(sentence)))
+
+        model = model_policy.choose("llm", tracker="llm_ttft")
+
+        async def start():
+            stream = await upstreams.openai.chat.completions.create(
+                model=model,
+                response_format={"type": "json_object"},
+                messages=build_turn_messages(plan.request),
+                temperature=0.7,
+                stream=True,
+                # Token counts arrive in a last chunk with no choices
+                stream_options={"include_usage": True},
+                prompt_cache_key="angin-turn",
+                timeout=attempt_timeout(),
+            )
+            return stream, stream.close
+
+        def has_content(chunk) -> bool:
+            return bool(chunk.choices and chunk.choices[0].delta.content)
+
+        async with stage("llm"):
+            started = time.perf_counter()
+            # Hedged on time to first token
+            stream = await call_upstream("llm_ttft", lambda: open_stream("openai", start, has_content),
+                                         hedge=True, discard=OpenedStream.aclose)
+            async with stream.resources:
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        record_completion_usage("llm", model, chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content or ""
+                    if started is not None and delta:
+                        record_stage("llm_ttft", time.perf_counter() - started)
+                        started = None
+                    speak(chunker.feed(parser.feed(delta)))
+                    if parser.response_done:
+                        # Closing quote seen: the last sentence needn't wait for next_action
+                        speak(chunker.flush())
+                    if not metadata_sent and parser.metadata():
+                        queue.put_nowait(("metadata", parser.metadata()))
+                        metadata_sent = True
+        speak(chunker.flush())
+
+        final = AnginTurnResponse(**json.loads(parser.buffer))
+        if not metadata_sent:
+            queue.put_nowait(("metadata", {f: getattr(final, f) for f in TURN_METADATA_FIELDS}))
+        if not spoken and final.response.strip():
+            # The model put `response` somewhere the parser couldn't stream
+            speak([final.response])
+        queue.put_nowait(("done", final.model_dump()))
+        if provisional is not None:
+            preclassifier.feedback(text, provisional, final)
+        history_compactor.schedule_refresh(plan)
+
+    def on_producer_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            queue.put_nowait(("error", task.exception()))
+
+    producer = asyncio.create_task(produce())
+    producer.add_done_callback(on_producer_done)
+    pending_tts = []
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == "tts":
+                pending_tts.append(value)
+                async for chunk in value:
+                    yield "audio", chunk
+            elif kind == "error":
+                raise value
+            else:
+                yield kind, value
+                if kind == "done":
+                    return
+    finally:
+        producer.cancel()
+        for sentence_audio in pending_tts:
+            sentence_audio.task.cancel()
+        while not queue.empty():
+            kind, value = queue.get_nowait()
+            if kind == "tts":
+                value.task.cancel()
+
+
+def error_event(e: Exception) -> dict:
+    """In-band error for streams whose headers are already sent."""
+    if not isinstance(e, HTTPException):
+        return {"event": "error", "detail": "Call processing failed"}
+    event = {"event": "error", "detail": e.detail, "status": e.status_code}
+    if e.headers and "Retry-After" in e.headers:
+        event["retry_after"] = int(e.headers["Retry-After"])
+    return event
+
+
+async def turn_frames(transcript: str, therapy_request: AnginTurnRequest, endpoint: str, received: float):
+    """Frame a streamed therapy turn: transcript, metadata, audio…, done."""
+    yield encode_frame(FRAME_JSON, {"event": "transcript", "transcript": transcript})
+    replied = False
+    try:
+        async for kind, value in stream_call_turn(therapy_request):
+            if kind == "audio":
+                if not replied:
+                    replied = True
+                    first_audio(endpoint, "reply", received)
+                yield encode_frame(FRAME_AUDIO, value)
+            elif kind == "done":
+                yield encode_frame(FRAME_JSON, {"event": kind, **value, "usage": current_usage().snapshot()})
+            else:
+                yield encode_frame(FRAME_JSON, {"event": kind, **value})
+    except Exception as e:
+        # Headers are already sent, so errors travel in-band
+        print(f"Angin call stream error: {e!r}")
+        yield encode_frame(FRAME_JSON, error_event(e))
+
+
+async def filled_turn_frames(clip: bytes, transcription: asyncio.Future, summary: Optional[str],
+                             history: List[Message], endpoint: str, received: float):
+    """Send a filler clip straight away, then the turn once STT is done."""
+    try:
+        yield encode_frame(FRAME_JSON, {"event": "filler"})
+        first_audio(endpoint, "filler", received)
+        yield encode_frame(FRAME_AUDIO, clip)
+        try:
+            transcript = await asyncio.shield(transcription)  # cancelled once, below
+        except Exception as e:
+            print(f"Angin call stream error: {e!r}")
+            yield encode_frame(FRAME_JSON, error_event(e))
+            return
+        history = history + [Message(role="user", content=transcript)]
+        therapy_request = AnginTurnRequest(summary=summary, history=history)
+        async for frame in turn_frames(transcript, therapy_request, endpoint, received):
+            yield frame
+    finally:
+        transcription.cancel()
+        # Our upload stays open until a transcription others share is done
+        with anyio.CancelScope(shield=True):
+            await asyncio.wait([transcription])
+
+
+@app.post("/angin/call-stream")
+async def angin_call_stream(
+    audio: UploadFile = File(...),
+    summary: Optional[str] = None,
+    history: Optional[str] = None,
+    fillers: bool = False,
+    mood: Optional[str] = None,
+    strategy: Optional[str] = None,
+):
+    """
+    Lowest-latency therapy flow: audio in → framed stream out.
+
+    Same inputs as /angin/call. After STT, the LLM completion is streamed
+    and each finished sentence is synthesized while the model is still
+    generating, so the first audio arrives long before the full reply.
+
+    With `fillers=true` the stream opens with a `filler` event and a short
+    acknowledgement clip (picked by the previous turn's `mood`/`strategy`)
+    while STT runs; STT failures are then reported in-band.
+
+    Returns `application/vnd.angin.frames`: JSON events (transcript,
+    metadata, done/error) interleaved with audio chunks in playback order.
+    """
+    start_deadline()
+    audio_file = await read_audio_upload(audio)
+    received = time.perf_counter()
+    message_history = parse_history(history)
+
+    clip = filler_library.pick(mood, strategy) if fillers else None
+    if clip is not None:
+        transcription = asyncio.ensure_future(transcribe_audio(audio_file, audio.filename))
+        return StreamingResponse(
+            filled_turn_frames(clip, transcription, summary, message_history, "/angin/call-stream", received),
+            media_type=FRAMES_MEDIA_TYPE,
+        )
+
+    transcript = await transcribe_audio(audio_file, audio.filename)
+    message_history.append(Message(role="user", content=transcript))
+    therapy_request = AnginTurnRequest(summary=summary, history=message_history)
+
+    return StreamingResponse(turn_frames(transcript, therapy_request, "/angin/call-stream", received),
+                             media_type=FRAMES_MEDIA_TYPE)
+
+
+async def reply_frames(event: dict, text: str, fmt: AudioFormat = DEFAULT_AUDIO_FORMAT,
+                       checkpoint: Optional["CheckpointedCall"] = None, audio: Optional[bytes] = None):
+    """
+    Frame a finished reply: its JSON event, then the spoken text, then done.
+    `audio` already checkpointed is replayed instead of synthesized; with a
+    `checkpoint`, synthesized audio is recorded in it.
+    """
+    # Synthesis starts while the event is still on its way to the client
+    tts = asyncio.ensure_future(open_tts(text, fmt)) if text and audio is None else None
+    try:
+        yield encode_frame(FRAME_JSON, {**event, "audio_type": fmt.media_type})
+        if audio is not None:
+            yield encode_frame(FRAME_AUDIO, audio)
+        elif tts is not None:
+            chunks = (await tts).chunks()
+            if checkpoint is not None:
+                chunks = checkpoint.record_audio(fmt, chunks)
+            async for chunk in chunks:
+                yield encode_frame(FRAME_AUDIO, chunk)
+        yield encode_frame(FRAME_JSON, {"event": "done", "usage": current_usage().snapshot()})
+    except Exception as e:
+        print(f"Reply stream error: {e!r}")
+        yield encode_frame(FRAME_JSON, error_event(e))
+    finally:
+        if tts is not None and not tts.done():
+            tts.cancel()
+
+
+def wants_frames(accept: Optional[str]) -> bool:
+    return bool(accept) and FRAMES_MEDIA_TYPE in accept
+
+
+@app.post("/analyze/speak")
+async def analyze_and_speak(
+    audio: UploadFile = File(...),
+    format: Optional[str] = None,
+    save_data: Optional[str] = Header(None),
+):
+    """
+    /analyze and /speak in one round trip: audio in → framed stream out.
+
+    Returns `application/vnd.angin.frames`: an `analysis` JSON event (the
+    same object /analyze returns, plus the `audio_type` of the frames that
+    follow), then the audio for its `suggested_response` in the requested
+    `format`, then `done` (or an in-band `error`).
+    """
+    start_deadline()
+    fmt = negotiate_audio_format(format, None, save_data)
+    audio_file = await read_audio_upload(audio)
+
+    transcript = await transcribe_audio(audio_file, audio.filename)
+    analysis = await analyze_transcript(transcript)
+
+    event = {"event": "analysis", **analysis}
+    return StreamingResponse(reply_frames(event, analysis.get("suggested_response") or "", fmt),
+                             media_type=FRAMES_MEDIA_TYPE)
+
+
+# ============================================================================
+# WebSocket Call Sessions: server-held conversation state
+# ============================================================================
+
+CALL_SESSION_MAX = int(os.getenv("CALL_SESSION_MAX", "1000"))
+CALL_SESSION_IDLE_SECONDS = float(os.getenv("CALL_SESSION_IDLE_SECONDS", "900"))
+
+
+class TTLStore:
+    """
+    Bounded in-process key/value store with idle expiry.
+
+    Entries expire `idle_seconds` after they were last read or written;
+    beyond `max_entries` the least recently used entry is dropped.
+    """
+
+    def __init__(self, max_entries: int, idle_seconds: float):
+        self.max_entries = max_entries
+        self.idle_seconds = idle_seconds
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def _purge(self, now: float):
+        while self._items:
+            key, (_, last_seen) = next(iter(self._items.items()))
+            if now - last_seen < self.idle_seconds and len(self._items) <= self.max_entries:
+                break
+            del self._items[key]
+            self.evictions += 1
+
+    def get(self, key: str):
+        now = time.monotonic()
+        self._purge(now)
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        self._items[key] = (entry[0], now)
+        self._items.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: str, value):
+        now = time.monotonic()
+        self._items[key] = (value, now)
+        self._items.move_to_end(key)
+        self._purge(now)
+
+    def pop(self, key: str):
+        entry = self._items.pop(key, None)
+        return entry[0] if entry else None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class CallSession(BaseModel):
+    """Conversation state kept on the server for the lifetime of a call."""
+    session_id: str
+    summary: Optional[str] = None
+    history: List[Message] = Field(default_factory=list)
+    # Last reply's metadata, for picking filler clips
+    mood: Optional[str] = None
+    strategy: Optional[str] = None
+
+
+call_sessions = TTLStore(CALL_SESSION_MAX, CALL_SESSION_IDLE_SECONDS)
+
+
+@app.websocket("/angin/ws")
+async def angin_ws(websocket: WebSocket, session_id: Optional[str] = None, fillers: bool = False):
+    """
+    Persistent call session. History lives on the server, so each turn
+    only carries the new audio.
+
+    Client → server:
+      text   {"type": "context", "summary": ..., "history": [...]}  (optional seed)
+      text   {"type": "audio", "filename": "recording.m4a"}       (optional, names the next clip)
+      binary one complete recording per turn
+      text   {"type": "end"}                                      (drop the session)
+
+    Server → client:
+      text   {"event": "session" | "filler" | "transcript" | "provisional" | "metadata"
+              | "done" | "error", ...}
+      binary audio chunks for the reply, in playback order
+
+    Reconnecting with ?session_id=... resumes the call until it goes idle
+    for CALL_SESSION_IDLE_SECONDS. With ?fillers=true each turn opens with
+    a `filler` event and a short acknowledgement clip while STT runs.
+    Each `done` carries the turn's `usage` and the call's `session_usage`.
+    """
+    await websocket.accept()
+
+    session = call_sessions.get(session_id) if session_id else None
+    if session is None:
+        session = CallSession(session_id=session_id or uuid.uuid4().hex)
+        call_sessions.put(session.session_id, session)
+    await websocket.send_json({
+        "event": "session",
+        "session_id": session.session_id,
+        "turns": len(session.history),
+    })
+
+    filename = "recording.m4a"
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            call_sessions.put(session.session_id, session)
+
+            if message.get("text") is not None:
+                try:
+                    control = json.loads(message["text"])
+                    if control.get("type") == "context":
+                        session.summary = control.get("summary")
+                        session.history = [Message(**m) for m in control.get("history", [])]
+                    elif control.get("type") == "audio":
+                        filename = control.get("filename") or filename
+                    elif control.get("type") == "end":
+                        call_sessions.pop(session.session_id)
+                        await websocket.close()
+                        return
+                except (json.JSONDecodeError, AttributeError, TypeError, ValidationError):
+                    await websocket.send_json({"event": "error", "detail": "Invalid control message"})
+                continue
+
+            audio_bytes = message.get("bytes") or b""
+            if not audio_bytes:
+                await websocket.send_json({"event": "error", "detail": "Empty audio"})
+                continue
+
+            start_deadline(restart=True)
+            turn_usage = usage_scope(session.session_id)
+            _request_usage.set(turn_usage)
+            received = time.perf_counter()
+            transcription = asyncio.ensure_future(transcribe_audio(audio_bytes, filename))
+            try:
+                clip = filler_library.pick(session.mood, session.strategy) if fillers else None
+                if clip is not None:
+                    await websocket.send_json({"event": "filler"})
+                    first_audio("/angin/ws", "filler", received)
+                    await websocket.send_bytes(clip)
+
+                transcript = await transcription
+                await websocket.send_json({"event": "transcript", "transcript": transcript})
+
+                history = session.history + [Message(role="user", content=transcript)]
+                therapy_request = AnginTurnRequest(summary=session.summary, history=history)
+                replied = False
+                async for kind, value in stream_call_turn(therapy_request):
+                    if kind == "audio":
+                        if not replied:
+                            replied = True
+                            first_audio("/angin/ws", "reply", received)
+                        await websocket.send_bytes(value)
+                    elif kind == "done":
+                        await websocket.send_json({
+                            "event": kind, **value, "usage": turn_usage.snapshot(),
+                            "session_usage": session_usage(session.session_id).snapshot(),
+                        })
+                    else:
+                        await websocket.send_json({"event": kind, **value})
+                    if kind == "done":
+                        session.history = history + [Message(role="assistant", content=value["response"])]
+                        session.mood, session.strategy = value.get("mood"), value.get("strategy")
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                print(f"Angin ws turn error: {e!r}")
+                await websocket.send_json(error_event(e))
+            finally:
+                transcription.cancel()
+    except WebSocketDisconnect:
+        pass
+
+
+# ============================================================================
+# Chunked Ingest: transcribe segments while the user is still speaking
+# ============================================================================
+
+INGEST_MAX_UPLOADS = int(os.getenv("INGEST_MAX_UPLOADS", "500"))
+INGEST_IDLE_SECONDS = float(os.getenv("INGEST_IDLE_SECONDS", "300"))
+INGEST_MAX_SEGMENTS = int(os.getenv("INGEST_MAX_SEGMENTS", "120"))
+
+
+class IngestUpload:
+    """
+    One in-progress recording, received as independently decodable
+    segments. Each segment is transcribed in the background as soon as it
+    arrives; its audio is kept only until that transcription succeeds.
+    """
+
+    def __init__(self, upload_id: str):
+        self.upload_id = upload_id
+        self.segments: dict = {}   # seq -> asyncio.Task[str]
+        self.audio: dict = {}      # seq -> (bytes, filename), until transcribed
+
+    def add(self, seq: int, audio_bytes: bytes, filename: str):
+        if seq in self.segments:
+            self.segments[seq].cancel()
+        self.audio[seq] = (audio_bytes, filename)
+        self.segments[seq] = asyncio.create_task(self._transcribe(seq))
+
+    async def _transcribe(self, seq: int) -> str:
+        audio_bytes, filename = self.audio[seq]
+        try:
+            text = await transcribe_audio(audio_bytes, filename)
+        except HTTPException as e:
+            if e.status_code != 400:
+                raise
+            text = ""  # a silent segment is normal mid-recording
+        self.audio.pop(seq, None)
+        return text
+
+    async def transcript(self) -> str:
+        """Wait for outstanding segments (retrying failures once) and stitch them in order."""
+        parts = []
+        for seq in sorted(self.segments):
+            try:
+                # Shielded: a /finish that goes away leaves them for its retry
+                parts.append(await asyncio.shield(self.segments[seq]))
+            except HTTPException:
+                print(f"Ingest {self.upload_id}: retrying segment {seq}")
+                parts.append(await self._transcribe(seq))
+        return " ".join(" ".join(parts).split())
+
+
+ingest_uploads = TTLStore(INGEST_MAX_UPLOADS, INGEST_IDLE_SECONDS)
+
+
+def get_ingest_upload(upload_id: str) -> IngestUpload:
+    upload = ingest_uploads.get(upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired upload")
+    return upload
+
+
+@app.post("/angin/ingest")
+async def ingest_start():
+    """Open a chunked upload; returns the `upload_id` to send segments to."""
+    upload = IngestUpload(uuid.uuid4().hex)
+    ingest_uploads.put(upload.upload_id, upload)
+    return {"upload_id": upload.upload_id, "idle_timeout_seconds": INGEST_IDLE_SECONDS}
+
+
+@app.post("/angin/ingest/{upload_id}/chunks/{seq}")
+async def ingest_chunk(upload_id: str, seq: int, audio: UploadFile = File(...)):
+    """
+    Add segment `seq` (0-based, any order) of the recording. Each segment
+    must be a self-contained audio file; it starts transcribing right away.
+    """
+    upload = get_ingest_upload(upload_id)
+    if seq < 0 or (seq not in upload.segments and len(upload.segments) >= INGEST_MAX_SEGMENTS):
+        raise HTTPException(status_code=400, detail="Invalid or too many segments")
+    await read_audio_upload(audio)
+    # Copied out: transcription outlives this request and its upload file
+    upload.add(seq, await audio.read(), audio.filename)
+    return {"upload_id": upload_id, "seq": seq, "segments": len(upload.segments)}
+
+
+@app.post("/angin/ingest/{upload_id}/finish")
+async def ingest_finish(
+    upload_id: str,
+    audio: Optional[UploadFile] = File(None),
+    seq: Optional[int] = Form(None),
+    summary: Optional[str] = Form(None),
+    history: Optional[str] = Form(None),
 ):
     """
-    Complete therapy flow: audio in → audio out
-    
-    1. Transcribe user audio (STT)
-    2. Append to conversation history
-    3. Call therapy agent for response
-    4. Convert response to speech (TTS)
-    5. Return audio + metadata
-    
-    Returns audio/mpeg with custom headers for metadata.
+    Close the upload, optionally with its final segment, and run the turn.
+
+    Earlier segments are already transcribed by now, so only the last one
+    is on the critical path. Responds exactly like /angin/call-stream.
+    """
+    start_deadline()
+    received = time.perf_counter()
+    upload = get_ingest_upload(upload_id)
+    # Before any segment or transcript work (malformed history starts fresh)
+    message_history = parse_history(history)
+    if audio is not None:
+        final_seq = seq if seq is not None else max(upload.segments, default=-1) + 1
+        await read_audio_upload(audio)
+        upload.add(final_seq, await audio.read(), audio.filename)
+    if not upload.segments:
+        raise HTTPException(status_code=400, detail="No audio received")
+
+    # Closed only once transcribed, so a failed /finish can be retried
+    transcript = await upload.transcript()
+    ingest_uploads.pop(upload_id)
+    if not transcript:
+        raise HTTPException(status_code=400, detail="No speech detected")
+
+    message_history.append(Message(role="user", content=transcript))
+    therapy_request = AnginTurnRequest(summary=summary, history=message_history)
+    return StreamingResponse(turn_frames(transcript, therapy_request, "/angin/ingest/{upload_id}/finish", received),
+                             media_type=FRAMES_MEDIA_TYPE)
+
+
+# ============================================================================
+# Batch Analysis Jobs: bulk /analyze with a bounded worker pool
+# ============================================================================
+
+BATCH_DIR = os.getenv("BATCH_DIR", os.path.join(BASE_DIR, ".cache", "batch_jobs"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "5000"))
+# Starlette rejects multipart forms with more than 1000 files before we see
+# them, so uploaded jobs stop there; larger jobs go through a manifest
+BATCH_MAX_UPLOADS = min(BATCH_MAX_ITEMS, 1000)
+BATCH_ITEM_ATTEMPTS = int(os.getenv("BATCH_ITEM_ATTEMPTS", "5"))
+# Server-side directory that manifests may point into; unset disables them
+BATCH_MANIFEST_ROOT = os.getenv("BATCH_MANIFEST_ROOT")
+BATCH_AUDIO_EXTENSIONS = (".m4a", ".mp3", ".mp4", ".mpeg", ".mpga", ".wav", ".webm", ".ogg", ".flac")
+
+
+class BatchJob:
+    """
+    One bulk analysis job, persisted under BATCH_DIR/<job_id>/: job.json
+    lists the items, results.jsonl gets one line per finished item. An item
+    without a result line is still to do, which is all a restart needs to
+    pick the job up where it left off.
+    """
+
+    def __init__(self, job_id: str, items: List[dict], created: float):
+        self.job_id = job_id
+        self.items = items          # [{"name": ..., "path": ...}], path relative to the job dir or absolute
+        self.created = created
+        self.updated = created
+        self.finished: set = set()  # item indexes with a result line
+        self.failed = 0
+        self.version = 0
+        self._changed = asyncio.Condition()
+
+    @property
+    def dir(self) -> str:
+        return os.path.join(BATCH_DIR, self.job_id)
+
+    @property
+    def results_path(self) -> str:
+        return os.path.join(self.dir, "results.jsonl")
+
+    @property
+    def complete(self) -> bool:
+        return len(self.finished) == len(self.items)
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": "completed" if self.complete else "running" if self.finished else "queued",
+            "total": len(self.items),
+            "done": len(self.finished),
+            "failed": self.failed,
+            "created": self.created,
+            "updated": self.updated,
+        }
+
+    # -- persistence (blocking; called via asyncio.to_thread) --------------
+
+    def save(self):
+        os.makedirs(self.dir, exist_ok=True)
+        with open(os.path.join(self.dir, "job.json"), "w") as f:
+            json.dump({"job_id": self.job_id, "created": self.created, "items": self.items}, f)
+        open(self.results_path, "a").close()
+
+    @classmethod
+    def load(cls, job_dir: str) -> "BatchJob":
+        with open(os.path.join(job_dir, "job.json")) as f:
+            meta = json.load(f)
+        job = cls(meta["job_id"], meta["items"], meta["created"])
+        with open(job.results_path) as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn final line from a crash; that item is redone
+                job.finished.add(result["index"])
+                job.failed += not result["ok"]
+        job.updated = os.path.getmtime(job.results_path)
+        return job
+
+    def _append(self, line: str):
+        with open(self.results_path, "a") as f:
+            f.write(line)
+
+    def results_size(self) -> int:
+        """Bytes of results.jsonl up to its last complete line (it grows while the job runs)."""
+        with open(self.results_path, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            while end:
+                start = max(end - 4096, 0)
+                f.seek(start)
+                cut = f.read(end - start).rfind(b"\n")
+                if cut >= 0:
+                    return start + cut + 1
+                end = start
+        return 0
+
+    # -- progress ---------------------------------------------------------
+
+    async def record(self, index: int, result: dict):
+        await asyncio.to_thread(self._append, json.dumps({"index": index, **result}) + "\n")
+        self.finished.add(index)
+        self.failed += not result["ok"]
+        self.updated = time.time()
+        async with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+
+    async def progress(self):
+        """Yield a snapshot now and after every finished item, until complete."""
+        while True:
+            seen = self.version
+            yield self.snapshot()
+            if self.complete:
+                return
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.version != seen)
+
+
+class BatchRunner:
+    """
+    Runs batch items on BATCH_WORKERS worker tasks at batch priority, so
+    live calls keep first claim on upstream capacity. Items that hit
+    admission limits or upstream rate limits are retried after Retry-After;
+    other failures are recorded as failed results.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.jobs: dict = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        for job in await asyncio.to_thread(self._load_jobs):
+            self.jobs[job.job_id] = job
+            if not job.complete:
+                print(f"Batch job {job.job_id}: resuming at {len(job.finished)}/{len(job.items)}")
+            self._enqueue(job)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _load_jobs(self) -> List[BatchJob]:
+        if not os.path.isdir(BATCH_DIR):
+            return []
+        jobs = []
+        for name in sorted(os.listdir(BATCH_DIR)):
+            try:
+                jobs.append(BatchJob.load(os.path.join(BATCH_DIR, name)))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Skipping unreadable batch job {name}: {e!r}")
+        return sorted(jobs, key=lambda job: job.created)
+
+    def _enqueue(self, job: BatchJob):
+        for index in range(len(job.items)):
+            if index not in job.finished:
+                self._queue.put_nowait((job, index))
+
+    async def submit(self, items: List[dict], inputs: Optional[List[BinaryIO]] = None) -> BatchJob:
+        """Persist a new job (and its uploaded audio, if any), then queue it."""
+        job = BatchJob(uuid.uuid4().hex, items, time.time())
+
+        def write():
+            os.makedirs(os.path.join(job.dir, "inputs"), exist_ok=True)
+            for item, audio_file in zip(items, inputs or ()):
+                with open(os.path.join(job.dir, item["path"]), "wb") as f:
+                    shutil.copyfileobj(audio_file, f)
+            job.save()
+
+        await asyncio.to_thread(write)
+        self.jobs[job.job_id] = job
+        self._enqueue(job)
+        return job
+
+    async def _work(self):
+        _request_priority.set(PRIORITY_BATCH)
+        while True:
+            job, index = await self._queue.get()
+            try:
+                await self._run_item(job, index)
+            except Exception as e:
+                print(f"Batch job {job.job_id} item {index} error: {e!r}")
+
+    async def _run_item(self, job: BatchJob, index: int):
+        item = job.items[index]
+        result = {"item": item["name"]}
+        for attempt in range(BATCH_ITEM_ATTEMPTS):
+            try:
+                path = os.path.join(job.dir, item["path"])
+                with open(path, "rb") as audio_file:
+                    transcript = await transcribe_audio(audio_file, os.path.basename(path))
+                analysis = await analyze_transcript(transcript)
+                await job.record(index, {**result, "ok": True, "analysis": analysis})
+                return
+            except OSError as e:
+                print(f"Batch job {job.job_id}: cannot read {item['name']}: {e!r}")
+                error = {"status": 400, "error": "Could not read audio file"}
+                break
+            except HTTPException as e:
+                error = {"status": e.status_code, "error": e.detail}
+                if e.status_code not in (429, 503) or attempt == BATCH_ITEM_ATTEMPTS - 1:
+                    break
+                await asyncio.sleep(int((e.headers or {}).get("Retry-After", 1)))
+        await job.record(index, {**result, "ok": False, **error})
+
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def get(self, job_id: str) -> BatchJob:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown batch job")
+        return job
+
+
+batch_runner = BatchRunner(BATCH_WORKERS)
+
+
+def manifest_items(manifest: str) -> List[dict]:
+    """
+    Resolve a manifest against BATCH_MANIFEST_ROOT. Accepts
+    {"directory": "relative/dir"} (every audio file below it) or
+    {"files": ["relative/a.m4a", ...]}. Blocking; run in a thread.
     """
-    
-    # Validate audio
-    if not audio.content_type or not audio.content_type.startswith("audio/"):
-        raise HTTPException(status_code=400, detail="File must be audio type")
-    
-    audio_bytes = await audio.read()
-    if not audio_bytes:
-        raise HTTPException(status_code=400, detail="Empty audio file")
-    
+    if not BATCH_MANIFEST_ROOT:
+        raise HTTPException(status_code=400, detail="Manifest submissions are disabled")
     try:
-        # Step 1: Transcribe user audio
-        transcript = transcribe_audio(audio_bytes, audio.filename)
-        print(f"Transcribed: {transcript}")
-        
-        # Step 2: Parse history and append user message
-        message_history = []
-        if history:
-            try:
-                history_data = json.loads(history)
-                message_history = [Message(**msg) for msg in history_data]
-            except json.JSONDecodeError:
-                print("Warning: Invalid history JSON, starting fresh")
-        
-        message_history.append(Message(role="user", content=transcript))
-        
-        # Step 3: Call therapy agent
-        therapy_request = AnginTurnRequest(
-            summary=summary,
-            history=message_history
-        )
-        
-        therapy_response = await angin_turn(therapy_request)
-        
-        # Step 4: Generate TTS audio
-        tts_url = f"https://api.elevenlabs.io/v1/text-to-speech/{ELEVEN_VOICE_ID}"
-        
-        async with httpx.AsyncClient() as http_client:
-            tts_response = await http_client.post(
-                tts_url,
-                headers={
-                    "xi-api-key": ELEVEN_API_KEY,
-                    "Accept": "audio/mpeg",
-                },
-                json={
-                    "text": therapy_response.response,
-                    "model_id": "eleven_turbo_v2",
-                },
-                timeout=30.0
-            )
-        
-        if tts_response.status_code != 200:
-            print(f"TTS error: {tts_response.text}")
-            raise HTTPException(status_code=500, detail="TTS generation failed")
-        
-        # Step 5: Return audio with metadata in headers
-        return Response(
-            content=tts_response.content,
-            media_type="audio/mpeg",
-            headers={
-                "X-Transcript": transcript,
-                "X-Mood": therapy_response.mood,
-                "X-Urgency": therapy_response.urgency,
-                "X-Strategy": therapy_response.strategy,
-                "X-Response-Text": therapy_response.response,
-                "X-Next-Action": therapy_response.next_action,
-            }
+        spec = json.loads(manifest)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid manifest")
+
+    root = os.path.realpath(BATCH_MANIFEST_ROOT)
+
+    def resolve(relative) -> str:
+        path = os.path.realpath(os.path.join(root, str(relative)))
+        if path != root and not path.startswith(root + os.sep):
+            raise HTTPException(status_code=400, detail="Manifest path outside the allowed root")
+        return path
+
+    if isinstance(spec, dict) and isinstance(spec.get("directory"), str):
+        paths = sorted(
+            os.path.join(dirpath, name)
+            for dirpath, _, names in os.walk(resolve(spec["directory"]))
+            for name in names
+            if name.lower().endswith(BATCH_AUDIO_EXTENSIONS)
         )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Angin call error: {e}")
-        raise HTTPException(status_code=500, detail=f"Call processing failed: {str(e)}")
+    elif isinstance(spec, dict) and isinstance(spec.get("files"), list):
+        paths = [resolve(p) for p in spec["files"]]
+    else:
+        raise HTTPException(status_code=400, detail="Manifest needs `directory` or `files`")
+    return [{"name": os.path.relpath(p, root), "path": p} for p in paths]
 
 
-@app.post("/angin/call-json")
-async def angin_call_json(
-    audio: UploadFile = File(...),
-    summary: Optional[str] = None,
-    history: Optional[str] = None
+@app.post("/analyze/jobs")
+async def batch_submit(
+    files: List[UploadFile] = File(None),
+    manifest: Optional[str] = Form(None),
 ):
     """
-    Same as /angin/call but returns JSON instead of audio.
-    Useful for debugging or when frontend handles TTS separately.
-    
-    Returns: AnginCallResponse with transcript, mood, urgency, etc.
+    Queue many recordings for analysis without holding a request open per
+    recording. Send audio files as repeated `files` fields (at most
+    BATCH_MAX_UPLOADS), or a JSON `manifest` naming files on the server
+    (see manifest_items, at most BATCH_MAX_ITEMS).
+
+    Returns the job snapshot; follow it at /analyze/jobs/{job_id}.
     """
-    
-    # Validate audio
-    if not audio.content_type or not audio.content_type.startswith("audio/"):
-        raise HTTPException(status_code=400, detail="File must be audio type")
-    
-    audio_bytes = await audio.read()
-    if not audio_bytes:
-        raise HTTPException(status_code=400, detail="Empty audio file")
-    
-    try:
-        # Step 1: Transcribe
-        transcript = transcribe_audio(audio_bytes, audio.filename)
-        
-        # Step 2: Parse history and append user message
-        message_history = []
-        if history:
-            try:
-                history_data = json.loads(history)
-                message_history = [Message(**msg) for msg in history_data]
-            except json.JSONDecodeError:
-                print("Warning: Invalid history JSON, starting fresh")
-        
-        message_history.append(Message(role="user", content=transcript))
-        
-        # Step 3: Call therapy agent
-        therapy_request = AnginTurnRequest(
-            summary=summary,
-            history=message_history
-        )
-        
-        therapy_response = await angin_turn(therapy_request)
-        
-        # Return structured JSON
-        return AnginCallResponse(
-            transcript=transcript,
-            mood=therapy_response.mood,
-            urgency=therapy_response.urgency,
-            strategy=therapy_response.strategy,
-            response_text=therapy_response.response,
-            next_action=therapy_response.next_action
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Angin call JSON error: {e}")
-        raise HTTPException(status_code=500, detail=f"Call processing failed: {str(e)}")
+    if files and manifest:
+        raise HTTPException(status_code=400, detail="Send either files or a manifest, not both")
+    if files:
+        if len(files) > BATCH_MAX_UPLOADS:
+            raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_UPLOADS} uploaded recordings per job; "
+                                                        "use a manifest for more")
+        inputs, items = [], []
+        for i, upload in enumerate(files):
+            inputs.append(await read_audio_upload(upload))
+            ext = os.path.splitext(upload.filename or "")[1].lower() or ".m4a"
+            items.append({"name": upload.filename or f"file-{i}", "path": os.path.join("inputs", f"{i:05d}{ext}")})
+    elif manifest:
+        inputs, items = None, await asyncio.to_thread(manifest_items, manifest)
+    else:
+        raise HTTPException(status_code=400, detail="No files or manifest")
+    if not items:
+        raise HTTPException(status_code=400, detail="No audio files found")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} recordings per job")
+
+    job = await batch_runner.submit(items, inputs)
+    return job.snapshot()
+
+
+@app.get("/analyze/jobs/{job_id}")
+async def batch_status(job_id: str):
+    return batch_runner.get(job_id).snapshot()
+
+
+@app.get("/analyze/jobs/{job_id}/progress")
+async def batch_progress(job_id: str):
+    """Newline-delimited JSON snapshots, one per finished item, until the job completes."""
+    job = batch_runner.get(job_id)
+
+    async def lines():
+        async for snapshot in job.progress():
+            yield json.dumps(snapshot) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/analyze/jobs/{job_id}/results")
+async def batch_results(job_id: str):
+    """
+    Results so far as JSON Lines, in completion order:
+    {"index", "item", "ok": true, "analysis": {...}} or
+    {"index", "item", "ok": false, "status", "error"}.
+    """
+    job = batch_runner.get(job_id)
+    # A snapshot: workers keep appending while this is sent
+    size = await asyncio.to_thread(job.results_size)
+
+    async def snapshot():
+        f = await asyncio.to_thread(open, job.results_path, "rb")
+        try:
+            left = size
+            while left:
+                chunk = await asyncio.to_thread(f.read, min(left, 64 * 1024))
+                if not chunk:
+                    break
+                left -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+    return StreamingResponse(snapshot(), media_type="application/x-ndjson", headers={"Content-Length": str(size)})
+
+
+# ============================================================================
+# History Compaction: token budget + background rolling summaries
+# ============================================================================
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1200"))
+HISTORY_MIN_RECENT_MESSAGES = int(os.getenv("HISTORY_MIN_RECENT_MESSAGES", "4"))
+HISTORY_SUMMARY_MAX = int(os.getenv("HISTORY_SUMMARY_MAX", "5000"))
+HISTORY_SUMMARY_IDLE_SECONDS = float(os.getenv("HISTORY_SUMMARY_IDLE_SECONDS", "3600"))
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of an emotional-support phone call.
+
+Given the previous summary (if any) and the next part of the conversation, write an updated summary in 2–4 short sentences: how the user feels, what is worrying them, and anything they asked Angin to remember. Plain text only, no lists, no markdown."""
+
+# Per-message overhead the chat format adds on top of the content
+_MESSAGE_TOKEN_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: list) -> int:
+    return sum(estimate_tokens(m["content"]) + _MESSAGE_TOKEN_OVERHEAD for m in messages)
+
+
+class CompactionPlan:
+    """Result of compacting one turn's history."""
+
+    def __init__(self, request: AnginTurnRequest, folded: List[Message], covered: int,
+                 tokens_before: int, tokens_after: int):
+        self.request = request          # what actually goes to the model
+        self.folded = folded            # older messages outside the budget
+        self.covered = covered          # how many of those a summary already covers
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+
+
+class HistoryCompactor:
+    """
+    Keeps each turn's prompt under HISTORY_TOKEN_BUDGET.
+
+    The most recent messages that fit the budget are sent verbatim. Older
+    messages are replaced by a rolling summary, looked up by a hash chain
+    over the exact messages it covers. Summaries are refreshed in the
+    background after a turn has been answered, so no turn waits on one;
+    until a refresh lands, uncovered older messages stay in the prompt.
+    """
+
+    def __init__(self, budget: int, min_recent: int):
+        self.budget = budget
+        self.min_recent = min_recent
+        self.summaries = TTLStore(HISTORY_SUMMARY_MAX, HISTORY_SUMMARY_IDLE_SECONDS)
+        self._inflight: set = set()
+        self._tasks: set = set()
+        self.turns: deque = deque(maxlen=200)
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    @staticmethod
+    def _chain(messages: List[Message]) -> List[str]:
+        """digests[i] identifies messages[:i + 1]."""
+        digests, digest = [], ""
+        for msg in messages:
+            digest = hashlib.sha256(f"{digest}\0{msg.role}\0{msg.content}".encode("utf-8")).hexdigest()
+            digests.append(digest)
+        return digests
+
+    def compact(self, request: AnginTurnRequest) -> CompactionPlan:
+        history = request.history
+        tokens_before = count_message_tokens(build_turn_messages(request))
+
+        # Newest first, keep messages while they fit (always keep a few)
+        kept, used = 0, 0
+        for msg in reversed(history):
+            cost = estimate_tokens(msg.content) + _MESSAGE_TOKEN_OVERHEAD
+            if kept >= self.min_recent and used + cost > self.budget:
+                break
+            kept += 1
+            used += cost
+        folded = history[:len(history) - kept]
+
+        # Longest folded prefix that already has a summary
+        covered, rolling = 0, None
+        for i, digest in reversed(list(enumerate(self._chain(folded)))):
+            rolling = self.summaries.get(digest)
+            if rolling is not None:
+                covered = i + 1
+                break
+
+        summary = "\n".join(s for s in (request.summary, rolling) if s) or None
+        compacted = AnginTurnRequest(summary=summary, history=history[covered:])
+        tokens_after = count_message_tokens(build_turn_messages(compacted))
+
+        plan = CompactionPlan(compacted, folded, covered, tokens_before, tokens_after)
+        self.turns.append({
+            "messages": len(history),
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "summarized": covered,
+        })
+        if covered:
+            print(f"History compaction: {tokens_before} → {tokens_after} prompt tokens "
+                  f"({covered} messages summarized)")
+        return plan
+
+    def schedule_refresh(self, plan: CompactionPlan):
+        """After the reply is out, fold any uncovered messages into the summary."""
+        if len(plan.folded) <= plan.covered:
+            return
+        digests = self._chain(plan.folded)
+        target = digests[-1]
+        if target in self._inflight:
+            return
+        base = self.summaries.get(digests[plan.covered - 1]) if plan.covered else None
+        self._inflight.add(target)
+        task = asyncio.create_task(self._refresh(target, base, plan.folded[plan.covered:]))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, target: str, base: Optional[str], messages: List[Message]):
+        # Runs after the turn that scheduled it: not bound by that turn's deadline
+        _request_deadline.set(None)
+        transcript = "\n".join(f"{m.role}: {m.content}" for m in messages)
+        previous = f"Previous summary: {base}\n\n" if base else ""
+        try:
+            model = model_policy.choose("summary")
+
+            async def attempt():
+                async with upstream_limiters["openai"].slot(PRIORITY_BACKGROUND):
+                    completion = await upstreams.openai.chat.completions.create(
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                            {"role": "user", "content": f"{previous}Conversation:\n{transcript}"},
+                        ],
+                        temperature=0.3,
+                        max_tokens=200,
+                        timeout=attempt_timeout(),
+                    )
+                    record_completion_usage("summary", model, completion.usage)
+                    return completion
+
+            async with stage("summary"):
+                completion = await call_upstream("summary", attempt)
+            self.summaries.put(target, completion.choices[0].message.content.strip())
+            self.refreshes += 1
+        except Exception as e:
+            self.refresh_errors += 1
+            print(f"History summary error: {e!r}")
+        finally:
+            self._inflight.discard(target)
+
+    def snapshot(self) -> dict:
+        turns = list(self.turns)
+        n = len(turns) or 1
+        return {
+            "budget": self.budget,
+            "turns": len(turns),
+            "avg_tokens_before": round(sum(t["tokens_before"] for t in turns) / n, 1),
+            "avg_tokens_after": round(sum(t["tokens_after"] for t in turns) / n, 1),
+            "summaries": len(self.summaries),
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "recent": turns[-20:],
+        }
+
+
+history_compactor = HistoryCompactor(HISTORY_TOKEN_BUDGET, HISTORY_MIN_RECENT_MESSAGES)
+
+
+# ============================================================================
+# Usage Accounting & Load-adaptive Model Tiers
+# ============================================================================
+
+# Chat models per stage, default first; the policy falls back to the
+# second (faster, cheaper) one when the default can't keep up
+MODEL_TIERS = {
+    "llm": os.getenv("TURN_MODELS", "gpt-4o-mini,gpt-4.1-nano").split(","),
+    "analyze": os.getenv("ANALYZE_MODELS", "gpt-4.1-mini,gpt-4o-mini").split(","),
+    "summary": os.getenv("SUMMARY_MODELS", "gpt-4o-mini").split(","),
+}
+TIER_ENABLED = os.getenv("TIER_ENABLED", "1") == "1"
+# p95 of recent attempts (by latency tracker) above which a stage steps down
+TIER_P95_SECONDS = {
+    "llm": float(os.getenv("TIER_P95_SECONDS_LLM", "3")),
+    "llm_ttft": float(os.getenv("TIER_P95_SECONDS_LLM_TTFT", "1.5")),
+    "analyze": float(os.getenv("TIER_P95_SECONDS_ANALYZE", "8")),
+    "summary": float(os.getenv("TIER_P95_SECONDS_SUMMARY", "10")),
+}
+TIER_MIN_SAMPLES = int(os.getenv("TIER_MIN_SAMPLES", "20"))
+TIER_QUEUE_WAIT_SECONDS = float(os.getenv("TIER_QUEUE_WAIT_SECONDS", "0.5"))
+TIER_MAX_LOAD = float(os.getenv("TIER_MAX_LOAD", "1.0"))
+TIER_MIN_DEADLINE_SECONDS = float(os.getenv("TIER_MIN_DEADLINE_SECONDS", "8"))
+# Tokens a session may use before it is moved to the cheaper tier (0 = no limit)
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "0"))
+
+LLM_TOKENS = Counter("angin_llm_tokens_total", "Chat completion tokens billed", ("stage", "model", "kind"))
+TTS_CHARACTERS = Counter("angin_tts_characters_total", "Characters sent to ElevenLabs for synthesis")
+PROMPT_CACHED_SHARE = Histogram("angin_prompt_cached_share",
+                                "Share of each completion's prompt served from the provider's prompt cache",
+                                ("stage",), buckets=(0, 0.25, 0.5, 0.75, 0.9, 1))
+MODEL_CHOICES = Counter("angin_model_tier_total", "Chat model picked per call, and why", ("stage", "model", "reason"))
+
+
+class Usage:
+    """
+    Tokens and TTS characters billed within one scope: a request, a call
+    session, or the whole process. Scopes form a chain (request → session
+    → process) and everything recorded in a scope is added to its parents.
+    """
+
+    def __init__(self, parent: Optional["Usage"] = None, budget: int = 0):
+        self.parent = parent
+        self.budget = budget  # tokens, 0 = no limit
+        self.prompt_tokens = 0
+        self.cached_tokens = 0  # part of prompt_tokens served from the provider's prompt cache
+        self.completion_tokens = 0
+        self.tts_characters = 0
+        self.models: dict = {}  # model → {"calls", "prompt_tokens", "cached_tokens", "completion_tokens"}
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add_completion(self, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0):
+        scope = self
+        while scope is not None:
+            scope.prompt_tokens += prompt_tokens
+            scope.cached_tokens += cached_tokens
+            scope.completion_tokens += completion_tokens
+            entry = scope.models.setdefault(
+                model, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0})
+            entry["calls"] += 1
+            entry["prompt_tokens"] += prompt_tokens
+            entry["cached_tokens"] += cached_tokens
+            entry["completion_tokens"] += completion_tokens
+            scope = scope.parent
+
+    def add_tts(self, characters: int):
+        scope = self
+        while scope is not None:
+            scope.tts_characters += characters
+            scope = scope.parent
+
+    def over_budget(self) -> bool:
+        scope = self
+        while scope is not None:
+            if scope.budget and scope.tokens >= scope.budget:
+                return True
+            scope = scope.parent
+        return False
+
+    def empty(self) -> bool:
+        return not self.models and not self.tts_characters
+
+    def snapshot(self) -> dict:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tts_characters": self.tts_characters,
+            "models": {model: dict(entry) for model, entry in self.models.items()},
+        }
+
+    def header(self) -> str:
+        """X-Usage value: `name=count` pairs, then `model=...` for each model used."""
+        parts = [f"prompt_tokens={self.prompt_tokens}", f"cached_tokens={self.cached_tokens}",
+                 f"completion_tokens={self.completion_tokens}", f"tts_characters={self.tts_characters}"]
+        parts += [f"model={model}" for model in self.models]
+        return "; ".join(parts)
+
+
+usage_totals = Usage()
+usage_sessions = TTLStore(CALL_SESSION_MAX, CALL_SESSION_IDLE_SECONDS)
+
+# Usage scope of the request (or WebSocket turn) being handled
+_request_usage: ContextVar[Optional[Usage]] = ContextVar("request_usage", default=None)
+
+
+def session_usage(session_id: str) -> Usage:
+    usage = usage_sessions.get(session_id)
+    if usage is None:
+        usage = Usage(parent=usage_totals, budget=SESSION_TOKEN_BUDGET)
+        usage_sessions.put(session_id, usage)
+    return usage
+
+
+def usage_scope(session_id: Optional[str] = None) -> Usage:
+    """A fresh scope for one request, counted towards `session_id` if given."""
+    return Usage(parent=session_usage(session_id) if session_id else usage_totals)
+
+
+def current_usage() -> Usage:
+    return _request_usage.get() or usage_totals
+
+
+def record_completion_usage(stage: str, model: str, usage):
+    """Count one completion's tokens (`usage` as returned by the SDK; may be None)."""
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+    LLM_TOKENS.inc(prompt_tokens, stage=stage, model=model, kind="prompt")
+    LLM_TOKENS.inc(cached_tokens, stage=stage, model=model, kind="cached")
+    LLM_TOKENS.inc(completion_tokens, stage=stage, model=model, kind="completion")
+    if prompt_tokens:
+        PROMPT_CACHED_SHARE.observe(cached_tokens / prompt_tokens, stage=stage)
+    current_usage().add_completion(model, prompt_tokens, completion_tokens, cached_tokens)
+
+
+def record_tts_usage(text: str):
+    TTS_CHARACTERS.inc(len(text))
+    current_usage().add_tts(len(text))
+
+
+class ModelPolicy:
+    """
+    Picks the chat model for one logical call. A stage uses its default
+    model unless one of these says it won't be answered in time or the
+    spend is capped, in which case it drops to the next tier:
+
+      p95       the stage's recent latency is over TIER_P95_SECONDS
+      queue     OpenAI slot waits are backing up (p95 over TIER_QUEUE_WAIT_SECONDS)
+      load      more calls want an OpenAI slot than there are slots
+      deadline  less than TIER_MIN_DEADLINE_SECONDS left for this request
+      budget    the session has used its SESSION_TOKEN_BUDGET
+
+    Urgent turns (PRIORITY_URGENT, which a high provisional urgency sets)
+    only step down for p95: load, deadline and spend don't cost them the
+    better model.
+
+    The latency window holds samples from both tiers, so once the faster
+    model has pulled the p95 back down the default is tried again.
+    """
+
+    def __init__(self, tiers: dict):
+        self.tiers = tiers
+        self.stats: dict = {}  # "stage/model/reason" → calls
+
+    def reason(self, tracker: str) -> Optional[str]:
+        p95 = latency_trackers[tracker].percentile(95, TIER_MIN_SAMPLES)
+        if p95 is not None and p95 > TIER_P95_SECONDS[tracker]:
+            return "p95"
+        if current_priority() == PRIORITY_URGENT:
+            return None
+        limiter = upstream_limiters["openai"]
+        if limiter.wait_p95() > TIER_QUEUE_WAIT_SECONDS:
+            return "queue"
+        if limiter.load() > TIER_MAX_LOAD:
+            return "load"
+        left = remaining_budget()
+        if left is not None and left < TIER_MIN_DEADLINE_SECONDS:
+            return "deadline"
+        if current_usage().over_budget():
+            return "budget"
+        return None
+
+    def choose(self, stage: str, tracker: Optional[str] = None) -> str:
+        tiers = self.tiers[stage]
+        reason = self.reason(tracker or stage) if TIER_ENABLED and len(tiers) > 1 else None
+        model = tiers[1] if reason else tiers[0]
+        reason = reason or "default"
+        MODEL_CHOICES.inc(stage=stage, model=model, reason=reason)
+        key = f"{stage}/{model}/{reason}"
+        self.stats[key] = self.stats.get(key, 0) + 1
+        return model
+
+    def snapshot(self) -> dict:
+        return {"tiers": self.tiers, "choices": dict(self.stats)}
+
+
+model_policy = ModelPolicy(MODEL_TIERS)
+
+
+@app.get("/usage/sessions/{session_id}")
+def get_session_usage(session_id: str):
+    """
+    Tokens and TTS characters used so far by a call session: a WebSocket
+    session, or HTTP requests sent with the same X-Session-Id header.
+    """
+    usage = usage_sessions.get(session_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return {"session_id": session_id, **usage.snapshot(), "budget": usage.budget or None}
+
+
+# ============================================================================
+# Idempotent Calls: per-stage checkpoints reused by client retries
+# ============================================================================
+
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "500"))
+IDEMPOTENCY_IDLE_SECONDS = float(os.getenv("IDEMPOTENCY_IDLE_SECONDS", "600"))
+# Reply audio longer than this is not checkpointed (a retry re-synthesizes it)
+IDEMPOTENCY_MAX_AUDIO_BYTES = int(os.getenv("IDEMPOTENCY_MAX_AUDIO_BYTES", str(1024 * 1024)))
+
+IDEMPOTENT_STAGES = Counter("angin_idempotent_stages_total",
+                            "Stages of idempotent calls: run (miss) or reused from a checkpoint (hit)",
+                            ("endpoint", "stage", "outcome"))
+
+
+class CallCheckpoint:
+    """
+    Results of the finished stages of one call (transcript, reply, audio),
+    kept under its Idempotency-Key. Failed stages leave nothing behind.
+    """
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.results: dict = {}
+        # Held while a stage runs, so a retry racing the original waits for it
+        self.lock = asyncio.Lock()
+
+
+class CheckpointedCall:
+    """
+    One request's view of a CallCheckpoint: a stage with a result is
+    reused, the first one without runs (and is recorded), so a retry picks
+    up where the previous attempt stopped. Without an idempotency key the
+    checkpoint is private to the request and nothing is counted.
+    """
+
+    def __init__(self, endpoint: str, checkpoint: CallCheckpoint, stats: Optional[dict] = None):
+        self.endpoint = endpoint
+        self.checkpoint = checkpoint
+        self.stats = stats
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, stage_name: str, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.stats is None:
+            return
+        outcome = "hit" if hit else "miss"
+        IDEMPOTENT_STAGES.inc(endpoint=self.endpoint, stage=stage_name, outcome=outcome)
+        entry = self.stats.setdefault(stage_name, {"hit": 0, "miss": 0})
+        entry[outcome] += 1
+
+    @property
+    def replayed(self) -> bool:
+        """Every stage of this request came from the checkpoint."""
+        return self.hits > 0 and self.misses == 0
+
+    async def stage(self, name: str, run):
+        """The recorded result of stage `name`, or `await run()` and record it."""
+        results = self.checkpoint.results
+        async with self.checkpoint.lock:
+            self._count(name, name in results)
+            if name not in results:
+                results[name] = await run()
+            return results[name]
+
+    def audio(self, fmt: AudioFormat) -> Optional[bytes]:
+        audio = self.checkpoint.results.get(f"audio:{fmt.name}")
+        self._count("audio", audio is not None)
+        return audio
+
+    async def record_audio(self, fmt: AudioFormat, chunks):
+        """Relay reply audio, recording it once it has been streamed in full."""
+        parts, size = [], 0
+        async for chunk in chunks:
+            size += len(chunk)
+            if size <= IDEMPOTENCY_MAX_AUDIO_BYTES:
+                parts.append(chunk)
+            yield chunk
+        if self.stats is not None and size <= IDEMPOTENCY_MAX_AUDIO_BYTES:
+            self.checkpoint.results[f"audio:{fmt.name}"] = b"".join(parts)
+
+
+class IdempotencyStore:
+    """Bounded, idle-expiring CallCheckpoints by (endpoint, Idempotency-Key)."""
+
+    def __init__(self, max_keys: int, idle_seconds: float):
+        self.checkpoints = TTLStore(max_keys, idle_seconds)
+        self.stats: dict = {}  # stage → {"hit", "miss"}
+        self.conflicts = 0
+
+    async def open(self, endpoint: str, key: Optional[str], audio: AudioSource, *params) -> CheckpointedCall:
+        """
+        This request's view of the checkpoint for `key`, created on first
+        use. Reusing a key with a different recording or parameters is
+        rejected with 422.
+        """
+        if not key:
+            return CheckpointedCall(endpoint, CallCheckpoint(""))
+        digest = await asyncio.to_thread(audio_digest, audio)
+        fingerprint = hashlib.sha256(json.dumps([digest, *params]).encode("utf-8")).hexdigest()
+        checkpoint = self.checkpoints.get(f"{endpoint}\0{key}")
+        if checkpoint is None:
+            checkpoint = CallCheckpoint(fingerprint)
+            self.checkpoints.put(f"{endpoint}\0{key}", checkpoint)
+        elif checkpoint.fingerprint != fingerprint:
+            self.conflicts += 1
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        return CheckpointedCall(endpoint, checkpoint, self.stats)
+
+    def snapshot(self) -> dict:
+        return {"keys": len(self.checkpoints), "evicted": self.checkpoints.evictions,
+                "conflicts": self.conflicts, "stages": {k: dict(v) for k, v in self.stats.items()}}
+
+
+idempotency_store = IdempotencyStore(IDEMPOTENCY_MAX_KEYS, IDEMPOTENCY_IDLE_SECONDS)
+
+
+def replay_headers(call: CheckpointedCall) -> dict:
+    return {"Idempotent-Replayed": "true"} if call.replayed else {}
 
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of request, stage and upstream metrics."""
+    lines = []
+    for metric in Metric.registry:
+        lines.extend(metric.render())
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/stats")
+def debug_stats():
+    """Runtime counters for tuning: upstream connection reuse, etc."""
+    return {
+        "pools": {name: stats.snapshot() for name, stats in upstreams.stats.items()},
+        "tts_cache": tts_cache.snapshot(),
+        "call_sessions": {"active": len(call_sessions), "evicted": call_sessions.evictions},
+        "ingest_uploads": {"active": len(ingest_uploads), "evicted": ingest_uploads.evictions},
+        "batch_jobs": {"jobs": len(batch_runner.jobs), "queued_items": batch_runner.queued()},
+        "history": history_compactor.snapshot(),
+        "audio_preprocess": audio_stats.snapshot(),
+        "admission": {name: limiter.snapshot() for name, limiter in upstream_limiters.items()},
+        "coalescing": {f.name: f.snapshot() for f in (tts_flights, stt_flights, analysis_flights, transcode_flights)},
+        "fillers": filler_library.snapshot(),
+        "preclassifier": preclassifier.snapshot(),
+        "usage": {**usage_totals.snapshot(), "sessions": len(usage_sessions)},
+        "idempotency": idempotency_store.snapshot(),
+        "model_tiers": model_policy.snapshot(),
+        "startup": readiness.snapshot(),
+    }
+
+
+# ============================================================================
+# Startup: Warmup & Readiness
+# ============================================================================
+
+STARTUP_IMPORT_BUDGET_SECONDS = float(os.getenv("STARTUP_IMPORT_BUDGET_SECONDS", "1.5"))
+
+STARTUP_SECONDS = Gauge("angin_startup_seconds", "Duration of each cold-start phase", ("phase",))
+
+
+class Readiness:
+    """
+    Cold-start bookkeeping. The warmup loads the OpenAI SDK off the event
+    loop, opens and prewarms the upstream pools, preloads the TTS cache and
+    synthesizes filler clips. Failed phases are logged and skipped: a worker
+    that could not warm up still serves, just slower.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.phases: dict = {}
+        self.errors: dict = {}
+
+    def record(self, phase: str, seconds: float):
+        self.phases[phase] = round(seconds, 4)
+        STARTUP_SECONDS.set(seconds, phase=phase)
+
+    def imported(self):
+        elapsed = time.perf_counter() - _import_started
+        self.record("import", elapsed)
+        if elapsed > STARTUP_IMPORT_BUDGET_SECONDS:
+            print(f"Startup: import took {elapsed:.2f}s (budget {STARTUP_IMPORT_BUDGET_SECONDS:.2f}s)")
+
+    async def _phase(self, name: str, fn):
+        start = time.perf_counter()
+        try:
+            await fn()
+        except Exception as e:
+            print(f"Warmup {name} failed: {e!r}")
+            self.errors[name] = repr(e)
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    async def warm(self):
+        start = time.perf_counter()
+        # Warmup traffic yields to any calls that arrive meanwhile
+        _request_priority.set(PRIORITY_BACKGROUND)
+
+        async def open_pools():
+            await asyncio.to_thread(importlib.import_module, "openai")
+            upstreams.open()
+            if HTTP_PREWARM_CONNECTIONS > 0:
+                await upstreams.prewarm()
+
+        await self._phase("pools", open_pools)
+        await self._phase("tts_cache", tts_cache.preload)
+        if FILLERS_ENABLED:
+            await self._phase("fillers", filler_library.load)
+        self.record("warmup", time.perf_counter() - start)
+        self.ready = True
+
+    def snapshot(self) -> dict:
+        return {"ready": self.ready, "phases": self.phases, "errors": self.errors}
+
+
+readiness = Readiness()
+
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until the startup warmup has finished (unlike /health)."""
+    return JSONResponse(readiness.snapshot(), status_code=200 if readiness.ready else 503)
+
+
+readiness.imported()
@@ -0,0 +1,59 @@
+// Reader for the backend's `application/vnd.angin.frames` responses:
+// [1-byte kind][4-byte big-endian length][payload], where kind "J" is a
+// UTF-8 JSON event and kind "A" is audio/mpeg bytes in playback order.
+import { File, Paths } from "expo-file-system";
+import { Platform } from "react-native";
+
+export const FRAMES_MEDIA_TYPE = "application/vnd.angin.frames";
+
+export type FramedReply = {
+  events: any[];
+  audio: Uint8Array;
+};
+
+export function parseFrames(buffer: ArrayBuffer): FramedReply {
+  const view = new DataView(buffer);
+  const bytes = new Uint8Array(buffer);
+  const decoder = new TextDecoder();
+  const events: any[] = [];
+  const chunks: Uint8Array[] = [];
+  let audioLength = 0;
+
+  let offset = 0;
+  while (offset + 5 <= bytes.length) {
+    const kind = String.fromCharCode(bytes[offset]);
+    const length = view.getUint32(offset + 1);
+    const payload = bytes.subarray(offset + 5, offset + 5 + length);
+    offset += 5 + length;
+
+    if (kind === "J") {
+      events.push(JSON.parse(decoder.decode(payload)));
+    } else if (kind === "A") {
+      chunks.push(payload);
+      audioLength += payload.length;
+    }
+  }
+
+  const audio = new Uint8Array(audioLength);
+  let position = 0;
+  for (const chunk of chunks) {
+    audio.set(chunk, position);
+    position += chunk.length;
+  }
+  return { events, audio };
+}
+
+// expo-av plays from a URI, so the audio goes to a cache file (or a blob
+// URL on web)
+export function audioUri(audio: Uint8Array): string {
+  if (Platform.OS === "web") {
+    return URL.createObjectURL(new Blob([audio], { type: "audio/mpeg" }));
+  }
+  const file = new File(Paths.cache, "angin-reply.mp3");
+  if (file.exists) {
+    file.delete();
+  }
+  file.create();
+  file.write(audio);
+  return file.uri;
+}
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark: TTS payload size and download time per output format on
+throttled links.
+
+Fetches /speak in each format and models its download over each link
+(one round trip of latency, then the payload at the link's bandwidth),
+reporting bytes, time until a player has enough to start, and time to
+the full clip. Against the mock upstream, sizes scale with the requested bitrate;
+point --target at a backend wired to ElevenLabs for real sizes (opus
+formats need ffmpeg on that server).
+
+Run: python scripts/bench_audio_formats.py [--runs 5] [--target http://localhost:8000]
+"""
+
+import argparse
+import statistics
+
+import httpx
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread, wait_ready
+
+# name → (downlink kbit/s, round trip ms)
+LINKS = {"2g": (50, 600), "3g": (400, 200), "4g": (4000, 60)}
+FORMATS = ("mp3_44100_128", "mp3_44100_64", "mp3_22050_32", "opus_48000_32", "opus_24000_16")
+TEXT = "That sounds really heavy. I'm here with you. What feels hardest right now?"
+
+
+def fetch_size(http: httpx.Client, fmt: str, run: int):
+    """Bytes of one /speak response (distinct text per run, so nothing is cached)."""
+    r = http.get("/speak", params={"text": f"{TEXT} ({run})", "format": fmt})
+    return len(r.content) if r.status_code == 200 else None
+
+
+def over_link(size: int, first_chunk: int, kbps: float, rtt_ms: float):
+    """(time to first chunk, time to full body) for `size` bytes over the link."""
+    rate = kbps * 1000 / 8
+    return rtt_ms / 1000 + first_chunk / rate, rtt_ms / 1000 + size / rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target", help="measure an already running backend")
+    parser.add_argument("--first-chunk", type=int, default=4096,
+                        help="bytes a player needs before it can start")
+    args = parser.parse_args()
+
+    def measure(base_url: str):
+        results = {}
+        with httpx.Client(base_url=base_url, timeout=60.0) as http:
+            for fmt in FORMATS:
+                sizes = []
+                for run in range(args.runs):
+                    size = fetch_size(http, fmt, run)
+                    if size is None:
+                        break
+                    sizes.append(size)
+                if sizes:
+                    results[fmt] = statistics.median(sizes)
+        return results
+
+    if args.target:
+        sizes = measure(args.target.rstrip("/"))
+    else:
+        with serve_in_thread(create_mock_app(0.05), free_port()) as upstream_url:
+            main_module = load_backend(upstream_url, TIMING_LOG=0)
+            with serve_in_thread(main_module.app, free_port()) as base_url:
+                wait_ready(base_url)
+                sizes = measure(base_url)
+
+    print(f"\n{'format':<16}{'bytes':>9}" + "".join(f"{link:>20}" for link in LINKS))
+    print(f"{'':<16}{'':>9}" + "".join(f"{'first / full (s)':>20}" for _ in LINKS))
+    for fmt, size in sizes.items():
+        cells = []
+        for kbps, rtt in LINKS.values():
+            first, full = over_link(size, min(args.first_chunk, size), kbps, rtt)
+            cells.append(f"{first:8.2f} / {full:6.2f}")
+        print(f"{fmt:<16}{size:>9.0f}" + "".join(f"{cell:>20}" for cell in cells))
+    skipped = [fmt for fmt in FORMATS if fmt not in sizes]
+    if skipped:
+        print(f"\nnot available on this server: {', '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold start of the backend as a fresh process.
+
+Spawns uvicorn against the mock upstream and measures, from process start:
+when /health first answers (port bound), when /ready reports the warmup
+done, and when the first /angin/turn succeeds — which is what a caller
+waking a scaled-to-zero deployment waits for. The backend's own per-phase
+timings (import, pools, tts_cache, fillers) come from /ready.
+
+Run: python scripts/bench_cold_start.py [--runs 5] [--latency 0.2]
+"""
+
+import argparse
+import statistics
+import time
+
+import httpx
+
+from loadtest import spawn_backend
+from mock_upstream import add_profile_args, create_mock_app, free_port, profile_from_args, serve_in_thread
+
+TURN_PAYLOAD = {"history": [{"role": "user", "content": "I can't sleep because of work."}]}
+
+
+def first_success(request, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            if request().status_code == 200:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError("backend did not come up")
+
+
+def cold_start(upstream_url: str, extra_env: dict) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = spawn_backend(upstream_url, port, extra_env)
+    try:
+        deadline = start + 60
+        # Poll the turn first: a warmup racing the first call is the case to measure
+        turn = first_success(lambda: httpx.post(f"{base_url}/angin/turn", json=TURN_PAYLOAD, timeout=30), deadline)
+        ready = first_success(lambda: httpx.get(f"{base_url}/ready", timeout=1), deadline)
+        phases = httpx.get(f"{base_url}/ready").json()["phases"]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {"first_turn": turn - start, "ready": ready - start, **{f"backend_{k}": v for k, v in phases.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the backend (repeatable)")
+    add_profile_args(parser)
+    args = parser.parse_args()
+    extra_env = dict(item.split("=", 1) for item in args.backend_env)
+
+    with serve_in_thread(create_mock_app(profile=profile_from_args(args)), free_port()) as upstream_url:
+        runs = [cold_start(upstream_url, extra_env) for _ in range(args.runs)]
+
+    print(f"\ncold start over {args.runs} runs (median / max, seconds)")
+    for key in runs[0]:
+        values = [run[key] for run in runs if key in run]
+        print(f"  {key:<20} {statistics.median(values):7.3f} {max(values):7.3f}")
+
+
+if __name__ == "__main__":
+    main()
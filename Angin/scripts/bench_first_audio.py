@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: silence after the caller stops talking, with and without fillers.
+
+Drives /angin/call-stream against the mock upstream and measures, per turn,
+the time from sending the recording to the first audio frame (a filler
+clip when enabled) and to the first audio of the actual reply. The
+backend's view of the same gap is in angin_first_audio_seconds on /metrics.
+
+Run: python scripts/bench_first_audio.py [--turns 20] [--latency 0.5]
+"""
+
+import argparse
+import statistics
+import time
+
+import httpx
+
+from mock_upstream import (add_profile_args, create_mock_app, free_port, load_backend,
+                           profile_from_args, serve_in_thread, wait_ready)
+from test_call_stream import read_frames
+
+
+def measure(base_url: str, turns: int, fillers: bool):
+    first, reply = [], []
+    wait_ready(base_url)
+    with httpx.Client(base_url=base_url, timeout=60.0) as http:
+        for i in range(turns):
+            files = {"audio": ("clip.m4a", bytes([i % 256]) * 1024, "audio/m4a")}
+            start = time.perf_counter()
+            first_at = reply_at = None
+            in_filler = False
+            with http.stream("POST", "/angin/call-stream", files=files, params={"fillers": fillers}) as r:
+                r.raise_for_status()
+                for kind, payload in read_frames(r.iter_raw()):
+                    if kind == b"J":
+                        in_filler = payload["event"] == "filler"
+                        continue
+                    now = time.perf_counter() - start
+                    first_at = first_at if first_at is not None else now
+                    if not in_filler and reply_at is None:
+                        reply_at = now
+            first.append(first_at)
+            reply.append(reply_at)
+    return first, reply
+
+
+def report(label: str, values):
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    print(f"  {label:<28} p50 {statistics.median(values) * 1000:7.0f} ms   p95 {p95 * 1000:7.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    with serve_in_thread(create_mock_app(profile=profile_from_args(args)), free_port()) as upstream_url:
+        main_module = load_backend(upstream_url, FILLERS_ENABLED=1, TIMING_LOG=0)
+        with serve_in_thread(main_module.app, free_port()) as base_url:
+            plain_first, _ = measure(base_url, args.turns, fillers=False)
+            filled_first, filled_reply = measure(base_url, args.turns, fillers=True)
+
+    print(f"\nend of speech → audio over {args.turns} turns")
+    report("first audio, no fillers", plain_first)
+    report("first audio, fillers", filled_first)
+    report("reply audio, fillers", filled_reply)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: server-side audio preprocessing before STT.
+
+Synthesizes sample clips shaped like HIGH_QUALITY phone recordings
+(44.1 kHz stereo WAV, silence before and after the speech), runs them
+through transcribe_audio with preprocessing off and on against a mock
+STT whose latency grows with upload size, and reports bytes saved and
+the STT latency change. A silence-only clip shows the early drop.
+
+Run: python scripts/bench_preprocess.py [--bytes-per-second 2000000]
+"""
+
+import argparse
+import asyncio
+import io
+import time
+import wave
+
+import numpy as np
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+
+RATE = 44100
+
+
+def synth_clip(lead_s: float, speech_s: float, tail_s: float, seed: int = 0) -> bytes:
+    """Stereo 16-bit WAV: low noise, a voiced segment, low noise again."""
+    rng = np.random.default_rng(seed)
+    total = int((lead_s + speech_s + tail_s) * RATE)
+    signal = rng.normal(0, 0.002, total)
+    t = np.arange(int(speech_s * RATE)) / RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    syllables = 0.5 * (1 + np.sin(2 * np.pi * 4 * t)) ** 2
+    start = int(lead_s * RATE)
+    signal[start:start + len(t)] += 0.2 * voiced * syllables
+    stereo = np.repeat(signal[:, None], 2, axis=1)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes((np.clip(stereo, -1, 1) * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+CLIPS = {
+    "short": synth_clip(1.5, 2.0, 2.0, seed=1),
+    "medium": synth_clip(1.0, 6.0, 3.0, seed=2),
+    "long": synth_clip(2.0, 15.0, 4.0, seed=3),
+    "silence": synth_clip(3.0, 0.0, 0.0, seed=4),
+}
+
+
+async def run(main, runs: int):
+    rows = []
+    for name, clip in CLIPS.items():
+        timings = {}
+        for enabled in (False, True):
+            main.AUDIO_PREPROCESS = enabled
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                try:
+                    await main.transcribe_audio(clip, "recording.wav")
+                except main.HTTPException as e:
+                    assert e.status_code == 400
+                samples.append(time.perf_counter() - start)
+            timings[enabled] = sorted(samples)[len(samples) // 2]
+        out, _ = (await main.preprocess_audio(clip, "recording.wav")) if name != "silence" else (b"", None)
+        rows.append((name, len(clip), len(out), timings[False], timings[True]))
+    await main.upstreams.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3, help="mock STT base latency")
+    parser.add_argument("--bytes-per-second", type=float, default=2_000_000,
+                        help="mock STT upload+processing throughput")
+    args = parser.parse_args()
+
+    mock = create_mock_app(args.latency, stt_bytes_per_second=args.bytes_per_second)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        backend = load_backend(upstream_url)
+        rows = asyncio.run(run(backend, args.runs))
+
+    print(f"\nffmpeg: {'yes' if backend.FFMPEG else 'no (WAV fallback)'}")
+    print(f"{'clip':<8} {'bytes in':>10} {'bytes out':>10} {'saved':>7}  {'STT raw':>9} {'STT prep':>9}")
+    for name, size_in, size_out, raw_t, prep_t in rows:
+        saved = 1 - size_out / size_in
+        print(f"{name:<8} {size_in:>10} {size_out:>10} {saved:>6.0%}  "
+              f"{raw_t * 1000:>7.0f}ms {prep_t * 1000:>7.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: prompt-processing time over a simulated 30-turn call, with the
+summary after the history (current layout) vs. before it (the old one).
+
+Drives /angin/turn turn by turn, the client keeping the history and a
+running summary it updates every turn, against a mock upstream that
+caches prompt prefixes like OpenAI (1024+ tokens, 128-token steps) and
+charges `--prefill-ms` per 1k uncached prompt tokens. The old layout is
+reproduced by swapping build_turn_messages in the loaded backend.
+
+Reports prompt and cached tokens (from X-Usage), the prefill time the
+mock charged, and turn latency as the client saw it.
+
+Run: python scripts/bench_prompt_cache.py [--turns 30] [--prefill-ms 400] [--budget 1200]
+"""
+
+import argparse
+import statistics
+import time
+
+import httpx
+
+from mock_upstream import MockProfile, create_mock_app, free_port, load_backend, serve_in_thread, wait_ready
+
+LINES = (
+    "Work has been relentless and I keep taking it home with me.",
+    "I snapped at my sister on the phone and I feel awful about it.",
+    "Every time my phone buzzes I assume it is my manager with bad news.",
+    "I tried the breathing thing last night and it helped for a while.",
+    "Part of me thinks I should just quit, but then I panic about money.",
+    "My friends keep inviting me out and I keep making excuses.",
+)
+
+
+def summary_first_messages(main):
+    """The previous layout: summary as a second system message, before the history."""
+    def build(request):
+        messages = [*main.TURN_PREFIX]
+        if request.summary:
+            messages.append({"role": "system", "content": f"Conversation summary so far: {request.summary}"})
+        messages.extend({"role": msg.role, "content": msg.content} for msg in request.history)
+        return messages
+    return build
+
+
+def run_call(layout: str, args) -> dict:
+    profile = MockProfile(args.latency, prompt_cache=True, prefill_seconds_per_token=args.prefill_ms / 1e6)
+    mock = create_mock_app(profile=profile)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, HISTORY_TOKEN_BUDGET=args.budget, TIMING_LOG=0, HEDGE_ENABLED=0)
+        if layout == "summary first":
+            main.build_turn_messages = summary_first_messages(main)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            wait_ready(base_url)
+            history, latencies, prompt, cached = [], [], [], []
+            with httpx.Client(base_url=base_url, timeout=60.0) as http:
+                for turn in range(args.turns):
+                    line = " ".join(LINES[(turn + i) % len(LINES)] for i in range(3))
+                    history.append({"role": "user", "content": line})
+                    summary = f"Call so far ({turn} turns): work stress, guilt about family, poor sleep."
+                    start = time.perf_counter()
+                    r = http.post("/angin/turn", json={"summary": summary, "history": history})
+                    r.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                    usage = dict(part.split("=", 1) for part in r.headers["x-usage"].split("; "))
+                    prompt.append(int(usage["prompt_tokens"]))
+                    cached.append(int(usage["cached_tokens"]))
+                    history.append({"role": "assistant", "content": r.json()["response"]})
+            while main.history_compactor._tasks:  # let background summaries finish
+                time.sleep(0.05)
+
+    uncached = [p - c for p, c in mock.state.prompt_usage]
+    latencies.sort()
+    return {
+        "prompt_tokens": sum(prompt),
+        "cached_share": sum(cached) / sum(prompt),
+        "prefill_s": sum(uncached) * args.prefill_ms / 1e6,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--prefill-ms", type=float, default=400, help="ms per 1k uncached prompt tokens")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock completion time besides prefill")
+    parser.add_argument("--budget", type=int, default=1200, help="HISTORY_TOKEN_BUDGET for the backend")
+    args = parser.parse_args()
+
+    print(f"\n{args.turns}-turn call, {args.prefill_ms:.0f} ms per 1k uncached prompt tokens")
+    print(f"{'layout':<16}{'prompt tok':>12}{'cached':>9}{'prefill s':>11}{'turn p50':>10}{'turn p95':>10}")
+    for layout in ("summary last", "summary first"):
+        result = run_call(layout, args)
+        print(f"{layout:<16}{result['prompt_tokens']:>12}{result['cached_share']:>9.0%}"
+              f"{result['prefill_s']:>11.2f}{result['p50_ms']:>8.0f}ms{result['p95_ms']:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark: time to first byte for streamed vs. buffered TTS.
+
+Starts a local mock TTS (audio spread across several chunks), the real
+backend, and a minimal buffered relay that reproduces the old `/speak`
+behaviour (wait for the full body, then respond). Reports TTFB and total
+time for both.
+
+Run: python scripts/bench_tts_stream.py [--runs 20] [--latency 1.0]
+"""
+
+import argparse
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+
+
+def create_buffered_relay(upstream_url: str) -> FastAPI:
+    relay = FastAPI()
+
+    @relay.get("/speak")
+    async def speak(text: str):
+        async with httpx.AsyncClient(base_url=upstream_url) as http:
+            r = await http.post("/v1/text-to-speech/voice/stream", json={"text": text})
+        return Response(content=r.content, media_type="audio/mpeg")
+
+    return relay
+
+
+def measure(base_url: str, runs: int):
+    ttfb, total = [], []
+    with httpx.Client(base_url=base_url, timeout=60.0) as http:
+        for _ in range(runs):
+            start = time.perf_counter()
+            with http.stream("GET", "/speak", params={"text": "Take a slow breath with me."}) as r:
+                r.raise_for_status()
+                first = None
+                for _chunk in r.iter_raw():
+                    if first is None:
+                        first = time.perf_counter() - start
+            ttfb.append(first)
+            total.append(time.perf_counter() - start)
+    return ttfb, total
+
+
+def report(label: str, ttfb, total):
+    print(f"{label:<10} TTFB p50 {statistics.median(ttfb) * 1000:7.1f} ms   "
+          f"total p50 {statistics.median(total) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=1.0,
+                        help="mock synthesis time spread across the stream")
+    args = parser.parse_args()
+
+    with serve_in_thread(create_mock_app(args.latency), free_port()) as upstream_url:
+        # Cache off: every request must actually stream from the mock
+        backend = load_backend(upstream_url, TTS_CACHE_ENABLED=0)
+        with serve_in_thread(backend.app, free_port()) as streamed_url, \
+                serve_in_thread(create_buffered_relay(upstream_url), free_port()) as buffered_url:
+            streamed = measure(streamed_url, args.runs)
+            buffered = measure(buffered_url, args.runs)
+
+    print(f"\n{args.runs} runs, mock synthesis {args.latency:.2f}s")
+    report("streamed", *streamed)
+    report("buffered", *buffered)
+    gain = statistics.median(buffered[0]) - statistics.median(streamed[0])
+    print(f"TTFB improvement: {gain * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
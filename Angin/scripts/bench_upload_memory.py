@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: backend memory under concurrent large uploads.
+
+Starts the mock upstream and the backend as a uvicorn subprocess, then
+posts N large recordings to /analyze at once while sampling the backend's
+RSS. Uploads spool to disk above UPLOAD_SPOOL_BYTES and are streamed to
+STT from there, so peak RSS should grow far less than the bytes in flight.
+Pass --target to measure another build (e.g. a checkout of an older
+commit) started by hand with the same mock.
+
+Run: python scripts/bench_upload_memory.py [--uploads 16] [--size-mb 20]
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from loadtest import RssSampler, start_backend
+from mock_upstream import create_mock_app, free_port, serve_in_thread
+
+
+async def upload_all(base_url: str, uploads: int, payload: bytes):
+    async with httpx.AsyncClient(base_url=base_url, timeout=300.0) as http:
+        async def one(i: int):
+            # Distinct content so coalescing doesn't merge the transcriptions
+            files = {"audio": (f"long-{i}.m4a", bytes([i % 256]) + payload, "audio/m4a")}
+            r = await http.post("/analyze", files=files)
+            return r.status_code
+
+        return await asyncio.gather(*(one(i) for i in range(uploads)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=16, help="concurrent uploads")
+    parser.add_argument("--size-mb", type=float, default=20, help="size of each upload")
+    parser.add_argument("--stt-latency", type=float, default=1.0, help="mock transcription time")
+    parser.add_argument("--spool-bytes", type=int, help="UPLOAD_SPOOL_BYTES for the backend")
+    parser.add_argument("--target", help="measure an already running backend (RSS not sampled)")
+    args = parser.parse_args()
+
+    payload = b"\x00" * int(args.size_mb * 1024 * 1024)
+    in_flight_mb = args.uploads * args.size_mb
+    mock = create_mock_app(0.05, stt_bytes_per_second=0)
+    mock.state.profile.per_kind_latency["stt_latency"] = args.stt_latency
+
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        if args.target:
+            start = time.perf_counter()
+            statuses = asyncio.run(upload_all(args.target.rstrip("/"), args.uploads, payload))
+            memory = {}
+        else:
+            env = {"UPLOAD_MAX_BYTES": str(len(payload) + 1024), "TIMING_LOG": "0"}
+            if args.spool_bytes is not None:
+                env["UPLOAD_SPOOL_BYTES"] = str(args.spool_bytes)
+            port = free_port()
+            backend = start_backend(upstream_url, port, env)
+            try:
+                with RssSampler(backend.pid, interval=0.02) as sampler:
+                    time.sleep(0.2)
+                    start = time.perf_counter()
+                    statuses = asyncio.run(upload_all(f"http://127.0.0.1:{port}", args.uploads, payload))
+                memory = sampler.summary()
+            finally:
+                backend.terminate()
+                backend.wait(timeout=10)
+        elapsed = time.perf_counter() - start
+
+    ok = sum(status == 200 for status in statuses)
+    print(f"\n{args.uploads} x {args.size_mb:.0f} MB uploads ({in_flight_mb:.0f} MB in flight): "
+          f"{ok}/{args.uploads} ok in {elapsed:.1f}s")
+    if memory:
+        growth = memory["rss_peak_mb"] - memory["rss_start_mb"]
+        print(f"backend RSS {memory['rss_start_mb']:.0f} MB → peak {memory['rss_peak_mb']:.0f} MB "
+              f"(+{growth:.0f} MB, {growth / in_flight_mb:.2f} MB per MB in flight)")
+
+
+if __name__ == "__main__":
+    main()
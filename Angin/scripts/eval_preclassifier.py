@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the mood/urgency pre-classifier against LLM labels.
+
+Input is JSONL with a `text` field and the LLM's `mood` and `urgency`,
+which is what the backend writes when PRECLASSIFY_LOG is set. Records
+without labels can be labelled by a running backend's /angin/turn (the
+real model, or the mock) with --label-with, and saved with --save.
+
+Reports agreement per field, the urgency confusion matrix (recall on
+"high" is the number that matters) and per-turn classification latency.
+
+Run: python scripts/eval_preclassifier.py --dataset turns.jsonl
+     python scripts/eval_preclassifier.py --dataset texts.jsonl --label-with http://localhost:8000 --save labelled.jsonl
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import httpx
+
+from mock_upstream import BACKEND_DIR
+
+URGENCY_LEVELS = ("low", "medium", "high")
+
+
+def load_dataset(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def label_with_backend(records: list, base_url: str) -> list:
+    with httpx.Client(base_url=base_url.rstrip("/"), timeout=60.0) as http:
+        for record in records:
+            if "mood" in record and "urgency" in record:
+                continue
+            r = http.post("/angin/turn", json={"history": [{"role": "user", "content": record["text"]}]})
+            r.raise_for_status()
+            record.update({k: r.json()[k] for k in ("mood", "urgency")})
+    return records
+
+
+def evaluate(records: list, classify, repeats: int) -> dict:
+    timings, agree = [], {"mood": 0, "urgency": 0}
+    confusion = {(llm, ours): 0 for llm in URGENCY_LEVELS for ours in URGENCY_LEVELS}
+    for record in records:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            labels = classify(record["text"])
+        timings.append((time.perf_counter() - start) / repeats)
+        agree["mood"] += labels.mood == record["mood"]
+        agree["urgency"] += labels.urgency == record["urgency"]
+        confusion[(record["urgency"], labels.urgency)] += 1
+
+    timings.sort()
+    flagged_high = sum(confusion[(llm, "high")] for llm in URGENCY_LEVELS)
+    llm_high = sum(confusion[("high", ours)] for ours in URGENCY_LEVELS)
+    return {
+        "turns": len(records),
+        "mood_agreement": agree["mood"] / len(records),
+        "urgency_agreement": agree["urgency"] / len(records),
+        "high_recall": confusion[("high", "high")] / llm_high if llm_high else None,
+        "high_precision": confusion[("high", "high")] / flagged_high if flagged_high else None,
+        "confusion": confusion,
+        "latency_us_p50": statistics.median(timings) * 1e6,
+        "latency_us_p99": timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1e6,
+        "latency_us_max": timings[-1] * 1e6,
+    }
+
+
+def report(result: dict):
+    print(f"\n{result['turns']} turns")
+    print(f"  mood agreement     {result['mood_agreement']:.1%}")
+    print(f"  urgency agreement  {result['urgency_agreement']:.1%}")
+    for name in ("high_recall", "high_precision"):
+        value = result[name]
+        print(f"  {name.replace('_', ' '):<18} {'n/a' if value is None else f'{value:.1%}'}")
+    print("\n  urgency  LLM \\ ours " + "".join(f"{level:>8}" for level in URGENCY_LEVELS))
+    for llm in URGENCY_LEVELS:
+        print(f"  {llm:>19} " + "".join(f"{result['confusion'][(llm, ours)]:>8}" for ours in URGENCY_LEVELS))
+    print(f"\n  latency  p50 {result['latency_us_p50']:.0f} µs   p99 {result['latency_us_p99']:.0f} µs"
+          f"   max {result['latency_us_max']:.0f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", required=True, help="JSONL with text (+ mood, urgency)")
+    parser.add_argument("--label-with", metavar="URL", help="backend used to label unlabelled records")
+    parser.add_argument("--save", help="write the labelled dataset here")
+    parser.add_argument("--repeats", type=int, default=100, help="classifications per record when timing")
+    args = parser.parse_args()
+
+    records = load_dataset(args.dataset)
+    if args.label_with:
+        records = label_with_backend(records, args.label_with)
+    if args.save:
+        with open(args.save, "w") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+    records = [r for r in records if "mood" in r and "urgency" in r]
+    if not records:
+        sys.exit("no labelled records (use --label-with)")
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    from main import preclassifier
+
+    report(evaluate(records, preclassifier.classify, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
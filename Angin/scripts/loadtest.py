@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the backend.
+
+Starts the local mock upstream (see mock_upstream.py) and the backend as
+a separate uvicorn process pointed at it, then drives /angin/turn,
+/angin/call, /analyze and /speak at a fixed concurrency. Reports p50/p95/
+p99 latency, throughput, error counts and backend RSS, and can save the
+results as JSON and compare them with an earlier run.
+
+Examples:
+    python scripts/loadtest.py --concurrency 32 --requests 400
+    python scripts/loadtest.py --distribution lognormal --straggler-rate 0.02 --out run.json
+    python scripts/loadtest.py --no-coalesce --no-tts-cache   # every request reaches the upstreams
+    python scripts/loadtest.py --out after.json --compare before.json
+    python scripts/loadtest.py --target http://127.0.0.1:8000   # existing server
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from mock_upstream import (BACKEND_DIR, add_profile_args, create_mock_app, free_port,
+                           profile_from_args, serve_in_thread)
+
+ENDPOINTS = ("turn", "call", "analyze", "speak")
+AUDIO = b"\x00" * 32_000
+HISTORY = [
+    {"role": "user", "content": "Work has been piling up and I can't sleep."},
+    {"role": "assistant", "content": "That sounds exhausting. What feels heaviest right now?"},
+    {"role": "user", "content": "The deadline tomorrow. I don't think I'll make it."},
+]
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def send(http: httpx.AsyncClient, endpoint: str, i: int, repeat_text: bool, repeat_audio: bool) -> int:
+    """Issue one request and read the whole body; returns the status code."""
+    # Distinct uploads by default, so concurrent requests can't share an STT call
+    audio = AUDIO if repeat_audio else AUDIO + i.to_bytes(4, "big")
+    if endpoint == "turn":
+        r = await http.post("/angin/turn", json={"history": HISTORY})
+    elif endpoint == "call":
+        files = {"audio": ("recording.m4a", audio, "audio/m4a")}
+        r = await http.post("/angin/call", files=files, params={"history": json.dumps(HISTORY)})
+    elif endpoint == "analyze":
+        files = {"audio": ("recording.m4a", audio, "audio/m4a")}
+        r = await http.post("/analyze", files=files)
+    else:
+        text = "Take a slow breath with me." if repeat_text else f"Take a slow breath with me, number {i}."
+        r = await http.get("/speak", params={"text": text})
+    return r.status_code
+
+
+async def drive(base_url: str, endpoint: str, concurrency: int, total: int,
+                repeat_text: bool, repeat_audio: bool) -> dict:
+    latencies, errors = [], 0
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as http:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                start = time.perf_counter()
+                try:
+                    status = await send(http, endpoint, i, repeat_text, repeat_audio)
+                except httpx.HTTPError:
+                    status = 0
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / wall, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+    }
+
+
+class RssSampler:
+    """Samples a process's resident set size from /proc while a run is going."""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def rss_mb(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self.rss_mb()
+            if rss is not None:
+                self.samples.append(rss)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {}
+        return {"rss_start_mb": round(self.samples[0], 1), "rss_peak_mb": round(max(self.samples), 1)}
+
+
+def spawn_backend(upstream_url: str, port: int, extra_env: dict) -> subprocess.Popen:
+    """Start the backend against the mock, with a fresh TTS cache file and batch job directory."""
+    scratch = tempfile.mkdtemp(prefix="angin-")
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "test-key",
+        "ELEVENLABS_API_KEY": "test-key",
+        "OPENAI_BASE_URL": f"{upstream_url}/v1",
+        "ELEVENLABS_BASE_URL": upstream_url,
+        "TTS_CACHE_PATH": os.path.join(scratch, "tts_cache.sqlite3"),
+        "BATCH_DIR": os.path.join(scratch, "batch_jobs"),
+        "TIMING_LOG": "0",
+        **extra_env,
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(BACKEND_DIR),
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+
+
+def start_backend(upstream_url: str, port: int, extra_env: dict) -> subprocess.Popen:
+    """Spawn the backend and wait until it reports ready (warmed up)."""
+    proc = spawn_backend(upstream_url, port, extra_env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                return proc
+            time.sleep(0.1)
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("backend did not start")
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_table(results: dict, baseline: dict = None):
+    header = f"{'endpoint':<9} {'req':>5} {'err':>4} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, row in results["endpoints"].items():
+        line = (f"{name:<9} {row['requests']:>5} {row['errors']:>4} {row['throughput_rps']:>8.1f} "
+                f"{row['p50_ms']:>7.0f}ms {row['p95_ms']:>7.0f}ms {row['p99_ms']:>7.0f}ms")
+        base = (baseline or {}).get("endpoints", {}).get(name)
+        if base:
+            def delta(key):
+                return (row[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+            line += (f"   vs baseline: rps {delta('throughput_rps'):+.0f}%  "
+                     f"p50 {delta('p50_ms'):+.0f}%  p95 {delta('p95_ms'):+.0f}%  p99 {delta('p99_ms'):+.0f}%")
+        print(line)
+    if results.get("memory"):
+        print(f"backend RSS: {results['memory']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated subset of " + ",".join(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--repeat-text", action="store_true", help="same /speak text every time (cache-friendly)")
+    parser.add_argument("--repeat-audio", action="store_true",
+                        help="same upload for every /angin/call and /analyze (coalescing-friendly)")
+    parser.add_argument("--no-coalesce", action="store_true", help="spawn the backend with COALESCE_REQUESTS=0")
+    parser.add_argument("--no-tts-cache", action="store_true",
+                        help="spawn the backend with TTS_CACHE_ENABLED=0 (the mock's reply text never varies)")
+    parser.add_argument("--target", help="drive an already running backend instead of starting one")
+    parser.add_argument("--backend-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the spawned backend")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    endpoints = [e for e in args.endpoints.split(",") if e]
+    extra_env = dict(kv.split("=", 1) for kv in args.backend_env)
+    if args.no_coalesce:
+        extra_env["COALESCE_REQUESTS"] = "0"
+    if args.no_tts_cache:
+        extra_env["TTS_CACHE_ENABLED"] = "0"
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "mock": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "target")},
+        },
+        "endpoints": {},
+    }
+
+    def run_all(base_url: str, sampler=None):
+        for endpoint in endpoints:
+            print(f"→ {endpoint}: {args.requests} requests @ concurrency {args.concurrency}")
+            results["endpoints"][endpoint] = asyncio.run(
+                drive(base_url, endpoint, args.concurrency, args.requests, args.repeat_text, args.repeat_audio)
+            )
+        if sampler:
+            results["memory"] = sampler.summary()
+
+    if args.target:
+        run_all(args.target.rstrip("/"))
+    else:
+        mock = create_mock_app(profile=profile_from_args(args))
+        with serve_in_thread(mock, free_port()) as upstream_url:
+            port = free_port()
+            backend = start_backend(upstream_url, port, extra_env)
+            try:
+                with RssSampler(backend.pid) as sampler:
+                    run_all(f"http://127.0.0.1:{port}", sampler)
+            finally:
+                backend.terminate()
+                backend.wait(timeout=10)
+        results["meta"]["upstream_calls"] = mock.state.calls_by_kind
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print()
+    print_table(results, baseline)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI and ElevenLabs APIs.
+
+Used by the offline test and benchmark scripts so they can run without
+API keys. Point the backend at it with:
+
+    OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+    ELEVENLABS_BASE_URL=http://127.0.0.1:<port>
+
+Latency distribution, error rate, stragglers and streaming behaviour are
+set with a MockProfile.
+
+Run standalone: python scripts/mock_upstream.py --port 9000 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+TURN_JSON = {
+    "mood": "anxious",
+    "urgency": "medium",
+    "strategy": "reflect",
+    "response": "That sounds really heavy. I'm here with you. What feels hardest right now?",
+    "next_action": "ask_more",
+}
+
+ANALYSIS_JSON = {
+    "emotion": "anxious",
+    "intensity": "medium",
+    "topics": ["work"],
+    "summary": "The user feels stressed about a deadline.",
+    "suggested_response": "That sounds stressful. Let's take it one step at a time.",
+    "tts_text": "That sounds stressful. Let's take it one step at a time.",
+}
+
+FAKE_MP3 = b"\xff\xf3\x44\xc4" + b"\x00" * 4092
+
+# Token counts reported for every chat completion (and streamed when asked)
+USAGE = {"prompt_tokens": 100, "completion_tokens": 40, "total_tokens": 140,
+         "prompt_tokens_details": {"cached_tokens": 0}}
+
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_STEP_TOKENS = 128
+
+
+def prompt_text(messages: list) -> str:
+    """A chat prompt as the flat text the provider tokenizes and caches by prefix."""
+    return "".join(f"<|{m['role']}|>{m['content']}<|end|>" for m in messages)
+
+
+def completion_chunks(content: str, pieces: int):
+    """Split `content` into roughly equal deltas, like a streamed completion."""
+    size = max(1, -(-len(content) // pieces))
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+class MockProfile:
+    """
+    How the mock upstream behaves.
+
+    latency       median seconds per call (per kind via stt/llm/tts_latency)
+    distribution  "fixed", "uniform" (±jitter) or "lognormal" (sigma=jitter)
+    error_rate    fraction of calls answered with `error_status`
+    straggler_rate / straggler_factor
+                  fraction of calls that take `straggler_factor` times longer
+    stream        False makes streaming endpoints send everything at the end
+    model_latency chat completion latency per model, e.g. {"gpt-4.1-nano": 0.1}
+    prompt_cache  count prompt tokens (~4 characters each) and serve repeated
+                  prefixes from a cache like OpenAI's: prefixes of 1024+
+                  tokens, in 128-token steps. Each uncached prompt token
+                  adds `prefill_seconds_per_token` to the completion.
+    """
+
+    def __init__(self, latency: float = 0.5, distribution: str = "fixed", jitter: float = 0.25,
+                 error_rate: float = 0.0, error_status: int = 500,
+                 straggler_rate: float = 0.0, straggler_factor: float = 5.0,
+                 stream: bool = True, llm_chunks: int = 12, tts_chunks: int = 8,
+                 stt_bytes_per_second: float = 0, seed: Optional[int] = None,
+                 model_latency: Optional[dict] = None, prompt_cache: bool = False,
+                 prefill_seconds_per_token: float = 0.0, **per_kind_latency):
+        self.latency = latency
+        self.per_kind_latency = per_kind_latency  # e.g. stt_latency=0.8
+        self.model_latency = model_latency or {}
+        self.prompt_cache = prompt_cache
+        self.prefill_seconds_per_token = prefill_seconds_per_token
+        self.distribution = distribution
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.straggler_rate = straggler_rate
+        self.straggler_factor = straggler_factor
+        self.stream = stream
+        self.llm_chunks = llm_chunks
+        self.tts_chunks = tts_chunks
+        self.stt_bytes_per_second = stt_bytes_per_second
+        self.rng = random.Random(seed)
+
+    def delay(self, kind: str, model: Optional[str] = None) -> float:
+        base = self.model_latency.get(model, self.per_kind_latency.get(f"{kind}_latency", self.latency))
+        if self.distribution == "uniform":
+            base *= self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        elif self.distribution == "lognormal":
+            base *= self.rng.lognormvariate(0, self.jitter)
+        if self.straggler_rate and self.rng.random() < self.straggler_rate:
+            base *= self.straggler_factor
+        return max(base, 0.0)
+
+    def error(self) -> Optional[Response]:
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return JSONResponse({"error": {"message": "mock upstream error"}}, status_code=self.error_status)
+        return None
+
+
+def create_mock_app(latency: float = 0.5, stt_bytes_per_second: float = 0,
+                    profile: Optional[MockProfile] = None) -> FastAPI:
+    """
+    Build a mock upstream. By default every endpoint sleeps `latency`
+    seconds; pass a MockProfile for distributions, errors and stragglers.
+    Streaming endpoints spread their latency across their chunks.
+    With `stt_bytes_per_second`, transcription also pays for upload size.
+    """
+    profile = profile or MockProfile(latency, stt_bytes_per_second=stt_bytes_per_second)
+    mock = FastAPI()
+    mock.state.profile = profile
+    mock.state.calls = 0
+    mock.state.calls_by_kind = {"stt": 0, "llm": 0, "tts": 0}
+    mock.state.last_chat = None
+    mock.state.stt_body_sizes = []
+    mock.state.chats = []
+    mock.state.transcript = "I have a big deadline tomorrow and I can't sleep."
+    mock.state.tts_formats = []
+    mock.state.tts_failures = 0  # fail this many upcoming TTS calls with a 500
+    mock.state.stt_failures = 0  # likewise for transcriptions
+    mock.state.prompts = deque(maxlen=256)  # recent prompt texts, for the prompt cache
+    mock.state.prompt_usage = []            # (prompt_tokens, cached_tokens) per completion
+
+    def chat_usage(messages: list) -> dict:
+        if not profile.prompt_cache:
+            return USAGE
+        text = prompt_text(messages)
+        shared = max((len(os.path.commonprefix([text, seen])) for seen in mock.state.prompts), default=0)
+        mock.state.prompts.append(text)
+        prompt_tokens, shared_tokens = len(text) // 4, shared // 4
+        cached = 0
+        if shared_tokens >= PROMPT_CACHE_MIN_TOKENS:
+            cached = shared_tokens - (shared_tokens - PROMPT_CACHE_MIN_TOKENS) % PROMPT_CACHE_STEP_TOKENS
+        mock.state.prompt_usage.append((prompt_tokens, cached))
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": 40,
+                "total_tokens": prompt_tokens + 40, "prompt_tokens_details": {"cached_tokens": cached}}
+
+    def count(kind: str):
+        mock.state.calls += 1
+        mock.state.calls_by_kind[kind] += 1
+
+    @mock.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        body = await request.body()
+        count("stt")
+        mock.state.stt_body_sizes.append(len(body))
+        bps = profile.stt_bytes_per_second
+        await asyncio.sleep(profile.delay("stt") + (len(body) / bps if bps else 0))
+        if mock.state.stt_failures:
+            mock.state.stt_failures -= 1
+            return JSONResponse({"error": {"message": "mock STT failure"}}, status_code=500)
+        if (error := profile.error()) is not None:
+            return error
+        return {"text": mock.state.transcript}
+
+    @mock.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        count("llm")
+        mock.state.last_chat = body
+        mock.state.chats.append(body)
+        # /analyze's prompt asks for tts_text; turns and summaries get a turn
+        system = body["messages"][0]["content"] if body.get("messages") else ""
+        content = ANALYSIS_JSON if "tts_text" in system else TURN_JSON
+        usage = chat_usage(body.get("messages") or [])
+        uncached = usage["prompt_tokens"] - usage["prompt_tokens_details"]["cached_tokens"]
+        prefill = uncached * profile.prefill_seconds_per_token
+        delay = profile.delay("llm", body.get("model"))
+        if (error := profile.error()) is not None:
+            await asyncio.sleep(delay)
+            return error
+
+        if body.get("stream"):
+            deltas = completion_chunks(json.dumps(content), profile.llm_chunks if profile.stream else 1)
+
+            async def events():
+                await asyncio.sleep(prefill)
+                for delta in deltas:
+                    await asyncio.sleep(delay / len(deltas))
+                    chunk = {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "mock"),
+                        "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    chunk = {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "mock"),
+                        "choices": [],
+                        "usage": usage,
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(prefill + delay)
+        return JSONResponse({
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(content)},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    @mock.post("/v1/text-to-speech/{voice_id}")
+    async def text_to_speech(voice_id: str, request: Request):
+        await request.body()
+        count("tts")
+        await asyncio.sleep(profile.delay("tts"))
+        if (error := profile.error()) is not None:
+            return error
+        return Response(content=FAKE_MP3, media_type="audio/mpeg")
+
+    @mock.post("/v1/text-to-speech/{voice_id}/stream")
+    async def text_to_speech_stream(voice_id: str, request: Request):
+        await request.body()
+        count("tts")
+        output_format = request.query_params.get("output_format")
+        mock.state.tts_formats.append(output_format)
+        delay = profile.delay("tts")
+        if mock.state.tts_failures:
+            mock.state.tts_failures -= 1
+            return JSONResponse({"detail": {"message": "mock TTS failure"}}, status_code=500)
+        if (error := profile.error()) is not None:
+            await asyncio.sleep(delay)
+            return error
+        pieces = profile.tts_chunks if profile.stream else 1
+        # Lower bitrates (e.g. mp3_22050_32) send proportionally fewer bytes
+        bitrate = int(output_format.rsplit("_", 1)[1]) if output_format else 128
+        piece = FAKE_MP3 * (profile.tts_chunks // pieces)
+        piece = piece[:max(len(piece) * bitrate // 128, 1)]
+
+        async def chunks():
+            for _ in range(pieces):
+                await asyncio.sleep(delay / pieces)
+                yield piece
+
+        return StreamingResponse(chunks(), media_type="audio/mpeg")
+
+    return mock
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve_in_thread(app, port: int):
+    """Run an ASGI app with uvicorn on a background thread until exit."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+def wait_ready(base_url: str, timeout: float = 30):
+    """Block until the backend's startup warmup is done (/ready answers 200)."""
+    deadline = time.time() + timeout
+    while httpx.get(f"{base_url}/ready", timeout=timeout).status_code != 200:
+        if time.time() > deadline:
+            raise RuntimeError("backend did not become ready")
+        time.sleep(0.05)
+
+
+_env_overrides = set()
+
+
+def load_backend(upstream_url: str, **env):
+    """
+    Import backend/main.py configured against a mock upstream, with a fresh
+    TTS cache file and batch job directory, and no filler clips (their
+    synthesis would show up in upstream call counts; pass FILLERS_ENABLED=1).
+    Extra keyword arguments are set as environment variables (and cleared
+    again on the next call).
+    """
+    for key in _env_overrides:
+        os.environ.pop(key, None)
+    _env_overrides.clear()
+    _env_overrides.update(env)
+    scratch = tempfile.mkdtemp(prefix="angin-")
+    os.environ.update({
+        "OPENAI_API_KEY": "test-key",
+        "ELEVENLABS_API_KEY": "test-key",
+        "OPENAI_BASE_URL": f"{upstream_url}/v1",
+        "ELEVENLABS_BASE_URL": upstream_url,
+        "TTS_CACHE_PATH": os.path.join(scratch, "tts_cache.sqlite3"),
+        "BATCH_DIR": os.path.join(scratch, "batch_jobs"),
+        "FILLERS_ENABLED": "0",
+        **{k: str(v) for k, v in env.items()},
+    })
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    sys.modules.pop("main", None)
+    import main
+    return main
+
+
+def add_profile_args(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group("mock upstream")
+    group.add_argument("--latency", type=float, default=0.5, help="median seconds per upstream call")
+    group.add_argument("--stt-latency", type=float, help="override for transcription")
+    group.add_argument("--llm-latency", type=float, help="override for chat completions")
+    group.add_argument("--tts-latency", type=float, help="override for text-to-speech")
+    group.add_argument("--distribution", choices=["fixed", "uniform", "lognormal"], default="fixed")
+    group.add_argument("--jitter", type=float, default=0.25)
+    group.add_argument("--error-rate", type=float, default=0.0)
+    group.add_argument("--error-status", type=int, default=500)
+    group.add_argument("--straggler-rate", type=float, default=0.0)
+    group.add_argument("--straggler-factor", type=float, default=5.0)
+    group.add_argument("--no-stream", action="store_true", help="streaming endpoints send one chunk")
+    group.add_argument("--seed", type=int)
+
+
+def profile_from_args(args) -> MockProfile:
+    per_kind = {f"{k}_latency": getattr(args, f"{k}_latency")
+                for k in ("stt", "llm", "tts") if getattr(args, f"{k}_latency") is not None}
+    return MockProfile(
+        args.latency, distribution=args.distribution, jitter=args.jitter,
+        error_rate=args.error_rate, error_status=args.error_status,
+        straggler_rate=args.straggler_rate, straggler_factor=args.straggler_factor,
+        stream=not args.no_stream, seed=args.seed, **per_kind,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9000)
+    add_profile_args(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_mock_app(profile=profile_from_args(args)), host="127.0.0.1", port=args.port)
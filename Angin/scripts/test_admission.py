@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test for admission control in front of the upstreams.
+
+With one OpenAI slot, a live /angin/turn must overtake a backlog of
+/analyze uploads, even when it joins one of them in flight; a full queue
+must be turned away with 503 + Retry-After;
+and upstream rate limits must reach the client as 429, not 500.
+
+Run: python scripts/test_admission.py   (or via pytest)
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from mock_upstream import MockProfile, create_mock_app, free_port, load_backend, serve_in_thread, wait_ready
+
+LATENCY = 0.3
+TURN_PAYLOAD = {"history": [{"role": "user", "content": "I can't sleep because of work."}]}
+
+
+async def _live_turn_behind_batch(base_url: str, backlog: int):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as http:
+        async def analyze(i: int):
+            # Distinct uploads so coalescing can't merge them
+            files = {"audio": ("clip.m4a", bytes([i + 1]) * 1024, "audio/m4a")}
+            r = await http.post("/analyze", files=files)
+            r.raise_for_status()
+
+        async def turn():
+            await asyncio.sleep(LATENCY / 2)  # arrive once the backlog is queued
+            start = time.perf_counter()
+            r = await http.post("/angin/turn", json=TURN_PAYLOAD)
+            r.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await asyncio.gather(turn(), *(analyze(i) for i in range(backlog)))
+        batch_elapsed = time.perf_counter() - start
+        metrics = (await http.get("/metrics")).text
+    return results[0], batch_elapsed, metrics
+
+
+def test_live_turn_overtakes_batch_work():
+    with serve_in_thread(create_mock_app(LATENCY), free_port()) as upstream_url:
+        main = load_backend(upstream_url, UPSTREAM_LIMIT_OPENAI=1)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            wait_ready(base_url)  # the warmup's SDK import would stall the event loop
+            turn_elapsed, batch_elapsed, metrics = asyncio.run(_live_turn_behind_batch(base_url, 4))
+
+    print(f"live turn {turn_elapsed:.2f}s behind a {batch_elapsed:.2f}s batch backlog")
+    # It waits for at most the call already holding the slot, then runs
+    assert turn_elapsed < 3 * LATENCY
+    assert batch_elapsed > 6 * LATENCY
+    assert 'angin_upstream_queue_wait_seconds_count{upstream="openai",priority="batch"}' in metrics
+
+
+async def _live_call_joins_batch_upload(base_url: str, backlog: int):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as http:
+        shared = {"audio": ("clip.m4a", b"\xff" * 1024, "audio/m4a")}
+
+        async def analyze(files: dict, delay: float = 0.0):
+            await asyncio.sleep(delay)
+            r = await http.post("/analyze", files=files)
+            r.raise_for_status()
+
+        async def call():
+            await asyncio.sleep(LATENCY / 2)  # the shared upload is queued last by now
+            start = time.perf_counter()
+            r = await http.post("/angin/call-json", files=shared)
+            r.raise_for_status()
+            return time.perf_counter() - start
+
+        others = [{"audio": ("clip.m4a", bytes([i + 1]) * 1024, "audio/m4a")} for i in range(backlog)]
+        results = await asyncio.gather(call(), *(analyze(files) for files in others), analyze(shared, LATENCY / 4))
+        metrics = (await http.get("/metrics")).text
+    return results[0], metrics
+
+
+def test_live_call_raises_priority_of_joined_flight():
+    with serve_in_thread(create_mock_app(LATENCY), free_port()) as upstream_url:
+        main = load_backend(upstream_url, UPSTREAM_LIMIT_OPENAI=1, HEDGE_ENABLED=0)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            wait_ready(base_url)
+            call_elapsed, metrics = asyncio.run(_live_call_joins_batch_upload(base_url, 8))
+
+    print(f"live call joined to a queued batch transcription: {call_elapsed:.2f}s")
+    # STT and LLM each wait for at most the call holding the slot
+    assert call_elapsed < 6 * LATENCY
+    assert 'angin_coalesced_calls_total{stage="stt"} 1' in metrics
+
+
+async def _burst(base_url: str, n: int):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as http:
+        return await asyncio.gather(*(http.post("/angin/turn", json=TURN_PAYLOAD) for _ in range(n)))
+
+
+def test_full_queue_rejected_with_retry_after():
+    with serve_in_thread(create_mock_app(LATENCY), free_port()) as upstream_url:
+        main = load_backend(upstream_url, UPSTREAM_LIMIT_OPENAI=1, UPSTREAM_QUEUE_MAX=1)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            start = time.perf_counter()
+            responses = asyncio.run(_burst(base_url, 5))
+            elapsed = time.perf_counter() - start
+            stats = httpx.get(f"{base_url}/debug/stats").json()["admission"]["openai"]
+
+    rejected = [r for r in responses if r.status_code == 503]
+    assert sum(r.status_code == 200 for r in responses) == 2
+    assert len(rejected) == 3 and all(int(r.headers["retry-after"]) >= 1 for r in rejected)
+    assert stats["rejected"] == 3 and stats["active"] == 0
+    assert elapsed < 3 * LATENCY
+
+
+def test_upstream_rate_limit_maps_to_429():
+    mock = create_mock_app(profile=MockProfile(0.01, error_rate=1.0, error_status=429))
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            turn = httpx.post(f"{base_url}/angin/turn", json=TURN_PAYLOAD, timeout=30.0)
+            speak = httpx.get(f"{base_url}/speak", params={"text": "Hello there."}, timeout=30.0)
+
+    assert turn.status_code == 429 and "retry-after" in turn.headers
+    assert speak.status_code == 429 and "retry-after" in speak.headers
+
+
+if __name__ == "__main__":
+    test_live_turn_overtakes_batch_work()
+    test_live_call_raises_priority_of_joined_flight()
+    test_full_queue_rejected_with_retry_after()
+    test_upstream_rate_limit_maps_to_429()
+    print("✓ Admission control")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test for single-round-trip replies.
+
+/analyze/speak must return the analysis as the first frame and the audio
+for its suggested response right after, in one response. /angin/call must
+survive a non-ASCII transcript: percent-encoded headers by default, or the
+metadata as a JSON frame ahead of the audio when frames are accepted.
+
+Run: python scripts/test_analyze_speak.py   (or via pytest)
+"""
+
+from urllib.parse import unquote
+
+import httpx
+
+from mock_upstream import ANALYSIS_JSON, FAKE_MP3, create_mock_app, free_port, load_backend, serve_in_thread
+from test_call_stream import read_frames
+
+FRAMES = "application/vnd.angin.frames"
+TRANSCRIPT = "Aku capek banget… kerjaan numpuk 😞"
+
+
+def test_analysis_and_audio_in_one_response():
+    mock = create_mock_app(0.05)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            files = {"audio": ("clip.m4a", b"\x00" * 1024, "audio/m4a")}
+            with httpx.stream("POST", f"{base_url}/analyze/speak", files=files, timeout=30.0) as r:
+                content_type = r.headers["content-type"]
+                frames = list(read_frames(r.iter_raw()))
+
+    kinds = [kind for kind, _ in frames]
+    assert content_type == FRAMES
+    assert frames[0][0] == b"J" and frames[0][1]["event"] == "analysis"
+    assert frames[0][1]["suggested_response"] == ANALYSIS_JSON["suggested_response"]
+    audio = b"".join(payload for kind, payload in frames if kind == b"A")
+    assert audio and audio == FAKE_MP3 * (len(audio) // len(FAKE_MP3))
+    assert kinds.index(b"A") == 1 and frames[-1][1]["event"] == "done"
+    assert frames[-1][1]["usage"]["models"]["gpt-4.1-mini"]["calls"] == 1
+    assert mock.state.calls_by_kind == {"stt": 1, "llm": 1, "tts": 1}
+
+
+def test_call_with_non_ascii_transcript():
+    mock = create_mock_app(0.01)
+    mock.state.transcript = TRANSCRIPT
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            files = {"audio": ("clip.m4a", b"\x00" * 1024, "audio/m4a")}
+            plain = http.post("/angin/call", files=files)
+            framed = http.post("/angin/call", files=files, headers={"Accept": FRAMES})
+
+    assert plain.status_code == 200 and plain.headers["content-type"] == "audio/mpeg"
+    assert unquote(plain.headers["x-transcript"]) == TRANSCRIPT
+    assert plain.content.startswith(FAKE_MP3)
+
+    frames = list(read_frames([framed.content]))
+    assert framed.headers["content-type"] == FRAMES
+    assert frames[0][1]["event"] == "metadata" and frames[0][1]["transcript"] == TRANSCRIPT
+    assert frames[0][1]["mood"] == "anxious"
+    assert b"".join(payload for kind, payload in frames if kind == b"A") == plain.content
+
+
+if __name__ == "__main__":
+    test_analysis_and_audio_in_one_response()
+    test_call_with_non_ascii_transcript()
+    print("✓ Analyze-and-speak")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test for negotiated TTS output formats.
+
+A `format` query parameter, an Accept header or `Save-Data: on` must pick
+the encoding requested from ElevenLabs (or transcoded with ffmpeg), and
+each variant must be cached under its own key.
+
+Run: python scripts/test_audio_formats.py   (or via pytest)
+"""
+
+import httpx
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+
+TEXT = "Take a slow breath with me."
+
+
+def test_accept_header_ranking():
+    with serve_in_thread(create_mock_app(0), free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+
+    assert main.parse_accept("audio/ogg;q=0.5, audio/mpeg, */*;q=0") == ["audio/mpeg", "audio/ogg"]
+    assert main.negotiate_audio_format(None, "audio/mpeg", "on").name == "mp3_22050_32"
+    assert main.negotiate_audio_format(None, "*/*").name == "mp3_44100_128"
+    # Opus is only offered when it can be transcoded
+    expected = "opus_48000_32" if main.FFMPEG else "mp3_44100_128"
+    assert main.negotiate_audio_format(None, "audio/ogg, audio/mpeg;q=0.8").name == expected
+
+
+def test_formats_requested_and_cached_separately():
+    mock = create_mock_app(0.01)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            default = http.get("/speak", params={"text": TEXT})
+            low = http.get("/speak", params={"text": TEXT}, headers={"Save-Data": "on"})
+            low_again = http.get("/speak", params={"text": TEXT, "format": "mp3_22050_32"})
+            default_again = http.get("/speak", params={"text": TEXT})
+            unknown = http.get("/speak", params={"text": TEXT, "format": "flac"})
+            opus = http.get("/speak", params={"text": TEXT, "format": "opus_48000_32"})
+            transcodes = http.get("/debug/stats").json()["coalescing"]["transcode"]
+
+    assert mock.state.tts_formats[:2] == [None, "mp3_22050_32"]
+    assert len(low.content) * 4 == len(default.content)
+    assert low_again.content == low.content and default_again.content == default.content
+    assert low.headers["content-type"] == "audio/mpeg" and "Save-Data" in low.headers["vary"]
+    assert unknown.status_code == 400
+    if main.FFMPEG:
+        # The mock's mp3 is a stub frame, so only check the transcode was attempted
+        assert opus.status_code != 406
+        assert opus.status_code != 200 or opus.headers["content-type"] == "audio/ogg"
+    else:
+        assert opus.status_code == 406
+    assert transcodes["calls"] == (1 if main.FFMPEG else 0)
+    # Both mp3 variants came from the cache on repeat; opus reuses the cached default
+    assert mock.state.calls_by_kind["tts"] == 2
+
+
+if __name__ == "__main__":
+    test_accept_header_ranking()
+    test_formats_requested_and_cached_separately()
+    print("✓ Audio formats")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test for the batch analysis job API.
+
+Uploaded recordings must be analyzed by the worker pool with progress
+streamed until completion and results served as JSONL. A manifest job
+interrupted by a restart must resume with only the unfinished items.
+Results fetched while the job is still writing them are a consistent
+snapshot of complete lines.
+Uploaded jobs are capped at what Starlette will parse from one form.
+
+Run: python scripts/test_batch_jobs.py   (or via pytest)
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+import httpx
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+
+
+def test_uploaded_batch_runs_to_completion():
+    mock = create_mock_app(0.1)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, BATCH_WORKERS=2)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            files = [("files", (f"rec-{i}.m4a", bytes([i + 1]) * 512, "audio/m4a")) for i in range(6)]
+            job = http.post("/analyze/jobs", files=files).json()
+            with http.stream("GET", f"/analyze/jobs/{job['job_id']}/progress") as r:
+                progress = [json.loads(line) for line in r.iter_lines() if line]
+            results = [json.loads(line) for line in http.get(f"/analyze/jobs/{job['job_id']}/results").text.splitlines()]
+
+    assert job["total"] == 6 and job["status"] == "queued"
+    assert progress[-1]["status"] == "completed" and progress[-1]["done"] == 6
+    assert sorted(r["index"] for r in results) == list(range(6))
+    assert all(r["ok"] and r["analysis"]["emotion"] == "anxious" for r in results)
+    assert {r["item"] for r in results} == {f"rec-{i}.m4a" for i in range(6)}
+    assert mock.state.calls_by_kind["stt"] == 6
+
+
+def test_manifest_job_resumes_after_restart():
+    recordings = tempfile.mkdtemp(prefix="angin-recordings-")
+    os.makedirs(os.path.join(recordings, "week1"))
+    for i in range(4):
+        with open(os.path.join(recordings, "week1", f"call-{i}.m4a"), "wb") as f:
+            f.write(bytes([i + 1]) * 512)
+    env = {"BATCH_WORKERS": 1, "BATCH_MANIFEST_ROOT": recordings, "BATCH_DIR": tempfile.mkdtemp(prefix="angin-jobs-")}
+
+    with serve_in_thread(create_mock_app(0.3), free_port()) as upstream_url:
+        main = load_backend(upstream_url, **env)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            escaped = httpx.post(f"{base_url}/analyze/jobs", data={"manifest": json.dumps({"files": ["../etc/passwd"]})})
+            job = httpx.post(f"{base_url}/analyze/jobs", data={"manifest": json.dumps({"directory": "week1"})}).json()
+            while httpx.get(f"{base_url}/analyze/jobs/{job['job_id']}").json()["done"] < 1:
+                time.sleep(0.05)
+        # Server stopped mid-job; a fresh process picks it up from disk
+        main = load_backend(upstream_url, **env)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            resumed_at = httpx.get(f"{base_url}/analyze/jobs/{job['job_id']}").json()["done"]
+            with httpx.stream("GET", f"{base_url}/analyze/jobs/{job['job_id']}/progress", timeout=30) as r:
+                final = [json.loads(line) for line in r.iter_lines() if line][-1]
+            results = httpx.get(f"{base_url}/analyze/jobs/{job['job_id']}/results").text.splitlines()
+
+    assert escaped.status_code == 400
+    assert job["total"] == 4 and 1 <= resumed_at < 4
+    assert final["status"] == "completed"
+    # Each recording analyzed exactly once across both runs
+    assert sorted(json.loads(line)["item"] for line in results) == [f"week1/call-{i}.m4a" for i in range(4)]
+
+
+def test_results_fetched_mid_job():
+    mock = create_mock_app(0.1)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, BATCH_WORKERS=2)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            files = [("files", (f"rec-{i}.m4a", bytes([i + 1]) * 512, "audio/m4a")) for i in range(8)]
+            job_id = http.post("/analyze/jobs", files=files).json()["job_id"]
+            results_path = main.batch_runner.get(job_id).results_path
+            stop = threading.Event()
+
+            def append_noise():
+                # Grows the file far faster than the workers do
+                while not stop.is_set():
+                    with open(results_path, "a") as f:
+                        f.write(json.dumps({"index": -1, "item": "noise", "ok": True}) + "\n")
+                    time.sleep(0.001)
+
+            appender = threading.Thread(target=append_noise)
+            appender.start()
+            fetches = []
+            try:
+                while http.get(f"/analyze/jobs/{job_id}").json()["status"] != "completed":
+                    fetches.append(http.get(f"/analyze/jobs/{job_id}/results"))
+            finally:
+                stop.set()
+                appender.join()
+            with open(results_path, "a") as f:
+                f.write('{"index": 99, "item"')  # torn line, as if mid-write
+            final = http.get(f"/analyze/jobs/{job_id}/results")
+
+    assert len(fetches) >= 2 and all(r.status_code == 200 for r in fetches)
+    assert all(r.text.endswith("\n") for r in fetches if r.text)
+    for r in fetches + [final]:
+        [json.loads(line) for line in r.text.splitlines()]
+    real = [json.loads(line) for line in final.text.splitlines() if json.loads(line)["index"] >= 0]
+    assert sorted(r["index"] for r in real) == list(range(8))
+
+
+def test_upload_limit_within_form_parser_limit():
+    with serve_in_thread(create_mock_app(0.01), free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        default_limit = main.BATCH_MAX_UPLOADS
+        main = load_backend(upstream_url, BATCH_MAX_ITEMS=3)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            files = [("files", (f"rec-{i}.m4a", bytes([i + 1]) * 512, "audio/m4a")) for i in range(4)]
+            r = http.post("/analyze/jobs", files=files)
+
+    # Starlette's multipart parser stops at 1000 files (Request.form's max_files)
+    assert default_limit == 1000
+    assert r.status_code == 400 and "At most 3 uploaded recordings" in r.json()["detail"]
+
+
+if __name__ == "__main__":
+    test_uploaded_batch_runs_to_completion()
+    test_manifest_job_resumes_after_restart()
+    test_results_fetched_mid_job()
+    test_upload_limit_within_form_parser_limit()
+    print("✓ Batch jobs")
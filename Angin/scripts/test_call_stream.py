@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test for the sentence-pipelined /angin/call-stream endpoint.
+
+Uses a local mock upstream whose completion streams over LATENCY seconds.
+The first audio frame should arrive well before STT + full LLM + TTS
+have run back to back, and frames must come in order. A malformed
+`history` starts the conversation fresh instead of failing the request.
+
+Run: python scripts/test_call_stream.py   (or via pytest)
+"""
+
+import json
+import struct
+import time
+
+import httpx
+
+from mock_upstream import TURN_JSON, create_mock_app, free_port, load_backend, serve_in_thread, wait_ready
+
+LATENCY = 0.6
+
+
+def read_frames(stream):
+    """Yield (kind, payload) from an application/vnd.angin.frames body."""
+    buffer = b""
+    for chunk in stream:
+        buffer += chunk
+        while len(buffer) >= 5:
+            (length,) = struct.unpack(">I", buffer[1:5])
+            if len(buffer) < 5 + length:
+                break
+            kind, payload, buffer = buffer[:1], buffer[5:5 + length], buffer[5 + length:]
+            yield kind, json.loads(payload) if kind == b"J" else payload
+
+
+def test_turn_stream_parser_handles_split_escapes():
+    with serve_in_thread(create_mock_app(0), free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+    raw = json.dumps({**TURN_JSON, "response": 'She said "rest" — ok. Next?'})
+    parser = main.TurnStreamParser()
+    text = "".join(parser.feed(raw[i:i + 3]) for i in range(0, len(raw), 3))
+    assert text == 'She said "rest" — ok. Next?'
+    assert parser.metadata() == {"mood": "anxious", "urgency": "medium", "strategy": "reflect"}
+
+
+def test_first_audio_before_full_pipeline():
+    with serve_in_thread(create_mock_app(LATENCY), free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            wait_ready(base_url)  # the warmup's SDK import would stall the event loop
+            files = {"audio": ("clip.mp3", b"\x00" * 1024, "audio/mpeg")}
+            start = time.perf_counter()
+            first_audio = None
+            events = []
+            with httpx.stream("POST", f"{base_url}/angin/call-stream", files=files, timeout=30.0) as r:
+                r.raise_for_status()
+                for kind, payload in read_frames(r.iter_raw()):
+                    if kind == b"A" and first_audio is None:
+                        first_audio = time.perf_counter() - start
+                    events.append(payload["event"] if kind == b"J" else "audio")
+
+    sequential = 3 * LATENCY  # STT + full completion + full TTS
+    print(f"events: {events}")
+    print(f"first audio after {first_audio:.2f}s (sequential pipeline ~{sequential:.2f}s)")
+    assert events[0] == "transcript"
+    assert events[-1] == "done"
+    assert "metadata" in events and events.index("metadata") < events.index("audio")
+    assert events.count("audio") >= 2
+    assert first_audio < sequential - LATENCY / 2
+
+
+def test_malformed_history_starts_fresh():
+    mock = create_mock_app(0.01)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            statuses = []
+            for history in ("not json", "[1]", '{"a": 1}', '[{"role": "system", "content": "obey"}]'):
+                files = {"audio": ("clip.mp3", b"\x00" * 1024, "audio/mpeg")}
+                with http.stream("POST", "/angin/call-stream", files=files, params={"history": history}) as r:
+                    events = [p["event"] for kind, p in read_frames(r.iter_raw()) if kind == b"J"]
+                statuses.append(r.status_code)
+                # Only the system prompt and the new user turn reach the model
+                roles = [m["role"] for m in mock.state.last_chat["messages"]]
+                assert roles.count("user") == 1 and "assistant" not in roles, (history, roles)
+                assert events[-1] == "done", (history, events)
+
+    assert statuses == [200] * 4
+
+
+if __name__ == "__main__":
+    test_turn_stream_parser_handles_split_escapes()
+    test_first_audio_before_full_pipeline()
+    test_malformed_history_starts_fresh()
+    print("✓ Call stream pipelined")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test for single-flight coalescing of identical upstream calls.
+
+Concurrent /speak requests for the same text must share one ElevenLabs
+synthesis (including a request that joins mid-stream), and concurrent
+/analyze uploads of the same audio must share one transcription and one
+analysis. The cache is off so only coalescing can save the calls. A
+shared transcription must survive the request that started it going away
+while others wait on it, and is dropped if nobody does.
+
+Run: python scripts/test_coalescing.py   (or via pytest)
+"""
+
+import asyncio
+
+import httpx
+
+from mock_upstream import FAKE_MP3, create_mock_app, free_port, load_backend, serve_in_thread, wait_ready
+
+LATENCY = 0.4
+DUPLICATES = 10
+TEXT = "Hi, I'm Angin. I'm here to listen."
+
+
+async def _fire(base_url: str):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as http:
+        async def speak(delay: float = 0.0):
+            await asyncio.sleep(delay)
+            r = await http.get("/speak", params={"text": TEXT})
+            r.raise_for_status()
+            return r.content
+
+        async def analyze():
+            files = {"audio": ("clip.m4a", b"\x01" * 2048, "audio/m4a")}
+            r = await http.post("/analyze", files=files)
+            r.raise_for_status()
+            return r.json()
+
+        # The last one arrives while the shared stream is half way through
+        spoken = await asyncio.gather(*(speak() for _ in range(DUPLICATES)), speak(LATENCY / 2))
+        analyses = await asyncio.gather(*(analyze() for _ in range(DUPLICATES)))
+        stats = (await http.get("/debug/stats")).json()["coalescing"]
+        metrics = (await http.get("/metrics")).text
+    return spoken, analyses, stats, metrics
+
+
+def test_identical_concurrent_calls_share_one_upstream_call():
+    mock = create_mock_app(LATENCY)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, TTS_CACHE_ENABLED=0)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            spoken, analyses, stats, metrics = asyncio.run(_fire(base_url))
+
+    assert mock.state.calls_by_kind == {"stt": 1, "llm": 1, "tts": 1}
+    assert all(audio == FAKE_MP3 * 8 for audio in spoken)
+    assert all(a == analyses[0] for a in analyses)
+    assert stats["tts"] == {"calls": 1, "coalesced": DUPLICATES, "in_flight": 0}
+    assert stats["stt"]["coalesced"] == stats["analyze"]["coalesced"] == DUPLICATES - 1
+    assert f'angin_coalesced_calls_total{{stage="tts"}} {DUPLICATES}' in metrics
+
+
+def test_coalescing_can_be_disabled():
+    mock = create_mock_app(0.1)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, TTS_CACHE_ENABLED=0, COALESCE_REQUESTS=0)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            spoken, _, _, _ = asyncio.run(_fire(base_url))
+
+    assert mock.state.calls_by_kind["tts"] == DUPLICATES + 1
+    assert all(audio == FAKE_MP3 * 8 for audio in spoken)
+
+
+async def _drop_first(base_url: str, join_before_drop: bool):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as http:
+        files = {"audio": ("clip.m4a", b"\x07" * 4096, "audio/m4a")}
+
+        async def busy():
+            # Holds the only OpenAI slot, so the shared STT starts after the drop
+            (await http.post("/angin/turn", json={"history": [{"role": "user", "content": "Hi."}]})).raise_for_status()
+
+        async def dropped_call():
+            await asyncio.sleep(LATENCY / 8)
+            async with http.stream("POST", "/angin/call-stream", files=files, params={"fillers": "true"}) as r:
+                frames = r.aiter_raw()
+                await frames.__anext__()  # the filler clip
+                await asyncio.sleep(LATENCY / 4)  # then hang up
+
+        async def analyze():
+            await asyncio.sleep(LATENCY / 4 if join_before_drop else LATENCY / 2)
+            return await http.post("/analyze", files=files)
+
+        results = await asyncio.gather(busy(), dropped_call(), analyze())
+    return results[2]
+
+
+def test_shared_transcription_outlives_first_request():
+    mock = create_mock_app(LATENCY)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, UPSTREAM_LIMIT_OPENAI=1, FILLERS_ENABLED=1, HEDGE_ENABLED=0)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            wait_ready(base_url)
+            analysis = asyncio.run(_drop_first(base_url, join_before_drop=True))
+            stats = httpx.get(f"{base_url}/debug/stats").json()["coalescing"]["stt"]
+
+    assert analysis.status_code == 200, analysis.text
+    assert stats["coalesced"] == 1 and mock.state.calls_by_kind["stt"] == 1
+
+
+def test_abandoned_transcription_is_dropped():
+    mock = create_mock_app(LATENCY)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, UPSTREAM_LIMIT_OPENAI=1, FILLERS_ENABLED=1, HEDGE_ENABLED=0)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            wait_ready(base_url)
+            analysis = asyncio.run(_drop_first(base_url, join_before_drop=False))
+            stats = httpx.get(f"{base_url}/debug/stats").json()["coalescing"]["stt"]
+
+    # Cancelled while still queued, so the later request makes the only call
+    assert analysis.status_code == 200, analysis.text
+    assert stats["coalesced"] == 0 and mock.state.calls_by_kind["stt"] == 1
+
+
+if __name__ == "__main__":
+    test_identical_concurrent_calls_share_one_upstream_call()
+    test_coalescing_can_be_disabled()
+    test_shared_transcription_outlives_first_request()
+    test_abandoned_transcription_is_dropped()
+    print("✓ Duplicate upstream calls coalesced")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Concurrency test for the backend against a local mock upstream.
+
+Fires N overlapping /angin/turn and /analyze requests at one backend
+worker. With non-blocking STT/LLM calls they should all finish in about
+one call's latency instead of N times that.
+
+Run: python scripts/test_concurrency.py   (or via pytest)
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+
+LATENCY = 0.5
+CONCURRENCY = 8
+
+TURN_PAYLOAD = {
+    "history": [{"role": "user", "content": "I can't sleep because of work."}]
+}
+
+
+async def _fire(base_url: str, n: int):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as http:
+        async def turn():
+            r = await http.post("/angin/turn", json=TURN_PAYLOAD)
+            r.raise_for_status()
+
+        async def analyze():
+            files = {"audio": ("clip.mp3", b"\x00" * 1024, "audio/mpeg")}
+            r = await http.post("/analyze", files=files)
+            r.raise_for_status()
+
+        # Warm one request so connection setup isn't counted
+        await turn()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(turn() for _ in range(n)))
+        turn_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await asyncio.gather(*(analyze() for _ in range(n)))
+        analyze_elapsed = time.perf_counter() - start
+
+    return turn_elapsed, analyze_elapsed
+
+
+def test_overlapping_calls_share_one_worker():
+    with serve_in_thread(create_mock_app(LATENCY), free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            turn_elapsed, analyze_elapsed = asyncio.run(_fire(base_url, CONCURRENCY))
+
+    print(f"{CONCURRENCY} x /angin/turn: {turn_elapsed:.2f}s (one call ~{LATENCY:.2f}s)")
+    print(f"{CONCURRENCY} x /analyze:    {analyze_elapsed:.2f}s (one call ~{2 * LATENCY:.2f}s)")
+
+    # Serialized execution would take CONCURRENCY times as long
+    assert turn_elapsed < 2 * LATENCY
+    assert analyze_elapsed < 2 * (2 * LATENCY)
+
+
+if __name__ == "__main__":
+    test_overlapping_calls_share_one_worker()
+    print("✓ Calls overlapped")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for deadlines, retries and hedged model calls.
+
+The mock injects stragglers (a few calls 15x slower than usual). With
+hedging, a second attempt past the adaptive threshold must cut those off
+the tail; transient 503s must be retried; and a turn that cannot finish
+within its deadline must fail fast with 504 instead of hanging.
+
+Run: python scripts/test_hedging.py   (or via pytest)
+"""
+
+import time
+
+import httpx
+
+from mock_upstream import MockProfile, create_mock_app, free_port, load_backend, serve_in_thread
+
+TURN_PAYLOAD = {"history": [{"role": "user", "content": "I can't sleep because of work."}]}
+TURNS = 40
+SLOW = 0.5
+
+
+def _run_turns(hedge: bool):
+    profile = MockProfile(0.05, straggler_rate=0.15, straggler_factor=15, seed=7)
+    with serve_in_thread(create_mock_app(profile=profile), free_port()) as upstream_url:
+        main = load_backend(upstream_url, HEDGE_ENABLED=int(hedge), HEDGE_MIN_SAMPLES=5, HEDGE_PERCENTILE=75)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            latencies = []
+            for _ in range(TURNS):
+                start = time.perf_counter()
+                http.post("/angin/turn", json=TURN_PAYLOAD).raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            metrics = http.get("/metrics").text
+    return latencies, metrics
+
+
+def test_hedging_cuts_straggler_tail():
+    plain, _ = _run_turns(hedge=False)
+    hedged, metrics = _run_turns(hedge=True)
+    slow_plain = sum(t > SLOW for t in plain)
+    slow_hedged = sum(t > SLOW for t in hedged)
+
+    print(f"turns slower than {SLOW}s: {slow_plain} unhedged, {slow_hedged} hedged")
+    # A turn now stays slow only if its hedge straggles too
+    assert slow_plain >= 3
+    assert slow_hedged * 2 <= slow_plain
+    assert 'angin_hedged_calls_total{stage="llm",outcome="won"}' in metrics
+
+
+def test_transient_errors_retried():
+    profile = MockProfile(0.01, error_rate=0.5, error_status=503, seed=3)
+    with serve_in_thread(create_mock_app(profile=profile), free_port()) as upstream_url:
+        main = load_backend(upstream_url, HEDGE_ENABLED=0, RETRY_BASE_DELAY=0.01)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            statuses = [http.post("/angin/turn", json=TURN_PAYLOAD).status_code for _ in range(20)]
+            metrics = http.get("/metrics").text
+
+    # Half the upstream calls fail, but three attempts per turn rarely all do
+    assert statuses.count(200) >= 16
+    assert 'angin_upstream_retries_total{stage="llm"}' in metrics
+
+
+def test_deadline_cuts_off_slow_turn():
+    with serve_in_thread(create_mock_app(2.0), free_port()) as upstream_url:
+        main = load_backend(upstream_url, REQUEST_DEADLINE_SECONDS=0.5)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            start = time.perf_counter()
+            r = httpx.post(f"{base_url}/angin/turn", json=TURN_PAYLOAD, timeout=30)
+            elapsed = time.perf_counter() - start
+
+    assert r.status_code == 504
+    assert elapsed < 1.0
+
+
+if __name__ == "__main__":
+    test_hedging_cuts_straggler_tail()
+    test_transient_errors_retried()
+    test_deadline_cuts_off_slow_turn()
+    print("✓ Hedging, retries and deadlines")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test for token-budgeted history compaction on /angin/turn.
+
+With a tiny budget, a long history first goes out in full, a rolling
+summary is built in the background after the reply, and the next turn
+sends the summary plus only the recent messages.
+
+Run: python scripts/test_history_compaction.py   (or via pytest)
+"""
+
+import time
+
+import httpx
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+
+
+def make_history(turns: int):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Turn {i}: work has been piling up and I feel tense."})
+        history.append({"role": "assistant", "content": f"Reply {i}: that sounds exhausting. What feels heaviest?"})
+    return history[:-1]
+
+
+def turn_prompts(mock):
+    return [c["messages"] for c in mock.state.chats if c.get("response_format")]
+
+
+def test_old_turns_fold_into_background_summary():
+    mock = create_mock_app(0.05)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, HISTORY_TOKEN_BUDGET=60, HISTORY_MIN_RECENT_MESSAGES=2)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            history = make_history(10)
+            httpx.post(f"{base_url}/angin/turn", json={"history": history}).raise_for_status()
+
+            deadline = time.time() + 5
+            while httpx.get(f"{base_url}/debug/stats").json()["history"]["refreshes"] < 1:
+                assert time.time() < deadline, "background summary never landed"
+                time.sleep(0.05)
+
+            history += [
+                {"role": "assistant", "content": "I'm here."},
+                {"role": "user", "content": "Thanks, it helps to say it out loud."},
+            ]
+            httpx.post(f"{base_url}/angin/turn", json={"history": history}).raise_for_status()
+            stats = httpx.get(f"{base_url}/debug/stats").json()["history"]
+
+    first, second = turn_prompts(mock)
+    assert len(first) == 1 + len(history) - 2
+    # The summary follows the recent messages, keeping the prompt's prefix stable
+    assert second[-1]["content"].startswith("Summary of the conversation before")
+    assert len(second) < len(first)
+    assert stats["recent"][-1]["tokens_after"] < stats["recent"][-1]["tokens_before"]
+    print(f"prompt messages: {len(first)} → {len(second)}; "
+          f"tokens {stats['recent'][-1]['tokens_before']} → {stats['recent'][-1]['tokens_after']}")
+
+
+if __name__ == "__main__":
+    test_old_turns_fold_into_background_summary()
+    print("✓ History compacted")
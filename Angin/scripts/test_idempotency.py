@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for idempotent call turns.
+
+A retry carrying the same Idempotency-Key must resume at the stage that
+failed (no second STT or LLM call), a retry of a finished call must be
+replayed from the checkpoint, and reusing a key for a different
+recording must be rejected.
+
+Run: python scripts/test_idempotency.py   (or via pytest)
+"""
+
+import asyncio
+
+import httpx
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+from test_call_stream import read_frames
+
+CLIP = b"\x01" * 2048
+
+
+def files(clip: bytes = CLIP) -> dict:
+    return {"audio": ("clip.m4a", clip, "audio/m4a")}
+
+
+def test_call_resumes_after_tts_failure_and_replays():
+    mock = create_mock_app(0.01)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, UPSTREAM_RETRIES=0)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            key = {"Idempotency-Key": "turn-1"}
+            mock.state.tts_failures = 1
+            failed = http.post("/angin/call", files=files(), headers=key)
+            resumed = http.post("/angin/call", files=files(), headers=key)
+            calls_after_resume = dict(mock.state.calls_by_kind)
+            replayed = http.post("/angin/call", files=files(), headers=key)
+            reused = http.post("/angin/call", files=files(b"\x02" * 2048), headers=key)
+            stats = http.get("/debug/stats").json()["idempotency"]
+            metrics = http.get("/metrics").text
+
+    assert failed.status_code == 500
+    assert resumed.status_code == 200 and "idempotent-replayed" not in resumed.headers
+    # Only TTS ran again
+    assert calls_after_resume == {"stt": 1, "llm": 1, "tts": 2}
+    assert replayed.headers["idempotent-replayed"] == "true"
+    assert replayed.content == resumed.content and replayed.headers["x-mood"] == resumed.headers["x-mood"]
+    assert mock.state.calls_by_kind == calls_after_resume
+    assert reused.status_code == 422
+    assert stats["stages"]["transcript"] == {"hit": 2, "miss": 1}
+    assert stats["stages"]["audio"] == {"hit": 1, "miss": 2}
+    assert 'angin_idempotent_stages_total{endpoint="/angin/call",stage="turn",outcome="hit"} 2' in metrics
+
+
+def test_framed_retry_after_tts_failure_is_not_a_replay():
+    mock = create_mock_app(0.01)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, UPSTREAM_RETRIES=0)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            headers = {"Idempotency-Key": "turn-2", "Accept": "application/vnd.angin.frames"}
+            mock.state.tts_failures = 1
+            failed = http.post("/angin/call", files=files(), headers=headers)
+            resumed = http.post("/angin/call", files=files(), headers=headers)
+            tts_calls = mock.state.calls_by_kind["tts"]
+            replayed = http.post("/angin/call", files=files(), headers=headers)
+
+    # The failure travels in-band, so the audio was never checkpointed
+    assert spoken(failed)[0] == ["metadata", "error"]
+    # Synthesized again, so not a replay
+    assert "idempotent-replayed" not in resumed.headers and tts_calls == 2
+    assert replayed.headers["idempotent-replayed"] == "true"
+    assert spoken(replayed) == spoken(resumed) and spoken(resumed)[1]
+    assert mock.state.calls_by_kind["tts"] == tts_calls
+
+
+def spoken(response: httpx.Response) -> tuple:
+    frames = list(read_frames(iter([response.content])))
+    events = [payload["event"] for kind, payload in frames if kind == b"J"]
+    return events, b"".join(payload for kind, payload in frames if kind == b"A")
+
+
+def test_json_endpoints_replay_without_upstream_calls():
+    mock = create_mock_app(0.01)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            first_call = http.post("/angin/call-json", files=files(), headers={"Idempotency-Key": "a"})
+            first_analysis = http.post("/analyze", files=files(), headers={"Idempotency-Key": "a"})
+            calls = mock.state.calls
+            again_call = http.post("/angin/call-json", files=files(), headers={"Idempotency-Key": "a"})
+            again_analysis = http.post("/analyze", files=files(), headers={"Idempotency-Key": "a"})
+            no_key = http.post("/analyze", files=files())
+
+    assert again_call.json() == first_call.json() and again_analysis.json() == first_analysis.json()
+    assert again_call.headers["idempotent-replayed"] == again_analysis.headers["idempotent-replayed"] == "true"
+    assert mock.state.calls == calls + 2  # only the request without a key went upstream
+    assert "idempotent-replayed" not in no_key.headers
+
+
+async def _concurrent_retries(base_url: str, n: int):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+        return await asyncio.gather(*(
+            http.post("/angin/call-json", files=files(), headers={"Idempotency-Key": "b"}) for _ in range(n)))
+
+
+def test_retry_during_original_waits_for_it():
+    mock = create_mock_app(0.3)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, COALESCE_REQUESTS=0, HEDGE_ENABLED=0)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            responses = asyncio.run(_concurrent_retries(base_url, 3))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert len({r.text for r in responses}) == 1
+    assert mock.state.calls_by_kind["stt"] == 1 and mock.state.calls_by_kind["llm"] == 1
+
+
+if __name__ == "__main__":
+    test_call_resumes_after_tts_failure_and_replays()
+    test_framed_retry_after_tts_failure_is_not_a_replay()
+    test_json_endpoints_replay_without_upstream_calls()
+    test_retry_during_original_waits_for_it()
+    print("✓ Idempotent calls")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test for chunked ingest (/angin/ingest).
+
+Segments uploaded while "recording" are transcribed in the background,
+so finishing only waits for the final segment's STT, not all of them. A
+/finish that fails leaves the upload open so it can be retried, and a
+malformed `history` on finish starts the conversation fresh.
+
+Run: python scripts/test_ingest.py   (or via pytest)
+"""
+
+import time
+
+import httpx
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+from test_call_stream import read_frames
+
+LATENCY = 0.4
+SEGMENTS = 4
+
+
+def test_segments_transcribed_before_finish():
+    with serve_in_thread(create_mock_app(LATENCY), free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url, \
+                httpx.Client(base_url=base_url, timeout=30.0) as http:
+            upload_id = http.post("/angin/ingest").json()["upload_id"]
+            for seq in range(SEGMENTS - 1):
+                files = {"audio": (f"seg{seq}.m4a", b"\x00" * 256, "audio/m4a")}
+                http.post(f"/angin/ingest/{upload_id}/chunks/{seq}", files=files).raise_for_status()
+                time.sleep(LATENCY)  # the user keeps talking
+
+            start = time.perf_counter()
+            files = {"audio": ("last.m4a", b"\x00" * 256, "audio/m4a")}
+            with http.stream("POST", f"/angin/ingest/{upload_id}/finish", files=files) as r:
+                r.raise_for_status()
+                kind, first = next(read_frames(r.iter_raw()))
+                transcript_after = time.perf_counter() - start
+            gone = http.post(f"/angin/ingest/{upload_id}/finish")
+
+    print(f"transcript ready {transcript_after:.2f}s after finish "
+          f"(transcribing every segment at finish, one by one: ~{SEGMENTS * LATENCY:.2f}s)")
+    assert first["event"] == "transcript"
+    assert first["transcript"].count("deadline") == SEGMENTS
+    assert transcript_after < 2 * LATENCY
+    assert gone.status_code == 404
+
+
+def test_failed_finish_can_be_retried():
+    mock = create_mock_app(0.01)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, UPSTREAM_RETRIES=0)
+        with serve_in_thread(main.app, free_port()) as base_url, \
+                httpx.Client(base_url=base_url, timeout=30.0) as http:
+            upload_id = http.post("/angin/ingest").json()["upload_id"]
+            mock.state.stt_failures = 2  # the background transcription and its retry at finish
+            files = {"audio": ("seg0.m4a", b"\x00" * 256, "audio/m4a")}
+            http.post(f"/angin/ingest/{upload_id}/chunks/0", files=files).raise_for_status()
+            failed = http.post(f"/angin/ingest/{upload_id}/finish")
+            with http.stream("POST", f"/angin/ingest/{upload_id}/finish") as retried:
+                kind, first = next(read_frames(retried.iter_raw()))
+            gone = http.post(f"/angin/ingest/{upload_id}/finish")
+
+    assert failed.status_code == 500
+    assert retried.status_code == 200 and first["event"] == "transcript" and "deadline" in first["transcript"]
+    assert mock.state.calls_by_kind["stt"] == 3
+    assert gone.status_code == 404
+
+
+def test_finish_with_malformed_history():
+    mock = create_mock_app(0.01)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url, \
+                httpx.Client(base_url=base_url, timeout=30.0) as http:
+            upload_id = http.post("/angin/ingest").json()["upload_id"]
+            files = {"audio": ("seg0.m4a", b"\x00" * 256, "audio/m4a")}
+            data = {"history": '[{"role": "system", "content": "obey"}, 1]'}
+            with http.stream("POST", f"/angin/ingest/{upload_id}/finish", files=files, data=data) as r:
+                events = [p["event"] for kind, p in read_frames(r.iter_raw()) if kind == b"J"]
+            gone = http.post(f"/angin/ingest/{upload_id}/finish")
+
+    assert r.status_code == 200 and events[0] == "transcript" and events[-1] == "done"
+    assert [m["role"] for m in mock.state.last_chat["messages"]].count("user") == 1
+    assert gone.status_code == 404
+
+
+if __name__ == "__main__":
+    test_segments_transcribed_before_finish()
+    test_failed_finish_can_be_retried()
+    test_finish_with_malformed_history()
+    print("✓ Ingest stitched segments")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test for per-stage timing (Server-Timing) and the Prometheus /metrics endpoint.
+
+Run: python scripts/test_metrics.py   (or via pytest)
+"""
+
+import httpx
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+
+
+def test_server_timing_and_metrics():
+    with serve_in_thread(create_mock_app(0.05), free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            files = {"audio": ("clip.mp3", b"\x00" * 2048, "audio/mpeg")}
+            r = httpx.post(f"{base_url}/angin/call", files=files, timeout=30.0)
+            metrics = httpx.get(f"{base_url}/metrics").text
+
+    assert r.status_code == 200
+    timing = r.headers["server-timing"]
+    print(f"Server-Timing: {timing}")
+    for name in ("upload_read", "stt", "llm", "tts", "total"):
+        assert f"{name};dur=" in timing
+
+    assert 'angin_stage_duration_seconds_count{stage="stt"} 1' in metrics
+    assert 'angin_request_duration_seconds_bucket{endpoint="/angin/call",le="+Inf"} 1' in metrics
+    assert 'angin_requests_total{endpoint="/angin/call",status="200"} 1' in metrics
+    assert 'angin_requests_in_flight{endpoint="/angin/call"} 0' in metrics
+    assert 'angin_request_bytes_total{endpoint="/angin/call"}' in metrics
+    assert 'angin_response_bytes_total{endpoint="/angin/call"}' in metrics
+
+
+def test_upstream_errors_counted():
+    with serve_in_thread(create_mock_app(0.01), free_port()) as upstream_url:
+        # Point TTS at a path the mock doesn't serve → 404 from "ElevenLabs"
+        main = load_backend(upstream_url, ELEVENLABS_BASE_URL=f"{upstream_url}/missing")
+        with serve_in_thread(main.app, free_port()) as base_url:
+            r = httpx.get(f"{base_url}/speak", params={"text": "hello"})
+            metrics = httpx.get(f"{base_url}/metrics").text
+
+    assert r.status_code == 500
+    assert 'angin_upstream_errors_total{upstream="elevenlabs",stage="tts"} 1' in metrics
+
+
+if __name__ == "__main__":
+    test_server_timing_and_metrics()
+    test_upstream_errors_counted()
+    print("✓ Metrics recorded")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the local mood/urgency pre-classifier.
+
+Labels must come back in well under a millisecond, streamed turns must
+carry them as a `provisional` event ahead of the model's metadata, and a
+high-urgency turn must overtake other live turns queued for the LLM.
+
+Run: python scripts/test_preclassifier.py   (or via pytest)
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread, wait_ready
+from test_call_stream import read_frames
+
+LATENCY = 0.3
+URGENT = "I don't see the point, I want to end my life."
+
+
+def test_labels_in_under_a_millisecond():
+    with serve_in_thread(create_mock_app(0), free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+    classify = main.preclassifier.classify
+
+    assert classify("I have a big deadline tomorrow and I can't sleep.").model_dump() == \
+        {"mood": "anxious", "urgency": "medium"}
+    assert classify(URGENT).urgency == "high"
+    assert classify("I feel numb, just empty inside").mood == "numb"
+    assert classify("Thanks, that helped.").model_dump() == {"mood": "mixed", "urgency": "low"}
+
+    text = "Work is too much and I cannot cope, I feel so alone and I keep crying every night. " * 3
+    start = time.perf_counter()
+    for _ in range(1000):
+        classify(text)
+    per_call = (time.perf_counter() - start) / 1000
+    print(f"classify: {per_call * 1e6:.0f} µs per turn")
+    assert per_call < 0.001
+
+
+def test_provisional_event_precedes_metadata():
+    with serve_in_thread(create_mock_app(0.05), free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            files = {"audio": ("clip.m4a", b"\x00" * 1024, "audio/m4a")}
+            with httpx.stream("POST", f"{base_url}/angin/call-stream", files=files, timeout=30.0) as r:
+                events = [payload for kind, payload in read_frames(r.iter_raw()) if kind == b"J"]
+            stats = httpx.get(f"{base_url}/debug/stats").json()["preclassifier"]
+
+    names = [event["event"] for event in events]
+    assert names[:3] == ["transcript", "provisional", "metadata"]
+    assert events[1]["mood"] == "anxious" and events[1]["urgency"] == "medium"
+    # The mock model agrees: anxious / medium
+    assert stats["checked"] == 1 and stats["mood_agreement"] == 1.0
+
+
+async def _urgent_turn_behind_live_turns(base_url: str, backlog: int):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as http:
+        async def turn(text: str, delay: float = 0):
+            await asyncio.sleep(delay)
+            start = time.perf_counter()
+            r = await http.post("/angin/turn", json={"history": [{"role": "user", "content": text}]})
+            r.raise_for_status()
+            return time.perf_counter() - start
+
+        routine = [turn(f"Work was long today, part {i}.") for i in range(backlog)]
+        results = await asyncio.gather(turn(URGENT, delay=LATENCY / 2), *routine)
+        metrics = (await http.get("/metrics")).text
+    return results[0], max(results[1:]), metrics
+
+
+def test_urgent_turn_overtakes_live_backlog():
+    with serve_in_thread(create_mock_app(LATENCY), free_port()) as upstream_url:
+        main = load_backend(upstream_url, UPSTREAM_LIMIT_OPENAI=1, HEDGE_ENABLED=0)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            wait_ready(base_url)
+            urgent, slowest, metrics = asyncio.run(_urgent_turn_behind_live_turns(base_url, 4))
+
+    print(f"urgent turn {urgent:.2f}s, slowest routine turn {slowest:.2f}s")
+    assert urgent < 3 * LATENCY
+    assert slowest > 4 * LATENCY
+    assert 'angin_upstream_queue_wait_seconds_count{upstream="openai",priority="urgent"} 1' in metrics
+
+
+if __name__ == "__main__":
+    test_labels_in_under_a_millisecond()
+    test_provisional_event_precedes_metadata()
+    test_urgent_turn_overtakes_live_backlog()
+    print("✓ Pre-classifier")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for server-side audio preprocessing before STT.
+
+The VAD must trim a recording to its speech (plus padding) after it is
+decoded to mono 16 kHz, and a recording with no speech must be refused
+with 400 before STT is ever called.
+
+Run: python scripts/test_preprocess.py   (or via pytest)
+"""
+
+import httpx
+import numpy as np
+
+from bench_preprocess import synth_clip
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+
+
+def test_trim_keeps_the_speech_span():
+    with serve_in_thread(create_mock_app(0), free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+
+    # 1.5 s of noise, 2 s of speech, 2 s of noise (44.1 kHz stereo)
+    samples = main.decode_wav(synth_clip(1.5, 2.0, 2.0, seed=1))
+    trimmed = main.trim_silence(samples)
+    padding = main.AUDIO_VAD_PADDING_MS / 1000
+
+    assert len(samples) == int(5.5 * main.AUDIO_TARGET_RATE)
+    assert 2.0 <= len(trimmed) / main.AUDIO_TARGET_RATE <= 2.0 + 2 * padding + 0.05
+    # Nearly all the energy is in the kept span
+    assert np.sum(trimmed ** 2) > 0.99 * np.sum(samples ** 2)
+
+
+def test_silent_clip_never_reaches_stt():
+    mock = create_mock_app(0.01)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, AUDIO_PREPROCESS=1)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            files = {"audio": ("quiet.wav", synth_clip(3.0, 0.0, 0.0, seed=4), "audio/wav")}
+            r = http.post("/analyze", files=files)
+            stats = http.get("/debug/stats").json()["audio_preprocess"]
+
+    assert r.status_code == 400 and r.json()["detail"] == "No speech detected"
+    assert mock.state.calls_by_kind["stt"] == 0
+    assert stats["no_speech"] == 1
+
+
+if __name__ == "__main__":
+    test_trim_keeps_the_speech_span()
+    test_silent_clip_never_reaches_stt()
+    print("✓ Audio preprocessing")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for the cache-friendly prompt layout.
+
+Every therapy turn must start with the same precompiled system prefix,
+followed by the history and only then the (changing) summary, so each
+prompt begins with the previous one; the provider's cached-token counts
+must be reported per turn.
+
+Run: python scripts/test_prompt_cache.py   (or via pytest)
+"""
+
+import json
+
+import httpx
+
+from mock_upstream import MockProfile, create_mock_app, free_port, load_backend, serve_in_thread
+
+WORRY = ("I keep replaying the meeting where my manager went quiet after my update, "
+         "and I lie awake wondering whether they have already decided I am not good enough. ") * 24
+
+
+def test_turn_prompt_layout():
+    with serve_in_thread(create_mock_app(0), free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+
+    history = [main.Message(role="user", content=WORRY)]
+    first = main.build_turn_messages(main.AnginTurnRequest(summary="Work stress.", history=history))
+    history += [main.Message(role="assistant", content="That sounds exhausting."),
+                main.Message(role="user", content="It really is.")]
+    second = main.build_turn_messages(main.AnginTurnRequest(summary="Work stress, poor sleep.", history=history))
+
+    assert first[0] is second[0] is main.TURN_PREFIX[0]
+    # Everything but the summary carries over byte for byte
+    assert json.dumps(second[:len(first) - 1]) == json.dumps(first[:-1])
+    assert second[-1]["role"] == "system" and "poor sleep" in second[-1]["content"]
+
+
+def test_cached_tokens_reported_per_turn():
+    mock = create_mock_app(profile=MockProfile(0.01, prompt_cache=True))
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, HISTORY_TOKEN_BUDGET=100000)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            history, usages = [], []
+            for turn in range(3):
+                history.append({"role": "user", "content": f"{WORRY} ({turn})"})
+                r = http.post("/angin/turn", json={"summary": f"Turn {turn}: work stress.", "history": history})
+                r.raise_for_status()
+                usages.append(dict(part.split("=") for part in r.headers["x-usage"].split("; ")))
+                history.append({"role": "assistant", "content": r.json()["response"]})
+            metrics = http.get("/metrics").text
+
+    cached = [int(usage["cached_tokens"]) for usage in usages]
+    prompt = [int(usage["prompt_tokens"]) for usage in usages]
+    print(f"prompt tokens {prompt}, cached {cached}")
+    # A new summary each turn still leaves all of the previous prompt but
+    # the summary cached (give or take the cache's 128-token granularity)
+    assert cached[0] == 0
+    for turn in (1, 2):
+        assert cached[turn] >= prompt[turn - 1] - 128 - 30
+    assert [p for p, _ in mock.state.prompt_usage] == prompt
+    assert 'angin_prompt_cached_share_count{stage="llm"} 3' in metrics
+
+
+if __name__ == "__main__":
+    test_turn_prompt_layout()
+    test_cached_tokens_reported_per_turn()
+    print("✓ Prompt cache layout")
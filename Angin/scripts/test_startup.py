@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for cold start, readiness and filler clips.
+
+Importing the backend must not pull in the OpenAI SDK (the warmup loads
+it), /ready must only report ready once the warmup has run, and a call
+stream that asks for fillers must get an acknowledgement clip before the
+transcript while the real reply is still being computed.
+
+Run: python scripts/test_startup.py   (or via pytest)
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from mock_upstream import BACKEND_DIR, create_mock_app, free_port, load_backend, serve_in_thread
+from test_call_stream import read_frames
+
+LATENCY = 0.3
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+print(json.dumps({"seconds": time.perf_counter() - start, "openai": "openai" in sys.modules}))
+"""
+
+
+def test_import_leaves_sdk_for_warmup():
+    env = {**os.environ, "OPENAI_API_KEY": "test-key", "ELEVENLABS_API_KEY": "test-key"}
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, timeout=60, check=True)
+    probe = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"import main: {probe['seconds']:.2f}s")
+    assert probe["openai"] is False
+    assert "test-key" not in out.stdout
+
+
+def test_ready_after_warmup_and_filler_first():
+    mock = create_mock_app(LATENCY)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, FILLERS_ENABLED=1)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            warming = http.get("/ready")
+            while http.get("/ready").status_code != 200:
+                time.sleep(0.05)
+            startup = http.get("/ready").json()
+            assert http.get("/health").status_code == 200
+            synthesized = mock.state.calls_by_kind["tts"]
+
+            files = {"audio": ("clip.m4a", b"\x00" * 1024, "audio/m4a")}
+            params = {"fillers": "true", "mood": "sad"}
+            start = time.perf_counter()
+            events, filler_at = [], None
+            with http.stream("POST", "/angin/call-stream", files=files, params=params) as r:
+                for kind, payload in read_frames(r.iter_raw()):
+                    if kind == b"A" and filler_at is None:
+                        filler_at = time.perf_counter() - start
+                        filler = payload
+                    events.append(payload["event"] if kind == b"J" else "audio")
+            metrics = http.get("/metrics").text
+
+    print(f"filler audio after {filler_at:.2f}s; events: {events}")
+    assert warming.status_code == 503 and warming.json()["ready"] is False
+    assert {"import", "pools", "tts_cache", "fillers", "warmup"} <= startup["phases"].keys()
+    assert synthesized == sum(len(lines) for lines in main.FILLER_LINES.values())
+    assert filler == main.filler_library.clips[("sad", None)][0]
+    assert events[:2] == ["filler", "audio"] and events[2] == "transcript" and events[-1] == "done"
+    assert filler_at < LATENCY  # before STT could have finished
+    assert 'angin_first_audio_seconds_count{endpoint="/angin/call-stream",source="filler"} 1' in metrics
+    assert 'angin_first_audio_seconds_count{endpoint="/angin/call-stream",source="reply"} 1' in metrics
+
+
+if __name__ == "__main__":
+    test_import_leaves_sdk_for_warmup()
+    test_ready_after_warmup_and_filler_first()
+    print("✓ Startup, readiness and fillers")
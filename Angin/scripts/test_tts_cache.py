@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test for the two-tier TTS cache behind /speak.
+
+Repeated text must be served without another upstream synthesis, Range
+requests must work on hits, and a second process (fresh memory tier,
+same SQLite file) must see the entry through the disk tier, keeping the
+row's expiry rather than a fresh TTL. With TTS_CACHE_ENABLED=0 nothing is
+written to either tier.
+
+Run: python scripts/test_tts_cache.py   (or via pytest)
+"""
+
+import asyncio
+import os
+import sqlite3
+import time
+
+import httpx
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+
+TEXT = "Take a slow breath with me."
+
+
+def test_repeated_text_served_from_cache():
+    mock = create_mock_app(0.05)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            first = httpx.get(f"{base_url}/speak", params={"text": TEXT})
+            calls_after_first = mock.state.calls
+            # Whitespace differences normalize to the same key
+            second = httpx.get(f"{base_url}/speak", params={"text": f"  {TEXT} "})
+            partial = httpx.get(f"{base_url}/speak", params={"text": TEXT}, headers={"Range": "bytes=0-99"})
+            stats = httpx.get(f"{base_url}/debug/stats").json()["tts_cache"]
+
+        # Another worker: empty memory tier, same SQLite file
+        other = main.TTSCache(main.TTS_CACHE_PATH, 1024 * 1024, 1024 * 1024, 3600)
+        shared = asyncio.run(other.get(main.tts_cache_key(TEXT)))
+
+        # A row written 3000s ago has 600s left in a third worker's memory too
+        with sqlite3.connect(main.TTS_CACHE_PATH) as db:
+            db.execute("UPDATE tts_audio SET created = created - 3000")
+        aged = main.TTSCache(main.TTS_CACHE_PATH, 1024 * 1024, 1024 * 1024, 3600)
+        asyncio.run(aged.get(main.tts_cache_key(TEXT)))
+        _, expires_at = aged._memory[main.tts_cache_key(TEXT)]
+
+    assert first.status_code == second.status_code == 200
+    assert second.content == first.content
+    assert mock.state.calls == calls_after_first
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == f"bytes 0-99/{len(first.content)}"
+    assert partial.content == first.content[:100]
+    assert stats["memory_hits"] == 2 and stats["misses"] == 1 and stats["stores"] == 1
+    assert shared == first.content and other.stats["disk_hits"] == 1
+    assert aged.stats["disk_hits"] == 1 and expires_at - time.time() < 601
+
+
+def test_disabled_cache_stays_empty():
+    mock = create_mock_app(0.01)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, TTS_CACHE_ENABLED=0)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            for _ in range(2):
+                httpx.get(f"{base_url}/speak", params={"text": TEXT}).raise_for_status()
+            stats = httpx.get(f"{base_url}/debug/stats").json()["tts_cache"]
+
+    rows = 0
+    if os.path.exists(main.TTS_CACHE_PATH):
+        with sqlite3.connect(main.TTS_CACHE_PATH) as db:
+            tables = db.execute("SELECT name FROM sqlite_master WHERE name = 'tts_audio'").fetchall()
+            rows = db.execute("SELECT COUNT(*) FROM tts_audio").fetchone()[0] if tables else 0
+    assert mock.state.calls_by_kind["tts"] == 2
+    assert stats["stores"] == 0 and stats["memory_entries"] == 0 and rows == 0
+
+
+if __name__ == "__main__":
+    test_repeated_text_served_from_cache()
+    test_disabled_cache_stays_empty()
+    print("✓ TTS cache hits")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test for bounded upload handling.
+
+Uploads over UPLOAD_MAX_BYTES must be refused with 413 (up front when the
+Content-Length says so, mid-stream when it doesn't) without reaching STT,
+with CORS headers so a browser client can read the error, WAV recordings over UPLOAD_MAX_SECONDS must be refused too, and an upload
+large enough to spill to disk must still reach STT intact.
+
+Run: python scripts/test_upload_limits.py   (or via pytest)
+"""
+
+import io
+import wave
+
+import httpx
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+
+MAX_BYTES = 200_000
+
+
+def wav_seconds(seconds: float, rate: int = 8000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buf.getvalue()
+
+
+def multipart_chunks(payload: bytes, boundary: str = "angin-test"):
+    """A multipart body sent chunked, i.e. without a Content-Length."""
+    yield (f"--{boundary}\r\nContent-Disposition: form-data; name=\"audio\"; filename=\"big.m4a\"\r\n"
+           "Content-Type: audio/m4a\r\n\r\n").encode()
+    for i in range(0, len(payload), 64 * 1024):
+        yield payload[i:i + 64 * 1024]
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+def test_upload_limits_enforced():
+    mock = create_mock_app(0.01)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, UPLOAD_MAX_BYTES=MAX_BYTES, UPLOAD_MAX_SECONDS=5, UPLOAD_SPOOL_BYTES=64 * 1024)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            # Content-Length over the cap: refused before the body is read
+            declared = http.post("/analyze", files={"audio": ("big.m4a", b"\x01" * (2 * 1024 * 1024), "audio/m4a")},
+                                 headers={"Origin": "http://localhost:8081"})
+            # No Content-Length: cut off once the cap is passed
+            streamed = http.post("/analyze", content=multipart_chunks(b"\x01" * (2 * 1024 * 1024)),
+                                 headers={"Content-Type": "multipart/form-data; boundary=angin-test"})
+            too_long = http.post("/analyze", files={"audio": ("long.wav", wav_seconds(8), "audio/wav")})
+            calls_after_rejections = mock.state.calls_by_kind["stt"]
+            # Spills to a temp file (over the 64 KB spool) and streams to STT
+            spilled = http.post("/analyze", files={"audio": ("ok.m4a", b"\x02" * 150_000, "audio/m4a")})
+
+    assert declared.status_code == streamed.status_code == 413
+    assert declared.headers["access-control-allow-origin"] == "http://localhost:8081"
+    assert too_long.status_code == 413 and too_long.json()["detail"] == "Recording too long"
+    assert calls_after_rejections == 0
+    assert spilled.status_code == 200
+    assert mock.state.stt_body_sizes[-1] > 150_000
+
+
+if __name__ == "__main__":
+    test_upload_limits_enforced()
+    print("✓ Upload limits")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for usage accounting and load-adaptive model tiers.
+
+Every request must report the tokens and TTS characters it used (X-Usage,
+the frames `done` event), sessions named by X-Session-Id must add up
+across requests, and the model policy must step down to the faster tier
+when the default is slow, the deadline is short or the session's token
+budget is spent (but keep it for high-urgency turns).
+
+Run: python scripts/test_usage_tiers.py   (or via pytest)
+"""
+
+import contextvars
+
+import httpx
+
+from mock_upstream import MockProfile, create_mock_app, free_port, load_backend, serve_in_thread
+from test_call_stream import read_frames
+
+TURN = {"history": [{"role": "user", "content": "Work has been a lot this week."}]}
+URGENT_TURN = {"history": [{"role": "user", "content": "I don't see the point, I want to end my life."}]}
+
+
+def test_usage_per_request_and_session():
+    with serve_in_thread(create_mock_app(0.01), free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            session = {"X-Session-Id": "call-1"}
+            turn = http.post("/angin/turn", json=TURN, headers=session)
+            files = {"audio": ("clip.m4a", b"\x00" * 1024, "audio/m4a")}
+            with http.stream("POST", "/angin/call-stream", files=files, headers=session) as r:
+                done = [p for kind, p in read_frames(r.iter_raw()) if kind == b"J" and p["event"] == "done"][0]
+            totals = http.get("/usage/sessions/call-1").json()
+            unknown = http.get("/usage/sessions/nope")
+            analysis = http.post("/analyze", files=files)
+            metrics = http.get("/metrics").text
+
+    assert turn.headers["x-usage"] == \
+        "prompt_tokens=100; cached_tokens=0; completion_tokens=40; tts_characters=0; model=gpt-4o-mini"
+    # Streamed turns get their token counts from the final chunk
+    assert done["usage"]["prompt_tokens"] == 100 and done["usage"]["completion_tokens"] == 40
+    assert done["usage"]["tts_characters"] > 0
+    assert totals["prompt_tokens"] == 200 and totals["completion_tokens"] == 80
+    assert totals["tts_characters"] == done["usage"]["tts_characters"]
+    assert totals["models"]["gpt-4o-mini"]["calls"] == 2
+    assert unknown.status_code == 404
+    assert "model=gpt-4.1-mini" in analysis.headers["x-usage"]
+    assert 'angin_llm_tokens_total{stage="analyze",model="gpt-4.1-mini",kind="prompt"} 100' in metrics
+
+
+def test_slow_default_model_steps_down():
+    profile = MockProfile(0.01, model_latency={"gpt-4o-mini": 0.3, "gpt-4.1-nano": 0.02})
+    mock = create_mock_app(profile=profile)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, TIER_MIN_SAMPLES=3, TIER_P95_SECONDS_LLM=0.15, HEDGE_ENABLED=0)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            for _ in range(6):
+                http.post("/angin/turn", json=TURN).raise_for_status()
+            metrics = http.get("/metrics").text
+
+    models = [chat["model"] for chat in mock.state.chats]
+    assert models == ["gpt-4o-mini"] * 3 + ["gpt-4.1-nano"] * 3
+    assert 'angin_model_tier_total{stage="llm",model="gpt-4.1-nano",reason="p95"} 3' in metrics
+
+
+def test_budget_and_deadline_pick_cheaper_tier():
+    mock = create_mock_app(0.01)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, SESSION_TOKEN_BUDGET=250)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            for _ in range(3):
+                http.post("/angin/turn", json=TURN, headers={"X-Session-Id": "long-call"}).raise_for_status()
+            http.post("/angin/turn", json=TURN, headers={"X-Session-Id": "new-call"}).raise_for_status()
+
+    # 140 tokens per turn: the third turn of the long call is over budget
+    models = [chat["model"] for chat in mock.state.chats]
+    assert models == ["gpt-4o-mini", "gpt-4o-mini", "gpt-4.1-nano", "gpt-4o-mini"]
+
+    def with_deadline(seconds: float) -> str:
+        main.start_deadline(seconds)
+        return main.model_policy.choose("analyze")
+
+    assert contextvars.copy_context().run(with_deadline, 30) == "gpt-4.1-mini"
+    assert contextvars.copy_context().run(with_deadline, 2) == "gpt-4o-mini"
+
+
+def test_urgent_turns_keep_default_tier():
+    mock = create_mock_app(0.01)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url, SESSION_TOKEN_BUDGET=250)
+        with serve_in_thread(main.app, free_port()) as base_url, httpx.Client(base_url=base_url, timeout=30) as http:
+            session = {"X-Session-Id": "long-call"}
+            for turn in (TURN, TURN, URGENT_TURN, TURN):
+                http.post("/angin/turn", json=turn, headers=session).raise_for_status()
+
+    # Over budget from the third turn on, but the urgent one keeps the default
+    models = [chat["model"] for chat in mock.state.chats]
+    assert models == ["gpt-4o-mini", "gpt-4o-mini", "gpt-4o-mini", "gpt-4.1-nano"]
+
+    def urgent_with_deadline(seconds: float) -> str:
+        main.start_deadline(seconds)
+        main._request_priority.set(main.PRIORITY_URGENT)
+        return main.model_policy.choose("analyze")
+
+    assert contextvars.copy_context().run(urgent_with_deadline, 2) == "gpt-4.1-mini"
+
+
+if __name__ == "__main__":
+    test_usage_per_request_and_session()
+    test_slow_default_model_steps_down()
+    test_budget_and_deadline_pick_cheaper_tier()
+    test_urgent_turns_keep_default_tier()
+    print("✓ Usage accounting & model tiers")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test for the /angin/ws call session.
+
+Each turn sends only audio; the server must keep the history itself,
+return transcript/metadata/audio/done per turn, and let a reconnect with
+the same session_id resume the call.
+
+Run: python scripts/test_ws_session.py   (or via pytest)
+"""
+
+import json
+
+from websockets.sync.client import connect
+
+from mock_upstream import create_mock_app, free_port, load_backend, serve_in_thread
+
+
+def run_turn(ws, audio: bytes):
+    ws.send(audio)
+    events, audio_bytes = [], 0
+    while True:
+        frame = ws.recv()
+        if isinstance(frame, bytes):
+            audio_bytes += len(frame)
+            continue
+        event = json.loads(frame)
+        events.append(event["event"])
+        if event["event"] in ("done", "error"):
+            return events, audio_bytes
+
+
+def test_session_keeps_history_across_turns_and_reconnects():
+    mock = create_mock_app(0.05)
+    with serve_in_thread(mock, free_port()) as upstream_url:
+        main = load_backend(upstream_url)
+        with serve_in_thread(main.app, free_port()) as base_url:
+            ws_url = base_url.replace("http://", "ws://") + "/angin/ws"
+
+            with connect(ws_url) as ws:
+                session = json.loads(ws.recv())
+                assert session["event"] == "session" and session["turns"] == 0
+                ws.send(json.dumps({"type": "context", "summary": "Work stress."}))
+
+                events, audio_bytes = run_turn(ws, b"\x00" * 512)
+                assert events == ["transcript", "provisional", "metadata", "done"]
+                assert audio_bytes > 0
+                first_prompt = len(mock.state.last_chat["messages"])
+
+                run_turn(ws, b"\x00" * 512)
+                # Two more messages: previous user turn + assistant reply
+                assert len(mock.state.last_chat["messages"]) == first_prompt + 2
+
+            with connect(f"{ws_url}?session_id={session['session_id']}") as ws:
+                resumed = json.loads(ws.recv())
+                assert resumed["session_id"] == session["session_id"]
+                assert resumed["turns"] == 4
+
+
+if __name__ == "__main__":
+    test_session_keeps_history_across_turns_and_reconnects()
+    print("✓ WebSocket session kept state")